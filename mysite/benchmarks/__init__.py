@@ -0,0 +1,17 @@
+"""
+Load tests for the polls app.
+
+    python -m benchmarks run --output before.json
+    python -m benchmarks run --server --concurrency 8 --output server.json
+    python -m benchmarks compare before.json after.json
+
+`run` seeds a throwaway database (see benchmarks.seed), replays the
+scenarios in benchmarks.scenarios through the Django test client, or over
+HTTP against a runserver it starts with --server, and reports latency
+percentiles, queries per request (test client only) and throughput.
+
+    python -m benchmarks micro fragments --requests 1000
+
+`micro` runs one of the benchmarks in benchmarks.micro, which time a
+single mechanism of the app with and without it.
+"""
@@ -0,0 +1,10 @@
+import os
+import sys
+
+import django
+
+if __name__ == '__main__':
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+    django.setup()
+    from benchmarks.runner import main
+    sys.exit(main(sys.argv[1:]))
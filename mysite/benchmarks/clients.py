@@ -0,0 +1,85 @@
+import http.client
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth.models import User
+from django.test import Client
+from django.urls import reverse
+
+from polls.querybudget import count_queries
+
+from .seed import PASSWORD
+
+
+class LocalClient:
+    """The Django test client, counting the queries of each request."""
+
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+
+    def login(self, username):
+        self.client.force_login(User.objects.get(username=username))
+
+    def request(self, method, path, data):
+        """Return (status code, number of queries)."""
+        with count_queries() as queries:
+            response = getattr(self.client, method)(path, data)
+        return response.status_code, queries.count
+
+
+class HttpClient:
+    """
+    A keep-alive HTTP client for a running server with a cookie jar and
+    CSRF tokens; redirects are not followed. Query counts are unknown.
+    """
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port
+        self.connection = None
+        self.cookies = SimpleCookie()
+
+    def login(self, username):
+        status, _ = self.request('post', reverse('login'), {
+            'username': username, 'password': PASSWORD})
+        if status != 302:
+            raise RuntimeError('Logging in as {} failed with {}.'.format(
+                username, status))
+
+    def request(self, method, path, data):
+        if method == 'post' and 'csrftoken' not in self.cookies:
+            # Pick up a CSRF cookie from the form page first.
+            self.request('get', path, None)
+        headers = {'Cookie': '; '.join(
+            '{}={}'.format(k, m.value) for k, m in self.cookies.items())}
+        body = None
+        if method == 'get' and data:
+            path += '?' + urlencode(data)
+        elif method == 'post':
+            data = dict(data or {})
+            if 'csrftoken' in self.cookies:
+                data['csrfmiddlewaretoken'] = self.cookies['csrftoken'].value
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['Referer'] = 'http://{}:{}/'.format(self.host, self.port)
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(
+                    self.host, self.port, timeout=60)
+            try:
+                self.connection.request(method.upper(), path, body, headers)
+                response = self.connection.getresponse()
+                response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed the keep-alive connection; reconnect once.
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        for header in response.headers.get_all('Set-Cookie') or ():
+            self.cookies.load(header)
+        if response.headers.get('Connection', '').lower() == 'close':
+            self.connection.close()
+            self.connection = None
+        return response.status, None
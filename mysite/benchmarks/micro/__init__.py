@@ -0,0 +1,41 @@
+"""
+Micro-benchmarks: each module times one mechanism of the polls app (a
+cache, a session engine, the vote engines, ...) against a throwaway
+database, with and without it, and defines it as a `Benchmark` class.
+
+    python -m benchmarks micro search --questions 200000
+    python -m benchmarks micro votes --help
+"""
+import importlib
+import pkgutil
+import sys
+
+from django.core.management.base import OutputWrapper
+
+
+class MicroBenchmark:
+    """
+    Base of the `Benchmark` classes. Like a management command, `help`
+    describes it, add_arguments() adds its options and handle() runs it,
+    writing its report to self.stdout.
+    """
+    help = ''
+
+    def __init__(self, stdout=None):
+        self.stdout = OutputWrapper(stdout or sys.stdout)
+
+    def add_arguments(self, parser):
+        pass
+
+    def handle(self, *args, **options):
+        raise NotImplementedError
+
+
+def names():
+    return sorted(name for _, name, is_package
+                  in pkgutil.iter_modules(__path__) if not is_package)
+
+
+def load(name):
+    """The `Benchmark` class of the module `name`."""
+    return importlib.import_module('{}.{}'.format(__name__, name)).Benchmark
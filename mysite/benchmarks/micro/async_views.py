@@ -0,0 +1,121 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from polls.async_views import async_views_enabled
+from polls.models import Choice, Question
+
+from ..seed import create_user
+from ..utils import Timer, benchmark_database, split, summarize
+from . import MicroBenchmark
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Compare latency and throughput of the sync (WSGI-style, one thread '
+        'per request) and async (ASGI) polls views under concurrent load.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, nargs='+',
+                            default=[1, 16, 64])
+        parser.add_argument('--questions', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=8,
+                            help='POLLS_ASYNC_DB_WORKERS for the '
+                                 'bounded-pool run.')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.seed(options['questions'])
+            self.stdout.write('{:<14}{:>6}{:>10}{:>10}{:>10}'.format(
+                'server', 'conc', 'req/s', 'p50 ms', 'p95 ms'))
+            total = options['requests']
+            for concurrency in options['concurrency']:
+                self.report('wsgi', concurrency,
+                            *self.run_sync(total, concurrency))
+                for workers in (0, options['workers']):
+                    with async_views_enabled(POLLS_ASYNC_DB_WORKERS=workers):
+                        client = AsyncClient()
+                        client.force_login(self.user)
+                        result = asyncio.run(
+                            self.run_async(client, total, concurrency))
+                    self.report('asgi/pool={}'.format(workers), concurrency,
+                                *result)
+
+    def seed(self, count):
+        self.user = create_user('view_question', 'change_choice')
+        self.targets = []
+        for i in range(count):
+            question = Question.objects.create(
+                question_text='Question {}'.format(i), pub_date=timezone.now())
+            choices = [
+                Choice.objects.create(
+                    question=question, choice_text='Choice {}'.format(j))
+                for j in range(5)
+            ]
+            self.targets.append(
+                (question.pk, [choice.pk for choice in choices]))
+
+    def next_request(self):
+        question_id, choice_ids = random.choice(self.targets)
+        kind = random.choice(['index', 'detail', 'results', 'vote'])
+        if kind == 'index':
+            return 'get', reverse('polls:index'), {}
+        if kind == 'vote':
+            # Form-encoded rather than multipart: Django 3.2's AsyncClient
+            # cannot parse multipart bodies.
+            return 'post', reverse('polls:vote', args=(question_id,)), {
+                'data': urlencode({'choice': random.choice(choice_ids)}),
+                'content_type': 'application/x-www-form-urlencoded'}
+        return 'get', reverse('polls:' + kind, args=(question_id,)), {}
+
+    def run_sync(self, total, concurrency):
+        connection.close()
+
+        def worker(count):
+            client = Client()
+            client.force_login(self.user)
+            samples = []
+            for _ in range(count):
+                method, url, kwargs = self.next_request()
+                with Timer() as timer:
+                    getattr(client, method)(url, **kwargs)
+                samples.append(timer.elapsed)
+            connection.close()
+            return samples
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            chunks = list(pool.map(worker, split(total, concurrency)))
+        elapsed = time.perf_counter() - start
+        return [s for chunk in chunks for s in chunk], elapsed
+
+    async def run_async(self, client, total, concurrency):
+        async def worker(count):
+            samples = []
+            for _ in range(count):
+                method, url, kwargs = self.next_request()
+                start = time.perf_counter()
+                await getattr(client, method)(url, **kwargs)
+                samples.append(time.perf_counter() - start)
+            return samples
+
+        start = time.perf_counter()
+        chunks = await asyncio.gather(
+            *(worker(n) for n in split(total, concurrency)))
+        elapsed = time.perf_counter() - start
+        return [s for chunk in chunks for s in chunk], elapsed
+
+    def report(self, server, concurrency, samples, elapsed):
+        stats = summarize(samples)
+        self.stdout.write('{:<14}{:>6}{:>10.0f}{:>10.2f}{:>10.2f}'.format(
+            server, concurrency, len(samples) / elapsed,
+            stats['p50_ms'], stats['p95_ms']))
@@ -0,0 +1,66 @@
+from contextlib import nullcontext
+from unittest import mock
+
+from django import forms
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.forms import ChoiceForm
+from polls.models import Question
+from polls.querybudget import count_queries
+from polls.transfer import import_questions
+
+from ..seed import create_user
+from ..utils import Timer, benchmark_database, summarize
+from . import MicroBenchmark
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Measure the size and render time of the add-choice page with the '
+        'question autocomplete and with the former full-table <select>.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            now = timezone.now().isoformat()
+            records = (
+                {'question_text': 'Question {}'.format(i), 'pub_date': now,
+                 'choices': []}
+                for i in range(options['questions'])
+            )
+            for _ in import_questions(enumerate(records, 1)):
+                pass
+            user = create_user('add_question')
+            client = Client()
+            client.force_login(user)
+            question = Question.objects.order_by('pk').first()
+            select = forms.ModelChoiceField(queryset=Question.objects.all())
+            add_choice = reverse('polls:add_choice', args=(question.pk,))
+            suggestions = (
+                reverse('polls:question_autocomplete') + '?q=question+12')
+            pages = [
+                ('select', add_choice,
+                 mock.patch.dict(ChoiceForm.base_fields, question=select)),
+                ('autocomplete', add_choice, nullcontext()),
+                ('suggestions', suggestions, nullcontext()),
+            ]
+            self.stdout.write('{:<14}{:>12}{:>10}{:>10}{:>10}'.format(
+                'page', 'bytes', 'queries', 'p50 ms', 'p95 ms'))
+            for label, url, patch in pages:
+                with patch:
+                    samples = []
+                    for _ in range(options['repeat']):
+                        with count_queries() as queries, Timer() as timer:
+                            response = client.get(url)
+                        samples.append(timer.elapsed)
+                stats = summarize(samples)
+                self.stdout.write(
+                    '{:<14}{:>12}{:>10}{:>10.2f}{:>10.2f}'.format(
+                        label, len(response.content), queries.count,
+                        stats['p50_ms'], stats['p95_ms']))
@@ -0,0 +1,65 @@
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question
+
+from ..seed import create_user
+from ..utils import Timer, benchmark_database, summarize
+from . import MicroBenchmark
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Measure response bytes and latency of the index, detail and results '
+        'pages sent in full, gzip-compressed, and revalidated with '
+        'If-None-Match.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--choices', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            user = create_user('view_question')
+            for i in range(options['questions']):
+                question = Question.objects.create(
+                    question_text='Benchmark question {}'.format(i),
+                    pub_date=timezone.now())
+                Choice.objects.bulk_create(
+                    Choice(question=question,
+                           choice_text='Choice {}'.format(j), votes=j)
+                    for j in range(options['choices']))
+            client = Client()
+            client.force_login(user)
+            pages = [
+                ('index', reverse('polls:index')),
+                ('detail', reverse('polls:detail', args=(question.pk,))),
+                ('results', reverse('polls:results', args=(question.pk,))),
+            ]
+            self.stdout.write('{:<9}{:<13}{:>8}{:>10}{:>10}{:>10}'.format(
+                'page', 'mode', 'status', 'bytes', 'p50 ms', 'p95 ms'))
+            for name, url in pages:
+                client.get(url)
+                for mode in ('full', 'gzip', 'gzip+etag'):
+                    headers = {}
+                    if mode != 'full':
+                        headers['HTTP_ACCEPT_ENCODING'] = 'gzip'
+                    if mode == 'gzip+etag':
+                        # Fetched right before use: the index tag rolls over
+                        # every fragment timeout.
+                        etag = client.get(url, **headers)['ETag']
+                        headers['HTTP_IF_NONE_MATCH'] = etag
+                    samples = []
+                    for _ in range(options['requests']):
+                        with Timer() as timer:
+                            response = client.get(url, **headers)
+                        samples.append(timer.elapsed)
+                    stats = summarize(samples)
+                    self.stdout.write(
+                        '{:<9}{:<13}{:>8}{:>10}{:>10.2f}{:>10.2f}'.format(
+                            name, mode, response.status_code,
+                            len(response.content),
+                            stats['p50_ms'], stats['p95_ms']))
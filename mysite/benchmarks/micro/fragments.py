@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question
+
+from ..seed import create_user
+from ..utils import Timer, benchmark_database, summarize
+from . import MicroBenchmark
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Measure index and detail page requests/sec with and without '
+        'fragment caching.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--questions', type=int, default=40)
+        parser.add_argument('--choices', type=int, default=20)
+        parser.add_argument('--edit-every', type=int, default=0,
+                            help='Save a choice (invalidating its '
+                                 'question) every N requests.')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            question = None
+            for i in range(options['questions']):
+                question = Question.objects.create(
+                    question_text='Question {}'.format(i),
+                    pub_date=timezone.now())
+                for j in range(options['choices']):
+                    Choice.objects.create(
+                        question=question, choice_text='Choice {}'.format(j))
+            user = create_user('view_question')
+            client = Client()
+            client.force_login(user)
+            choice = question.choice_set.first()
+
+            pages = [
+                ('index', reverse('polls:index')),
+                ('detail', reverse('polls:detail', args=(question.id,))),
+            ]
+            for name, url in pages:
+                for timeout in (0, 60):
+                    cache.clear()
+                    overrides = override_settings(
+                        POLLS_FRAGMENT_CACHE_TIMEOUT=timeout)
+                    with overrides:
+                        samples = self.run(client, url, choice, options)
+                    stats = summarize(samples)
+                    self.stdout.write(
+                        '{:<7} fragments={:<4} {:>8.0f} req/s  '
+                        'p50={:.2f}ms p95={:.2f}ms'.format(
+                            name, 'on' if timeout else 'off',
+                            len(samples) / sum(samples),
+                            stats['p50_ms'], stats['p95_ms']))
+
+    def run(self, client, url, choice, options):
+        samples = []
+        edit_every = options['edit_every']
+        for i in range(options['requests']):
+            if edit_every and i % edit_every == 0:
+                choice.save()
+            with Timer() as timer:
+                response = client.get(url)
+            assert response.status_code == 200, response.status_code
+            samples.append(timer.elapsed)
+        return samples
@@ -0,0 +1,89 @@
+import datetime
+import re
+
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question
+from polls.pagination import encode_cursor
+
+from ..seed import create_user
+from ..utils import Timer, benchmark_database, summarize
+from . import MicroBenchmark
+
+CURSOR_RE = re.compile(r'\?cursor=([\w-]+)">Starsze')
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Seed many questions and measure index latency on shallow and deep '
+        'pages.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=1000000)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--depths', type=float, nargs='+',
+                            default=[0, 0.25, 0.5, 0.75, 0.99],
+                            help='Positions in the listing to measure, as '
+                                 'fractions.')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.seed(options['questions'], options['batch_size'])
+            client = Client()
+            client.force_login(create_user())
+            url = reverse('polls:index')
+            ordered = Question.objects.order_by('-pub_date', '-pk')
+            self.stdout.write('{:>8}{:>12}{:>10}{:>10}'.format(
+                'depth', 'offset', 'p50 ms', 'p95 ms'))
+            for depth in options['depths']:
+                offset = int(depth * (options['questions'] - 1))
+                cursor = ''
+                if offset:
+                    cursor = encode_cursor('next', ordered[offset - 1])
+                samples = []
+                params = {'cursor': cursor} if cursor else {}
+                for _ in range(options['repeat']):
+                    with Timer() as timer:
+                        response = client.get(url, params)
+                    assert response.status_code == 200
+                    samples.append(timer.elapsed)
+                stats = summarize(samples)
+                self.stdout.write('{:>8}{:>12}{:>10.2f}{:>10.2f}'.format(
+                    depth, offset, stats['p50_ms'], stats['p95_ms']))
+            pages = 0
+            samples = []
+            cursor = None
+            while pages < options['repeat']:
+                params = {'cursor': cursor} if cursor else {}
+                with Timer() as timer:
+                    response = client.get(url, params)
+                samples.append(timer.elapsed)
+                pages += 1
+                match = CURSOR_RE.search(response.content.decode())
+                if not match:
+                    break
+                cursor = match.group(1)
+            stats = summarize(samples)
+            self.stdout.write(
+                'Walked {} consecutive pages: '
+                'p50={:.2f}ms p95={:.2f}ms'.format(
+                    pages, stats['p50_ms'], stats['p95_ms']))
+
+    def seed(self, count, batch_size):
+        start = timezone.now() - datetime.timedelta(days=1)
+        with Timer() as timer:
+            for offset in range(0, count, batch_size):
+                Question.objects.bulk_create(
+                    Question(
+                        question_text='Question {}'.format(i),
+                        pub_date=start - datetime.timedelta(seconds=i // 3))
+                    for i in range(offset, min(offset + batch_size, count)))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write('Seeded {} questions in {:.1f}s'.format(
+            count, timer.elapsed))
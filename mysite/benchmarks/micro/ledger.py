@@ -0,0 +1,145 @@
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from polls.models import Choice, Question, Vote, VoteRollup
+from polls.votes import VoteLedgerWriter, rollup_votes
+
+from ..utils import Timer, benchmark_database, summarize
+from . import MicroBenchmark
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Load test the vote ledger: sustained votes/s through the batched '
+        'writer and the lag between a vote and its rollup into Choice.votes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--questions', type=int, default=100)
+        parser.add_argument('--choices', type=int, default=4)
+        parser.add_argument('--duplicates', type=float, default=0.1,
+                            help='Share of votes repeating an earlier '
+                                 '(user, question).')
+        parser.add_argument('--buffer-size', type=int, default=500)
+        parser.add_argument('--flush-interval', type=float, default=0.1)
+        parser.add_argument('--rollup-interval', type=float, default=1.0)
+        parser.add_argument('--rollup-batch', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            ballots = self.seed(options)
+            writer = VoteLedgerWriter(
+                options['buffer_size'], options['flush_interval'])
+            stop = threading.Event()
+            lags = []
+            rollup = threading.Thread(
+                target=self.roll_up, args=(stop, lags, options))
+            rollup.start()
+            submitted, elapsed = self.vote(writer, ballots, options)
+            writer.flush()
+            stop.set()
+            rollup.join()
+            with Timer() as catch_up:
+                while rollup_votes(options['rollup_batch']):
+                    pass
+            rows = Vote.objects.count()
+            counted = Choice.objects.aggregate(total=Sum('votes'))['total']
+            stats = summarize(lags) if lags else {'p50_ms': 0, 'p95_ms': 0}
+            self.stdout.write(
+                '{} votes from {} voters in {:.1f}s: {:.0f} votes/s'.format(
+                    submitted, options['voters'], elapsed,
+                    submitted / elapsed))
+            self.stdout.write(
+                '{} ledger rows ({} duplicates dropped), '
+                '{} counted in Choice.votes'.format(
+                    rows, submitted - rows, counted))
+            self.stdout.write(
+                'rollup lag p50={:.0f}ms p95={:.0f}ms max={:.0f}ms '
+                'over {} rollups, final catch-up {:.0f}ms'.format(
+                    stats['p50_ms'], stats['p95_ms'],
+                    max(lags, default=0) * 1000,
+                    len(lags), catch_up.elapsed * 1000))
+
+    def seed(self, options):
+        now = timezone.now()
+        Question.objects.bulk_create([
+            Question(question_text='Question {}'.format(i), pub_date=now)
+            for i in range(options['questions'])
+        ])
+        Choice.objects.bulk_create([
+            Choice(question=question, choice_text=str(j))
+            for question in Question.objects.all()
+            for j in range(options['choices'])
+        ])
+        User.objects.bulk_create([
+            User(username='voter{}'.format(i)) for i in range(options['users'])
+        ])
+        choices = {}
+        for choice in Choice.objects.all():
+            choices.setdefault(choice.question_id, []).append(choice)
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        rng = random.Random(0)
+        ballots = [
+            (user_id, rng.choice(question_choices))
+            for user_id in user_ids for question_choices in choices.values()
+        ]
+        rng.shuffle(ballots)
+        # Repeats land well after the original vote, in a later flush.
+        for i in range(len(ballots) // 2, len(ballots)):
+            if rng.random() < options['duplicates']:
+                ballots[i] = ballots[rng.randrange(i // 2)]
+        return ballots
+
+    def vote(self, writer, ballots, options):
+        ballots = iter(ballots)
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+        counts = []
+
+        def voter():
+            count = 0
+            while time.monotonic() < deadline:
+                with lock:
+                    ballot = next(ballots, None)
+                if ballot is None:
+                    break
+                writer.add(*ballot)
+                count += 1
+            counts.append(count)
+            connection.close()
+
+        threads = [threading.Thread(target=voter)
+                   for _ in range(options['voters'])]
+        with Timer() as timer:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return sum(counts), timer.elapsed
+
+    def roll_up(self, stop, lags, options):
+        """
+        Roll up every --rollup-interval seconds, noting the oldest folded
+        vote's age.
+        """
+        while not stop.wait(options['rollup_interval']):
+            mark = VoteRollup.objects.filter(pk=1).values_list(
+                'last_vote_id', flat=True).first() or 0
+            try:
+                folded = rollup_votes(options['rollup_batch'])
+            except OperationalError:
+                continue
+            if folded:
+                oldest = Vote.objects.filter(pk__gt=mark).order_by(
+                    'pk').values_list('created_at', flat=True).first()
+                lags.append((timezone.now() - oldest).total_seconds())
+        connection.close()
@@ -0,0 +1,69 @@
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from ..utils import benchmark_database
+from . import MicroBenchmark
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Measure logins/sec per core for normal traffic (valid logins) and '
+        'attack traffic (wrong passwords from one address), per PBKDF2 '
+        'iteration count and with the login rate limiter off and on.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=50)
+        parser.add_argument('--iterations', type=int, nargs='+',
+                            default=[settings.POLLS_PBKDF2_ITERATIONS, 100000])
+
+    def handle(self, *args, **options):
+        count = options['logins']
+        # Every rejected attempt would log a 'Too Many Requests' warning.
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        with benchmark_database():
+            self.stdout.write('{:<8}{:>11}{:>9}{:>12}{:>14}{:>8}'.format(
+                'traffic', 'iterations', 'limiter', 'logins/s',
+                'cpu ms/login', '429s'))
+            for iterations in options['iterations']:
+                with override_settings(POLLS_PBKDF2_ITERATIONS=iterations):
+                    User.objects.all().delete()
+                    User.objects.bulk_create(
+                        User(username='user{}'.format(i),
+                             password=make_password('secret'))
+                        for i in range(count))
+                    credentials = [('user{}'.format(i), 'secret')
+                                   for i in range(count)]
+                    self.run('normal', iterations, None, credentials)
+                    attack = [('user0', 'guess{}'.format(i))
+                              for i in range(count)]
+                    self.run('attack', iterations, False, attack)
+                    self.run('attack', iterations, True, attack)
+
+    def run(self, traffic, iterations, limiter, credentials):
+        cache.clear()
+        overrides = {}
+        if limiter is False:
+            overrides = {'POLLS_LOGIN_FAILURES_PER_IP': float('inf'),
+                         'POLLS_LOGIN_FAILURES_PER_USER': float('inf')}
+        client = Client()
+        rejected = 0
+        with override_settings(**overrides):
+            wall, cpu = time.perf_counter(), time.process_time()
+            for username, password in credentials:
+                response = client.post(reverse('login'), {
+                    'username': username, 'password': password})
+                rejected += response.status_code == 429
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        self.stdout.write('{:<8}{:>11}{:>9}{:>12.1f}{:>14.2f}{:>8}'.format(
+            traffic, iterations,
+            '-' if limiter is None else ('on' if limiter else 'off'),
+            len(credentials) / wall, cpu / len(credentials) * 1000, rejected))
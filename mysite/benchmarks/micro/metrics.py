@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.metrics import PerformanceMiddleware, registry
+from polls.models import Choice, Question
+
+from ..seed import create_user
+from ..utils import Timer, benchmark_database, summarize
+from . import MicroBenchmark
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Measure the per-request overhead of '
+        'polls.metrics.PerformanceMiddleware.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            question = Question.objects.create(
+                question_text='Benchmark question', pub_date=timezone.now())
+            for i in range(10):
+                Choice.objects.create(
+                    question=question, choice_text='Choice {}'.format(i))
+            user = create_user('view_question')
+            client = Client()
+            client.force_login(user)
+            url = reverse('polls:detail', args=(question.id,))
+            without = [m for m in settings.MIDDLEWARE
+                       if m != 'polls.metrics.PerformanceMiddleware']
+            runs = [
+                ('no middleware', {'MIDDLEWARE': without}),
+                ('sample 0%', {'POLLS_METRICS_SAMPLE_RATE': 0.0}),
+                ('sample 10%', {'POLLS_METRICS_SAMPLE_RATE': 0.1}),
+                ('sample 100%', {'POLLS_METRICS_SAMPLE_RATE': 1.0}),
+            ]
+            for _ in range(50):
+                client.get(url)
+            baseline = None
+            for label, overrides in runs:
+                registry.reset()
+                samples = []
+                with override_settings(**overrides):
+                    for _ in range(options['requests']):
+                        with Timer() as timer:
+                            client.get(url)
+                        samples.append(timer.elapsed)
+                stats = summarize(samples)
+                mean = sum(samples) / len(samples) * 1000
+                baseline = baseline or mean
+                self.stdout.write(
+                    '{:<14} mean={:.3f}ms (+{:.3f}ms) '
+                    'p50={:.3f}ms p95={:.3f}ms'.format(
+                        label, mean, mean - baseline,
+                        stats['p50_ms'], stats['p95_ms']))
+            self.isolated_overhead(options['requests'] * 10)
+
+    def isolated_overhead(self, count):
+        """Time the middleware around a no-op view, free of request noise."""
+        request = RequestFactory().get('/')
+        request.resolver_match = None
+        response = HttpResponse('x' * 1000)
+        middleware = PerformanceMiddleware(lambda request: response)
+        for rate in (0.0, 1.0):
+            timer = Timer()
+            with override_settings(POLLS_METRICS_SAMPLE_RATE=rate), timer:
+                for _ in range(count):
+                    middleware(request)
+            self.stdout.write(
+                'isolated middleware cost at sample rate {:.0%}: '
+                '{:.1f}us/request'.format(rate, timer.elapsed / count * 1e6))
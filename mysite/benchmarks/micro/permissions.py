@@ -0,0 +1,62 @@
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question
+from polls.querybudget import count_queries
+
+from ..seed import create_user
+from ..utils import Timer, benchmark_database, summarize
+from . import MicroBenchmark
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Measure queries and latency per detail request for a user with many '
+        'groups, with ModelBackend and with '
+        'polls.backends.CachedPermissionBackend.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--groups', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            question = Question.objects.create(
+                question_text='Benchmark question', pub_date=timezone.now())
+            user = create_user()
+            permissions = list(Permission.objects.all())
+            for i in range(options['groups']):
+                group = Group.objects.create(name='Group {}'.format(i))
+                group.permissions.add(*permissions[i % len(permissions):][:10])
+                user.groups.add(group)
+            user.groups.first().permissions.add(Permission.objects.get(
+                content_type__app_label='polls', codename='view_question'))
+            url = reverse('polls:detail', args=(question.id,))
+
+            for backend in ('django.contrib.auth.backends.ModelBackend',
+                            'polls.backends.CachedPermissionBackend'):
+                cache.clear()
+                samples = []
+                queries = 0
+                with override_settings(AUTHENTICATION_BACKENDS=[backend]):
+                    client = Client()
+                    client.force_login(user)
+                    for _ in range(options['requests']):
+                        with Timer() as timer, count_queries() as counter:
+                            response = client.get(url)
+                        status = response.status_code
+                        assert status == 200, status
+                        samples.append(timer.elapsed)
+                        queries += counter.count
+                stats = summarize(samples)
+                self.stdout.write(
+                    '{:<24} {:>5.2f} queries/req {:>8.0f} req/s  '
+                    'p50={:.2f}ms p95={:.2f}ms'.format(
+                        backend.rsplit('.', 1)[1], queries / len(samples),
+                        len(samples) / sum(samples),
+                        stats['p50_ms'], stats['p95_ms']))
@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.cache import results_stats
+from polls.models import Choice, Question
+
+from ..seed import create_user
+from ..utils import Timer, benchmark_database, summarize
+from . import MicroBenchmark
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Measure results page requests/sec with and without the results '
+        'cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--choices', type=int, default=20)
+        parser.add_argument('--vote-every', type=int, default=0,
+                            help='Invalidate the cached results every N '
+                                 'requests.')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            question = Question.objects.create(
+                question_text='Benchmark question', pub_date=timezone.now())
+            Choice.objects.bulk_create(
+                Choice(question=question, choice_text='Choice {}'.format(i),
+                       votes=i)
+                for i in range(options['choices']))
+            user = create_user('view_question')
+            client = Client()
+            client.force_login(user)
+            url = reverse('polls:results', args=(question.id,))
+
+            for enabled in (False, True):
+                cache.clear()
+                results_stats.reset()
+                with override_settings(POLLS_RESULTS_CACHE=enabled):
+                    samples = self.run(client, url, question, options)
+                stats = summarize(samples)
+                self.stdout.write(
+                    'cache={:<5} {:>8.0f} req/s  '
+                    'p50={:.2f}ms p95={:.2f}ms  {}'.format(
+                        str(enabled), len(samples) / sum(samples),
+                        stats['p50_ms'], stats['p95_ms'],
+                        results_stats.snapshot()))
+
+    def run(self, client, url, question, options):
+        samples = []
+        vote_every = options['vote_every']
+        choice = question.choice_set.first()
+        for i in range(options['requests']):
+            if vote_every and i % vote_every == 0:
+                choice.save()
+            with Timer() as timer:
+                response = client.get(url)
+            assert response.status_code == 200, response.status_code
+            samples.append(timer.elapsed)
+        return samples
@@ -0,0 +1,94 @@
+import random
+
+from django.utils import timezone
+
+from polls.models import Question
+from polls.search import ranked_question_ids, search_questions
+from polls.transfer import import_questions
+
+from ..utils import Timer, benchmark_database, summarize
+from . import MicroBenchmark
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Compare admin-style LIKE search with the polls.search full-text '
+        'index over a large table of generated questions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=1000000)
+        parser.add_argument('--choices', type=int, default=2)
+        parser.add_argument('--vocabulary', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        vocabulary = sorted(
+            {self.word(rng) for _ in range(options['vocabulary'] * 2)})
+        rng.shuffle(vocabulary)
+        vocabulary = vocabulary[:options['vocabulary']]
+        # Zipf-like: the n-th word is n times rarer than the first.
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+        with benchmark_database():
+            records = self.records(rng, vocabulary, weights, options)
+            with Timer() as timer:
+                for _ in import_questions(enumerate(records, 1)):
+                    pass
+            self.stdout.write('Seeded {} questions in {:.0f}s.'.format(
+                options['questions'], timer.elapsed))
+            mid = vocabulary[len(vocabulary) // 50]
+            terms = [
+                ('common word', vocabulary[0]),
+                ('mid word', mid),
+                ('rare word', vocabulary[-1]),
+                ('prefix', mid[:3]),
+                ('two words', '{} {}'.format(vocabulary[1], vocabulary[2])),
+            ]
+            paths = [
+                ('LIKE', lambda term: self.page(
+                    Question.objects.filter(question_text__icontains=term))),
+                ('FTS', lambda term: self.page(
+                    search_questions(Question.objects.all(), term))),
+                ('FTS ranked', lambda term: ranked_question_ids(
+                    term, timezone.now(), 20)),
+            ]
+            self.stdout.write('{:<12}{:<18}{:<12}{:>10}{:>10}'.format(
+                'terms', '', 'path', 'p50 ms', 'p95 ms'))
+            for label, term in terms:
+                for name, search in paths:
+                    samples = []
+                    for _ in range(options['repeat']):
+                        with Timer() as timer:
+                            search(term)
+                        samples.append(timer.elapsed)
+                    stats = summarize(samples)
+                    self.stdout.write(
+                        '{:<12}{:<18}{:<12}{:>10.2f}{:>10.2f}'.format(
+                            label, term, name,
+                            stats['p50_ms'], stats['p95_ms']))
+
+    def word(self, rng):
+        return ''.join(
+            rng.choice('bcdfghjklmnprstwz') + rng.choice('aeiouy')
+            for _ in range(rng.randint(2, 4)))
+
+    def records(self, rng, vocabulary, weights, options):
+        pub_date = timezone.now().isoformat()
+
+        def words(k):
+            return ' '.join(rng.choices(vocabulary, weights, k=k))
+
+        for _ in range(options['questions']):
+            yield {
+                'question_text': words(6).capitalize() + '?',
+                'pub_date': pub_date,
+                'choices': [
+                    {'choice_text': words(2)}
+                    for _ in range(options['choices'])
+                ],
+            }
+
+    def page(self, queryset):
+        """What the admin changelist runs: a count and the first page."""
+        return queryset.count(), list(queryset.order_by('-pk')[:100])
@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question
+
+from ..seed import create_user
+from ..utils import Timer, benchmark_database
+from . import MicroBenchmark
+
+MODES = [
+    ('db+fallback', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'MESSAGE_STORAGE':
+            'django.contrib.messages.storage.fallback.FallbackStorage',
+    }),
+    ('cached_db', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+    }),
+    ('signed_cookies', {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+    }),
+]
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Report queries per request (total and on django_session) for each '
+        'polls view under the db, cached_db and signed_cookies session modes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            question = Question.objects.create(
+                question_text='Benchmark question', pub_date=timezone.now())
+            choice = Choice.objects.create(
+                question=question, choice_text='Choice')
+            user = create_user('view_question', 'change_choice')
+            args = (question.id,)
+            vote_url = reverse('polls:vote', args=args)
+            steps = [
+                ('login (anonymous)', 'get', reverse('login'), None, False),
+                ('index', 'get', reverse('polls:index'), None, True),
+                ('detail', 'get', reverse('polls:detail', args=args),
+                 None, True),
+                ('results', 'get', reverse('polls:results', args=args),
+                 None, True),
+                ('vote', 'post', vote_url, {'choice': choice.id}, True),
+                ('vote (message)', 'post', vote_url, {}, True),
+            ]
+            self.stdout.write('{:<18}'.format('view') + ''.join(
+                '{:>26}'.format(label) for label, _ in MODES))
+            rows = {name: [] for name, *_ in steps}
+            for label, overrides in MODES:
+                cache.clear()
+                with override_settings(**overrides):
+                    anonymous, client = Client(), Client()
+                    client.force_login(user)
+                    for name, method, url, data, logged_in in steps:
+                        rows[name].append(self.measure(
+                            client if logged_in else anonymous,
+                            method, url, data, options['requests']))
+            for name, results in rows.items():
+                self.stdout.write('{:<18}'.format(name) + ''.join(
+                    '{:>26}'.format(
+                        '{:.1f} q ({:.1f} sess) {:.2f}ms'.format(*result))
+                    for result in results))
+
+    def measure(self, client, method, url, data, count):
+        queries = session_queries = elapsed = 0
+        for _ in range(count):
+            timer = Timer()
+            with CaptureQueriesContext(connection) as captured, timer:
+                getattr(client, method)(url, data)
+            elapsed += timer.elapsed
+            queries += len(captured)
+            session_queries += sum('django_session' in q['sql']
+                                   for q in captured.captured_queries)
+        return queries / count, session_queries / count, elapsed / count * 1000
@@ -0,0 +1,101 @@
+import multiprocessing
+import random
+import time
+
+from django.db import OperationalError, connections, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from polls.cache import load_results
+from polls.models import Choice, Question
+from polls.votes import record_vote
+
+from ..utils import benchmark_database
+from . import MicroBenchmark
+
+PROFILES = [
+    # Django's defaults: rollback journal, FULL sync, no retries.
+    ('default', {
+        'POLLS_SQLITE_PRAGMAS': {'journal_mode': 'delete'},
+        'POLLS_SQLITE_TRANSACTION_MODE': None,
+        'POLLS_VOTE_BUSY_RETRIES': 0,
+    }),
+    ('tuned', {}),
+]
+
+
+def vote_worker(choice_ids, votes, reads_per_vote, results):
+    connections.close_all()
+    done = errors = 0
+    start = time.perf_counter()
+    for _ in range(votes):
+        choice_id = random.choice(choice_ids)
+        try:
+            # A vote request under ATOMIC_REQUESTS: reads, then the write.
+            with transaction.atomic():
+                choice = Choice.objects.select_related('question').get(
+                    pk=choice_id)
+                record_vote(choice)
+            for _ in range(reads_per_vote):
+                load_results(choice.question_id)
+        except OperationalError:
+            errors += 1
+        else:
+            done += 1
+    results.put((done, errors, time.perf_counter() - start))
+    connections.close_all()
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Vote from several processes at once against a file-based SQLite '
+        'database, with the stock SQLite setup and with '
+        'POLLS_SQLITE_PRAGMAS and retry-on-busy, and report lock errors and '
+        'throughput.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--votes', type=int, default=300,
+                            help='Votes per process.')
+        parser.add_argument('--reads-per-vote', type=int, default=2)
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        for label, overrides in PROFILES:
+            profile = override_settings(POLLS_VOTE_MODE='atomic', **overrides)
+            with profile, benchmark_database():
+                question = Question.objects.create(
+                    question_text='Benchmark question',
+                    pub_date=timezone.now())
+                choice_ids = [
+                    Choice.objects.create(
+                        question=question,
+                        choice_text='Choice {}'.format(i)).pk
+                    for i in range(4)
+                ]
+                connections.close_all()
+                results = context.Queue()
+                workers = [
+                    context.Process(target=vote_worker, args=(
+                        choice_ids, options['votes'],
+                        options['reads_per_vote'], results))
+                    for _ in range(options['processes'])
+                ]
+                start = time.perf_counter()
+                for worker in workers:
+                    worker.start()
+                outcomes = [results.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+                elapsed = time.perf_counter() - start
+                done = sum(outcome[0] for outcome in outcomes)
+                errors = sum(outcome[1] for outcome in outcomes)
+                counted = sum(Choice.objects.values_list('votes', flat=True))
+                with connections['default'].cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    journal = cursor.fetchone()[0]
+                self.stdout.write(
+                    '{:<8} journal={:<7} {:>7.0f} votes/s  {:>5} lock errors  '
+                    '{} votes counted'.format(
+                        label, journal, done / elapsed, errors, counted))
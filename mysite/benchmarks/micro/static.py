@@ -0,0 +1,129 @@
+import re
+import tempfile
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.staticfiles.handlers import StaticFilesHandler
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question
+from polls.staticserve import StaticFilesApplication
+
+from ..seed import create_user
+from ..utils import benchmark_database
+from . import MicroBenchmark
+
+ACCEPT_ENCODING = 'gzip, deflate, br'
+ROW = '{:<8}{:<15}{:>11}{:>13}{:>12}{:>14}'
+STATIC_URL_RE = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+
+
+class Browser:
+    """
+    A browser cache: responses with a fresh max-age are reused without a
+    request, others are revalidated with their ETag or Last-Modified.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.cache = {}
+
+    def load(self, urls):
+        """Fetch `urls` and return (requests sent, bytes received)."""
+        requests = received = 0
+        for url in urls:
+            cached = self.cache.get(url)
+            if (cached is not None
+                    and 'max-age=' in cached.get('Cache-Control', '')):
+                continue
+            environ = {
+                'PATH_INFO': url,
+                'REQUEST_METHOD': 'GET',
+                'HTTP_ACCEPT_ENCODING': ACCEPT_ENCODING,
+            }
+            if cached is not None:
+                if 'ETag' in cached:
+                    environ['HTTP_IF_NONE_MATCH'] = cached['ETag']
+                if 'Last-Modified' in cached:
+                    environ['HTTP_IF_MODIFIED_SINCE'] = cached['Last-Modified']
+            status, headers, body = self.request(environ)
+            requests += 1
+            # Status line, headers and body, as they go over HTTP/1.1.
+            received += len('HTTP/1.1 {}\r\n\r\n'.format(status)) + len(body)
+            received += sum(len(k) + len(v) + 4 for k, v in headers.items())
+            if status.startswith('200'):
+                self.cache[url] = headers
+        return requests, received
+
+    def request(self, environ):
+        setup_testing_defaults(environ)
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = status
+            started['headers'] = dict(headers)
+
+        response = self.application(environ, start_response)
+        try:
+            body = b''.join(response)
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return started['status'], started['headers'], body
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Count the static requests and bytes of a first and a repeat load of '
+        'the polls index and the admin login page, served by the development '
+        'static handler versus collectstatic output served by '
+        'polls.staticserve.'
+    )
+
+    def handle(self, *args, **options):
+        static_dir = tempfile.TemporaryDirectory()
+        with benchmark_database(), static_dir as static_root:
+            user = create_user('view_question')
+            question = Question.objects.create(
+                question_text='Benchmark question', pub_date=timezone.now())
+            Choice.objects.create(question=question, choice_text='Choice')
+            runs = [
+                ('before', {
+                    'STATICFILES_STORAGE': (
+                        'django.contrib.staticfiles.storage.'
+                        'StaticFilesStorage'),
+                }, lambda: StaticFilesHandler(WSGIHandler())),
+                ('after', {
+                    'STATICFILES_STORAGE': (
+                        'polls.staticfiles.'
+                        'CompressedManifestStaticFilesStorage'),
+                    'STATIC_ROOT': static_root,
+                }, lambda: StaticFilesApplication(
+                    WSGIHandler(), root=static_root)),
+            ]
+            self.stdout.write(ROW.format(
+                '', 'page', 'first req', 'first bytes',
+                'repeat req', 'repeat bytes'))
+            for label, overrides, application in runs:
+                with override_settings(**overrides):
+                    if 'STATIC_ROOT' in overrides:
+                        call_command('collectstatic', interactive=False,
+                                     verbosity=0)
+                    cache.clear()
+                    client = Client()
+                    client.force_login(user)
+                    browser = Browser(application())
+                    pages = (reverse('polls:index'), reverse('admin:login'))
+                    for page in pages:
+                        html = client.get(page).content.decode()
+                        urls = STATIC_URL_RE.findall(html)
+                        first = browser.load(urls)
+                        repeat = browser.load(urls)
+                        self.stdout.write(ROW.format(
+                            label, page, first[0], first[1],
+                            repeat[0], repeat[1]))
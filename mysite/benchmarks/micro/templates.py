@@ -0,0 +1,108 @@
+import copy
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template import engines
+from django.test import Client
+from django.test.utils import ContextList
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question
+from polls.warmup import warm_templates
+
+from ..seed import create_user
+from ..utils import Timer, benchmark_database, summarize
+from . import MicroBenchmark
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+CACHED_LOADERS = [('django.template.loaders.cached.Loader', LOADERS)]
+
+
+def templates_with_loaders(loaders):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['APP_DIRS'] = False
+    templates[0]['OPTIONS']['loaders'] = loaders
+    return templates
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Compare first and steady-state load+render time of each page '
+        'template with uncached template loaders, the cached loader, and the '
+        'cached loader warmed by polls.warmup.warm_templates().'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            user = create_user('view_question', 'add_question',
+                               'change_question', 'change_choice')
+            question = Question.objects.create(
+                question_text='Benchmark question', pub_date=timezone.now())
+            choice = Choice.objects.create(
+                question=question, choice_text='Choice', votes=1)
+            client = Client()
+            client.force_login(user)
+            pages = [
+                reverse('polls:index'),
+                reverse('polls:detail', args=(question.pk,)),
+                reverse('polls:results', args=(question.pk,)),
+                reverse('polls:top'),
+                reverse('polls:edit', args=(question.pk,)),
+                reverse('polls:add_choice', args=(question.pk,)),
+                reverse('polls:edit_choice', args=(question.pk, choice.pk)),
+                reverse('login'),
+                reverse('register'),
+            ]
+            runs = [
+                ('uncached', templates_with_loaders(LOADERS), False),
+                ('cached', templates_with_loaders(CACHED_LOADERS), False),
+                ('warmed', templates_with_loaders(CACHED_LOADERS), True),
+            ]
+            renders = [self.capture(client, url) for url in pages]
+            results = {}
+            for label, templates, warm in runs:
+                # Cached fragments would hide the cost of their templates.
+                with override_settings(TEMPLATES=templates,
+                                       POLLS_FRAGMENT_CACHE_TIMEOUT=0):
+                    backend = engines.all()[0]
+                    if warm:
+                        compiled = warm_templates()
+                        seconds = sum(seconds for _, seconds, _ in compiled)
+                        self.stdout.write(
+                            'warm_templates: {} templates in {:.1f}ms'.format(
+                                len(compiled), seconds * 1000))
+                    for name, context, request in renders:
+                        samples = []
+                        for _ in range(options['requests'] + 1):
+                            with Timer() as timer:
+                                template = backend.get_template(name)
+                                template.render(context, request)
+                            samples.append(timer.elapsed)
+                        results[label, name] = (
+                            samples[0] * 1000,
+                            summarize(samples[1:])['p50_ms'])
+            self.stdout.write('{:<24}'.format('template') + ''.join(
+                '{:>22}'.format(label + ' first/p50 ms')
+                for label, _, _ in runs))
+            for name, _, _ in renders:
+                self.stdout.write('{:<24}'.format(name) + ''.join(
+                    '{:>13.2f}/{:<8.2f}'.format(*results[label, name])
+                    for label, _, _ in runs))
+
+    def capture(self, client, url):
+        """The template name, context and request a page renders with."""
+        cache.clear()
+        response = client.get(url)
+        context = response.context
+        if isinstance(context, ContextList):
+            context = context[0]
+        return (response.templates[0].name, context.flatten(),
+                response.wsgi_request)
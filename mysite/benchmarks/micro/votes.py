@@ -0,0 +1,94 @@
+import random
+import threading
+
+from django.db import OperationalError, connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from polls.models import Choice, Question
+from polls.votes import VoteBuffer, compact_shards, record_vote
+
+from ..utils import Timer, benchmark_database
+from . import MicroBenchmark
+
+MODES = ['naive', 'atomic', 'buffered', 'sharded']
+
+
+def naive_vote(choice):
+    choice = Choice.objects.get(pk=choice.pk)
+    choice.votes += 1
+    choice.save()
+
+
+class Benchmark(MicroBenchmark):
+    help = (
+        'Load test the vote ingestion engines against a throwaway copy of the '
+        'configured database and report throughput and lost votes. Point '
+        'DJANGO_SETTINGS_MODULE at a PostgreSQL profile to benchmark it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--voters', type=int, nargs='+',
+                            default=[1, 8, 64])
+        parser.add_argument('--votes-per-voter', type=int, default=200)
+        parser.add_argument('--choices', type=int, default=4)
+        parser.add_argument('--modes', nargs='+', default=MODES,
+                            choices=MODES)
+        parser.add_argument('--shards', type=int, default=16)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            question = Question.objects.create(
+                question_text='Benchmark question', pub_date=timezone.now(),
+                vote_shard_count=options['shards'])
+            choices = [
+                Choice.objects.create(question=question, choice_text=str(i))
+                for i in range(options['choices'])
+            ]
+            self.stdout.write('{:<10}{:>8}{:>10}{:>10}{:>8}{:>12}'.format(
+                'mode', 'voters', 'votes', 'failed', 'lost', 'votes/s'))
+            for mode in options['modes']:
+                for voters in options['voters']:
+                    with override_settings(POLLS_VOTE_MODE=mode):
+                        self.run(mode, voters, options['votes_per_voter'],
+                                 choices)
+
+    def run(self, mode, voters, votes_per_voter, choices):
+        compact_shards()
+        benchmark_choices = Choice.objects.filter(
+            pk__in=[choice.pk for choice in choices])
+        benchmark_choices.update(votes=0)
+        connection.close()
+        buffer = VoteBuffer(threshold=500, interval=0.1)
+        engines = {
+            'naive': naive_vote,
+            'buffered': lambda choice: buffer.add(choice.pk),
+        }
+        vote = engines.get(mode, record_vote)
+        failures = []
+
+        def voter():
+            failed = 0
+            for _ in range(votes_per_voter):
+                try:
+                    vote(random.choice(choices))
+                except OperationalError:
+                    failed += 1
+            failures.append(failed)
+            connection.close()
+
+        threads = [threading.Thread(target=voter) for _ in range(voters)]
+        with Timer() as timer:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            buffer.flush()
+
+        sent = voters * votes_per_voter
+        failed = sum(failures)
+        counted = sum(benchmark_choices.with_vote_totals().values_list(
+            'vote_total', flat=True))
+        self.stdout.write('{:<10}{:>8}{:>10}{:>10}{:>8}{:>12.0f}'.format(
+            mode, voters, sent, failed, sent - failed - counted,
+            (sent - failed) / timer.elapsed))
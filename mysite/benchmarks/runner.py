@@ -0,0 +1,231 @@
+import argparse
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+from . import micro
+from .clients import HttpClient, LocalClient
+from .scenarios import ANONYMOUS, SCENARIOS
+from .seed import seed
+from .utils import Timer, benchmark_database, percentile, split
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def run_scenario(name, dataset, make_client, requests, concurrency,
+                 rng_seed=0):
+    """
+    Replay `requests` requests of scenario `name` from `concurrency`
+    threads, each with its own client, and return the scenario's report.
+    """
+    scenario = SCENARIOS[name]
+
+    def worker(index, count):
+        rng = random.Random('{}-{}-{}'.format(rng_seed, name, index))
+        client = make_client()
+        if name not in ANONYMOUS:
+            client.login(rng.choice(dataset.usernames))
+        samples, queries, errors = [], [], 0
+        for _ in range(count):
+            method, path, data = scenario(dataset, rng)
+            with Timer() as timer:
+                status, query_count = client.request(method, path, data)
+            samples.append(timer.elapsed)
+            if query_count is not None:
+                queries.append(query_count)
+            errors += status >= 400
+        connections.close_all()
+        return samples, queries, errors
+
+    connections.close_all()
+    with ThreadPoolExecutor(concurrency) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(
+            worker, range(concurrency), split(requests, concurrency)))
+        elapsed = time.perf_counter() - start
+    samples = [s for result in results for s in result[0]]
+    queries = [q for result in results for q in result[1]]
+    report = {
+        'requests': len(samples),
+        'errors': sum(result[2] for result in results),
+        'throughput_rps': len(samples) / elapsed if elapsed else 0.0,
+        'latency_ms': {
+            'p{}'.format(pct): percentile(samples, pct) * 1000
+            for pct in PERCENTILES
+        },
+        'queries_per_request': (
+            sum(queries) / len(queries) if queries else None),
+    }
+    report['latency_ms']['mean'] = (
+        sum(samples) / len(samples) * 1000 if samples else 0.0)
+    return report
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_name, timeout=30):
+    """
+    Start `manage.py runserver` on the seeded database with
+    benchmarks.settings and return (process, base URL) once it accepts
+    connections.
+    """
+    port = free_port()
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings',
+               POLLS_BENCHMARK_DATABASE=database_name)
+    process = subprocess.Popen(
+        [sys.executable, 'manage.py', 'runserver', '--noreload',
+         '127.0.0.1:{}'.format(port)],
+        cwd=settings.BASE_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('runserver exited with status {}.'.format(
+                process.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, 'http://127.0.0.1:{}'.format(port)
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('runserver did not start within {}s.'.format(timeout))
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(options):
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'mode': 'server' if options.server else 'client',
+        'config': {
+            'requests': options.requests, 'concurrency': options.concurrency,
+            'questions': options.questions, 'choices': options.choices,
+            'users': options.users,
+        },
+        'scenarios': {},
+    }
+    with benchmark_database() as connection:
+        dataset = seed(options.questions, options.choices, options.users)
+        server = None
+        if options.server:
+            connections.close_all()
+            server, base_url = start_server(connection.settings_dict['NAME'])
+            make_client = lambda: HttpClient(base_url)  # noqa: E731
+        else:
+            make_client = LocalClient
+        try:
+            for name in options.scenarios:
+                result = run_scenario(
+                    name, dataset, make_client,
+                    options.requests, options.concurrency)
+                report['scenarios'][name] = result
+                print_result(name, result)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+def print_result(name, result):
+    latency = result['latency_ms']
+    queries = result['queries_per_request']
+    print('{:<8} {:>6} req {:>4} err {:>8.1f} req/s  '
+          'p50 {:>7.2f}  p90 {:>7.2f}  p95 {:>7.2f}  p99 {:>7.2f} ms  '
+          '{} queries/req'.format(
+              name, result['requests'], result['errors'],
+              result['throughput_rps'],
+              latency['p50'], latency['p90'], latency['p95'], latency['p99'],
+              '-' if queries is None else '{:.1f}'.format(queries)))
+
+
+def compare(options):
+    """Print the change of each scenario's metrics from `base` to `head`."""
+    with open(options.base) as f:
+        base = json.load(f)
+    with open(options.head) as f:
+        head = json.load(f)
+    print('{} -> {}'.format(base.get('commit'), head.get('commit')))
+    for name, after in head['scenarios'].items():
+        before = base['scenarios'].get(name)
+        if before is None:
+            continue
+        rows = [('req/s', before['throughput_rps'], after['throughput_rps'])]
+        rows += [
+            (key + ' ms', before['latency_ms'][key], after['latency_ms'][key])
+            for key in ('p50', 'p95', 'p99')
+        ]
+        queries = before['queries_per_request'], after['queries_per_request']
+        if None not in queries:
+            rows.append(('queries',) + queries)
+        print(name)
+        for label, old, new in rows:
+            change = (new - old) / old * 100 if old else 0.0
+            print('  {:<8} {:>10.2f} {:>10.2f} {:>+8.1f}%'.format(
+                label, old, new, change))
+    return 0
+
+
+def run_micro(options):
+    micro.load(options.benchmark)().handle(**vars(options))
+    return 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser(
+        'run', help='Seed a throwaway database and replay the scenarios.')
+    run_parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS),
+                            default=list(SCENARIOS))
+    run_parser.add_argument('--requests', type=int, default=500,
+                            help='Requests per scenario.')
+    run_parser.add_argument('--concurrency', type=int, default=1)
+    run_parser.add_argument('--questions', type=int, default=2000)
+    run_parser.add_argument('--choices', type=int, default=20)
+    run_parser.add_argument('--users', type=int, default=50)
+    run_parser.add_argument('--server', action='store_true',
+                            help='Send the requests over HTTP to a runserver '
+                                 'started on the seeded database.')
+    run_parser.add_argument('--output',
+                            help='Write the report to this JSON file.')
+    run_parser.set_defaults(func=run)
+    compare_parser = commands.add_parser(
+        'compare', help='Compare two JSON reports.')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    compare_parser.set_defaults(func=compare)
+    micro_parser = commands.add_parser(
+        'micro', help='Run one of the benchmarks in benchmarks.micro.')
+    benchmarks = micro_parser.add_subparsers(dest='benchmark', required=True)
+    for name in micro.names():
+        benchmark = micro.load(name)()
+        benchmark.add_arguments(benchmarks.add_parser(
+            name, help=benchmark.help, description=benchmark.help))
+    micro_parser.set_defaults(func=run_micro)
+    options = parser.parse_args(argv)
+    return options.func(options)
@@ -0,0 +1,47 @@
+"""
+Scenarios: functions of (dataset, rng) returning the (method, path, data)
+of the next request. All but those in ANONYMOUS run logged in.
+"""
+from django.urls import reverse
+
+from .seed import PASSWORD
+
+
+def index(dataset, rng):
+    return 'get', reverse('polls:index'), None
+
+
+def detail(dataset, rng):
+    question_id = rng.choice(dataset.question_ids)
+    return 'get', reverse('polls:detail', args=(question_id,)), None
+
+
+def results(dataset, rng):
+    question_id = rng.choice(dataset.question_ids)
+    return 'get', reverse('polls:results', args=(question_id,)), None
+
+
+def vote(dataset, rng):
+    question_id = rng.choice(dataset.question_ids)
+    choice_id = rng.choice(dataset.choices_by_question[question_id])
+    path = reverse('polls:vote', args=(question_id,))
+    return 'post', path, {'choice': choice_id}
+
+
+def login(dataset, rng):
+    credentials = {
+        'username': rng.choice(dataset.usernames),
+        'password': PASSWORD,
+    }
+    return 'post', reverse('login'), credentials
+
+
+SCENARIOS = {
+    'index': index,
+    'detail': detail,
+    'results': results,
+    'vote': vote,
+    'login': login,
+}
+
+ANONYMOUS = {'login'}
@@ -0,0 +1,85 @@
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Permission, User
+from django.utils import timezone
+
+from polls.models import Choice
+from polls.transfer import import_questions
+
+USERNAME = 'bench{}'
+PASSWORD = 'benchmark'
+PERMISSIONS = [
+    'view_question', 'add_question', 'change_question', 'change_choice']
+
+
+class Dataset:
+    """Ids the scenarios draw requests from."""
+
+    def __init__(self, choices_by_question, usernames):
+        self.choices_by_question = choices_by_question
+        self.question_ids = sorted(choices_by_question)
+        self.usernames = usernames
+
+    @classmethod
+    def load(cls):
+        choices_by_question = {}
+        choices = Choice.objects.order_by('pk')
+        for choice_id, question_id in choices.values_list('pk', 'question_id'):
+            choices_by_question.setdefault(question_id, []).append(choice_id)
+        usernames = list(User.objects.filter(
+            username__startswith=USERNAME.format(''),
+        ).values_list('username', flat=True))
+        return cls(choices_by_question, usernames)
+
+
+def create_user(*codenames):
+    """
+    A user named 'bench' (password PASSWORD) holding the polls permissions
+    `codenames`.
+    """
+    user = User.objects.create_user(username='bench', password=PASSWORD)
+    user.user_permissions.add(*Permission.objects.filter(
+        content_type__app_label='polls', codename__in=codenames))
+    return user
+
+
+def question_records(count, choices, rng):
+    now = timezone.now()
+    for i in range(count):
+        yield {
+            'question_text': 'Benchmark question {}?'.format(i),
+            'pub_date': (now - datetime.timedelta(minutes=i + 1)).isoformat(),
+            'choices': [
+                {'choice_text': 'Choice {}'.format(j),
+                 'votes': rng.randrange(100)}
+                for j in range(choices)
+            ],
+        }
+
+
+def seed(questions=2000, choices=20, users=50, rng_seed=0):
+    """
+    Create `questions` published questions with `choices` choices each and
+    `users` users (password PASSWORD) holding the polls PERMISSIONS, and
+    return their Dataset.
+    """
+    rng = random.Random(rng_seed)
+    records = question_records(questions, choices, rng)
+    for _ in import_questions(enumerate(records, 1)):
+        pass
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        User(username=USERNAME.format(i), password=password)
+        for i in range(users))
+    user_ids = User.objects.filter(
+        username__startswith=USERNAME.format('')).values_list('pk', flat=True)
+    permission_ids = Permission.objects.filter(
+        content_type__app_label='polls', codename__in=PERMISSIONS,
+    ).values_list('pk', flat=True)
+    UserPermission = User.user_permissions.through
+    UserPermission.objects.bulk_create(
+        UserPermission(user_id=user_id, permission_id=permission_id)
+        for user_id in user_ids for permission_id in permission_ids)
+    return Dataset.load()
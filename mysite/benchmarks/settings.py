@@ -0,0 +1,19 @@
+"""
+Settings for the runserver started by `python -m benchmarks run --server`.
+"""
+import os
+
+from mysite.settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+DATABASES = {
+    'default': dict(
+        DATABASES['default'],  # noqa: F405
+        NAME=os.environ['POLLS_BENCHMARK_DATABASE'],
+    ),
+}
+
+POLLS_QUERY_BUDGET_STRICT = False
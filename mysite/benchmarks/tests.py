@@ -0,0 +1,65 @@
+import argparse
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Sum
+from django.test import SimpleTestCase, TransactionTestCase
+
+from polls.models import Choice, Question
+
+from . import micro
+from .clients import LocalClient
+from .runner import run_scenario
+from .seed import seed
+from .utils import percentile, split
+
+
+class BenchmarkSuiteTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seed(self):
+        dataset = seed(questions=3, choices=4, users=2)
+        self.assertEqual(len(dataset.question_ids), 3)
+        self.assertTrue(all(
+            len(ids) == 4 for ids in dataset.choices_by_question.values()))
+        self.assertEqual(len(dataset.usernames), 2)
+        user = User.objects.get(username=dataset.usernames[0])
+        self.assertTrue(user.has_perm('polls.change_choice'))
+        self.assertTrue(self.client.login(
+            username=user.username, password='benchmark'))
+
+    def test_run_scenarios(self):
+        dataset = seed(questions=3, choices=2, users=1)
+        for name in ('index', 'detail', 'results', 'vote'):
+            result = run_scenario(
+                name, dataset, LocalClient, requests=4, concurrency=1)
+            self.assertEqual(result['requests'], 4)
+            self.assertEqual(result['errors'], 0, name)
+            self.assertGreater(result['queries_per_request'], 0)
+            self.assertGreater(result['latency_ms']['p99'], 0)
+        self.assertEqual(
+            Question.objects.aggregate(total=Sum('total_votes'))['total'],
+            Choice.objects.aggregate(total=Sum('votes'))['total'])
+
+
+class UtilsTests(SimpleTestCase):
+
+    def test_split(self):
+        self.assertEqual(split(10, 3), [4, 3, 3])
+        self.assertEqual(split(2, 4), [1, 1, 0, 0])
+
+    def test_percentile(self):
+        samples = [0.4, 0.1, 0.3, 0.2]
+        self.assertEqual(percentile(samples, 50), 0.2)
+        self.assertEqual(percentile(samples, 100), 0.4)
+        self.assertEqual(percentile([], 99), 0.0)
+
+    def test_micro_benchmarks_load(self):
+        self.assertIn('fragments', micro.names())
+        for name in micro.names():
+            benchmark = micro.load(name)(stdout=StringIO())
+            self.assertTrue(benchmark.help, name)
+            benchmark.add_arguments(argparse.ArgumentParser())
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def benchmark_database(using='default', keepdb=False):
+    """
+    Run the body against a freshly migrated throwaway database so benchmarks
+    never touch real data. SQLite test databases are file based (instead of
+    Django's in-memory default) so several threads or processes can share
+    them.
+    """
+    connection = connections[using]
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+        test_settings['NAME'] = os.path.join(
+            tempfile.gettempdir(), 'polls-benchmark.sqlite3')
+    setup_test_environment()
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield connection
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(
+            old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+class Timer:
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def split(total, parts):
+    """`total` spread as evenly as possible over `parts` workers."""
+    return [total // parts + (1 if i < total % parts else 0)
+            for i in range(parts)]
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of `samples` (pct in 0-100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(int(round(pct / 100.0 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    return {
+        'count': len(samples),
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+    }
@@ -0,0 +1,89 @@
+"""
+PostgreSQL backend with an optional in-process connection pool and
+per-request connection health checks.
+
+    'ENGINE': 'mysite.db.backends.postgresql',
+    'CONN_HEALTH_CHECKS': True,
+    'POOL': {'min_size': 2, 'max_size': 20},
+
+With POOL, closing a connection (which Django does at the end of every
+request when CONN_MAX_AGE is 0) returns it to the pool instead. The pool
+raises psycopg2.pool.PoolError once max_size connections are checked out,
+so size it to the number of server threads. CONN_HEALTH_CHECKS pings a
+reused connection before its first query of each request and reconnects
+if the server went away.
+"""
+import os
+import threading
+
+import psycopg2.extras
+from psycopg2.pool import ThreadedConnectionPool
+
+from django.db.backends.postgresql import base
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        # A pool must not be shared with a forked child process.
+        key = (self.alias, os.getpid())
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key] = ThreadedConnectionPool(
+                    options.get('min_size', 1), options.get('max_size', 10),
+                    **conn_params)
+            return _pools[key]
+
+    def get_new_connection(self, conn_params):
+        self.health_check_done = True
+        pool = self.get_pool(conn_params)
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connection = pool.getconn()
+        # As in the parent class, minus the connect().
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        pool = None
+        if self.connection is not None:
+            pool = self.get_pool(self.get_connection_params())
+        if pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            # putconn() rolls back an open transaction before reuse.
+            pool.putconn(
+                self.connection,
+                close=self.connection.closed or self.errors_occurred)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (self.connection is not None and not self.health_check_done
+                and self.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not self.in_atomic_block):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
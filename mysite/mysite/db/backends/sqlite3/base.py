@@ -0,0 +1,30 @@
+"""
+SQLite backend applying settings.POLLS_SQLITE_PRAGMAS to every new
+connection, e.g.
+
+    POLLS_SQLITE_PRAGMAS = {'journal_mode': 'wal', 'busy_timeout': 5000}
+
+and opening transactions with BEGIN settings.POLLS_SQLITE_TRANSACTION_MODE.
+IMMEDIATE takes the write lock up front: a transaction that reads before it
+writes then waits out busy_timeout instead of failing with "database is
+locked" when it cannot upgrade its read lock.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = getattr(settings, 'POLLS_SQLITE_PRAGMAS', {})
+        for name, value in pragmas.items():
+            connection.execute('PRAGMA {} = {}'.format(name, value))
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        mode = getattr(settings, 'POLLS_SQLITE_TRANSACTION_MODE', None)
+        if mode:
+            self.cursor().execute('BEGIN {}'.format(mode))
+        else:
+            super()._start_transaction_under_autocommit()
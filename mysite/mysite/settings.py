@@ -42,11 +42,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'polls.metrics.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'polls.conditional.StreamingSafeGZipMiddleware',
+    'polls.querybudget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'polls.replicas.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -55,7 +59,7 @@ ROOT_URLCONF = 'mysite.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'polls.metrics.InstrumentedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -77,15 +81,104 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'mysite.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
 
+# Applied to each new SQLite connection by mysite.db.backends.sqlite3. WAL
+# lets readers and the single writer run concurrently; synchronous=NORMAL
+# is durable across application crashes (not power loss) in WAL mode;
+# writers wait up to busy_timeout ms for the lock instead of failing.
+
+POLLS_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 128 * 2 ** 20,
+    'cache_size': -16000,  # KiB
+}
+
+POLLS_SQLITE_TRANSACTION_MODE = 'IMMEDIATE'
+
+
+DATABASE_ROUTERS = ['polls.replicas.PrimaryReplicaRouter']
+
+# Aliases of DATABASES the router sends reads of views with
+# `read_replica = True` to; empty serves everything from the primary.
+
+POLLS_DATABASE_PRIMARY = 'default'
+
+POLLS_DATABASE_REPLICAS = []
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'polls',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+
+AUTHENTICATION_BACKENDS = [
+    'polls.backends.CachedPermissionBackend',
+]
+
+
+# Sessions and messages
+# https://docs.djangoproject.com/en/3.2/topics/http/sessions/
+# POLLS_SESSION_MODE: 'cached_db' serves session reads from the cache and
+# writes through to django_session, 'signed_cookies' keeps sessions in the
+# client cookie with no server storage, 'db' is Django's default.
+
+POLLS_SESSION_MODE = os.environ.get('POLLS_SESSION_MODE', 'cached_db')
+
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[POLLS_SESSION_MODE]
+
+# Flash messages of the polls views are short one-liners, so a cookie holds
+# them without ever touching the session.
+
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
+# 'pbkdf2' hashes with POLLS_PBKDF2_ITERATIONS rounds of PBKDF2-SHA256,
+# 'argon2' with Argon2 (needs argon2-cffi). Either profile still verifies
+# hashes made by the other and upgrades them on login.
+
+POLLS_PASSWORD_HASHER_PROFILE = os.environ.get(
+    'POLLS_PASSWORD_HASHER_PROFILE', 'pbkdf2')
+
+POLLS_PBKDF2_ITERATIONS = int(
+    os.environ.get('POLLS_PBKDF2_ITERATIONS', 260000))
+
+PASSWORD_HASHERS = {
+    'pbkdf2': [
+        'polls.hashers.TunedPBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    ],
+    'argon2': [
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'polls.hashers.TunedPBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    ],
+}[POLLS_PASSWORD_HASHER_PROFILE]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -121,7 +214,146 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Polls
+# Vote ingestion engine used by polls.views.VoteView: 'atomic' issues one
+# UPDATE ... SET votes = votes + 1 per vote, 'buffered' aggregates votes in
+# memory and flushes them every POLLS_VOTE_FLUSH_INTERVAL seconds or once
+# POLLS_VOTE_BUFFER_SIZE votes are pending, 'sharded' spreads votes over
+# Question.vote_shard_count ChoiceVoteShard rows (see compact_vote_shards),
+# 'ledger' appends one Vote row per user and question in batches of the same
+# size, counted in Choice.votes by the rollup_votes command.
+
+POLLS_VOTE_MODE = os.environ.get('POLLS_VOTE_MODE', 'atomic')
+
+POLLS_VOTE_BUFFER_SIZE = 100
+
+POLLS_VOTE_FLUSH_INTERVAL = 1.0
+
+# Seconds rollup_votes leaves new Vote rows alone, so that ledger inserts
+# still in flight cannot commit ids below its high-water mark. Not needed on
+# SQLite, which runs one write transaction at a time.
+
+POLLS_VOTE_ROLLUP_SETTLE = 0
+
+# Cached results pages: entries are keyed on a per-question version bumped by
+# votes and choice edits, so the timeout only bounds memory for idle polls.
+
+POLLS_RESULTS_CACHE = True
+
+POLLS_RESULTS_CACHE_TIMEOUT = 300
+
+# Number of questions per page of the keyset-paginated index.
+
+POLLS_INDEX_PAGE_SIZE = 20
+
+# Views declare a `query_budget`; polls.querybudget.QueryBudgetMiddleware
+# logs a warning when a request goes over it. Strict mode raises instead,
+# after the view has run (and committed), so it is only for tests.
+
+POLLS_QUERY_BUDGET_STRICT = False
+
+# Serve the index, detail, results and vote pages with the async views in
+# polls.async_views (under ASGI). Their database work runs on a pool of
+# POLLS_ASYNC_DB_WORKERS threads, which must be set along with
+# POLLS_ASYNC_VIEWS: with 0 it runs on asgiref's per-request thread, which
+# is no different from serving the sync views under ASGI.
+
+POLLS_ASYNC_VIEWS = os.environ.get('POLLS_ASYNC_VIEWS') == '1'
+
+POLLS_ASYNC_DB_WORKERS = int(os.environ.get('POLLS_ASYNC_DB_WORKERS', 0))
+
+# Live results (polls:live): at most POLLS_LIVE_MAX_SUBSCRIBERS listeners per
+# question, and votes landing within POLLS_LIVE_COALESCE_WINDOW seconds are
+# pushed as one update backed by a single database read. Every open stream
+# holds a server thread for up to POLLS_LIVE_STREAM_TIMEOUT seconds, so it is
+# off unless the deployment runs a threaded server sized for the listeners.
+
+POLLS_LIVE_RESULTS = os.environ.get('POLLS_LIVE_RESULTS') == '1'
+
+POLLS_LIVE_MAX_SUBSCRIBERS = 200
+
+POLLS_LIVE_COALESCE_WINDOW = 0.5
+
+POLLS_LIVE_HEARTBEAT = 15
+
+POLLS_LIVE_STREAM_TIMEOUT = 300
+
+POLLS_LIVE_POLL_TIMEOUT = 25
+
+# Fraction of requests measured by polls.metrics.PerformanceMiddleware and
+# reported at polls:metrics (staff only).
+
+POLLS_METRICS_SAMPLE_RATE = float(
+    os.environ.get('POLLS_METRICS_SAMPLE_RATE', 1.0))
+
+# Index question lists and detail choice lists are cached as template
+# fragments keyed on version stamps bumped by Question and Choice saves and
+# deletes, and on the next scheduled pub_date (polls.schedule), which also
+# cuts the timeout short. 0 disables the fragment cache.
+
+POLLS_FRAGMENT_CACHE_TIMEOUT = 60
+
+# Seconds a user's resolved permission set stays in the cache. Changes to
+# users, groups and their permissions invalidate it right away.
+
+POLLS_PERMISSION_CACHE_TIMEOUT = 300
+
+# Failed logins allowed per client address and per username within a
+# sliding POLLS_LOGIN_FAILURE_WINDOW seconds; further attempts get a 429
+# before any password hashing.
+
+POLLS_LOGIN_FAILURES_PER_IP = 20
+
+POLLS_LOGIN_FAILURES_PER_USER = 5
+
+POLLS_LOGIN_FAILURE_WINDOW = 300
+
+# Times a vote write is retried when SQLite reports the database locked.
+
+POLLS_VOTE_BUSY_RETRIES = 3
+
+# Number of questions on the most voted listing (polls:top).
+
+POLLS_TOP_QUESTIONS = 10
+
+# Serve STATIC_ROOT from the WSGI application (polls.staticserve, wrapped
+# in mysite/wsgi.py) instead of a separate web server. Files without a
+# content hash in their name are cached by browsers for
+# POLLS_STATIC_MAX_AGE seconds; hashed ones for a year.
+
+POLLS_STATIC_SERVE = False
+
+POLLS_STATIC_MAX_AGE = 300
+
+# Apps whose templates, with those in TEMPLATES DIRS, the warm_templates
+# command and POLLS_WARM_TEMPLATES compile ahead of time. bootstrapform
+# renders the forms of the `bootstrap` filter.
+
+POLLS_WARM_TEMPLATE_APPS = ['polls', 'bootstrapform']
+
+# Compile those templates when the WSGI application starts (mysite/wsgi.py),
+# so with the cached template loader no request pays for parsing them.
+
+POLLS_WARM_TEMPLATES = False
+
+# Number of questions listed by the search view (polls:search).
+
+POLLS_SEARCH_RESULTS = 20
+
+# Matching questions and choices, newest first, the search view ranks at
+# most; a word found in most rows is otherwise ranked across all of them.
+
+POLLS_SEARCH_CANDIDATES = 1000
+
+# Number of questions per page of the question picker
+# (polls:question_autocomplete).
+
+POLLS_AUTOCOMPLETE_RESULTS = 20
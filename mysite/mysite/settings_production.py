@@ -0,0 +1,97 @@
+"""
+Production settings: the development settings overridden from the
+environment. Select with DJANGO_SETTINGS_MODULE=mysite.settings_production.
+
+Database variables:
+
+    POLLS_DB_NAME, POLLS_DB_USER, POLLS_DB_PASSWORD, POLLS_DB_HOST,
+    POLLS_DB_PORT       PostgreSQL primary.
+    POLLS_DB_REPLICA_HOSTS
+                        Comma-separated replica hosts; reads of the index,
+                        detail and results pages go to them.
+    POLLS_DB_CONN_MAX_AGE
+                        Seconds to keep connections open between requests.
+    POLLS_DB_POOL_SIZE  Size of the in-process connection pool per
+                        database; 0 (the default) disables pooling.
+
+Static files are collected into DJANGO_STATIC_ROOT (default
+mysite/staticfiles) with `manage.py collectstatic`, which writes
+content-hashed names and gzip (and, with the brotli package, brotli)
+copies, and are served by the WSGI application.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+DEBUG = os.environ.get('DJANGO_DEBUG') == '1'
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')
+
+POLLS_QUERY_BUDGET_STRICT = False
+
+
+# Templates: compiled once per process by the cached loader, at startup.
+
+TEMPLATES = [dict(
+    TEMPLATES[0],  # noqa: F405
+    APP_DIRS=False,
+    OPTIONS=dict(TEMPLATES[0]['OPTIONS'], loaders=[  # noqa: F405
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]),
+)]
+
+POLLS_WARM_TEMPLATES = True
+
+
+# Static files
+
+STATIC_ROOT = os.environ.get('DJANGO_STATIC_ROOT', STATIC_ROOT)  # noqa: F405
+
+STATICFILES_STORAGE = 'polls.staticfiles.CompressedManifestStaticFilesStorage'
+
+POLLS_STATIC_SERVE = True
+
+
+# Database
+
+POLLS_DB_POOL_SIZE = int(os.environ.get('POLLS_DB_POOL_SIZE', 0))
+
+
+def database(host):
+    settings = {
+        'ENGINE': 'mysite.db.backends.postgresql',
+        'NAME': os.environ.get('POLLS_DB_NAME', 'polls'),
+        'USER': os.environ.get('POLLS_DB_USER', 'polls'),
+        'PASSWORD': os.environ.get('POLLS_DB_PASSWORD', ''),
+        'HOST': host,
+        'PORT': os.environ.get('POLLS_DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('POLLS_DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+    if POLLS_DB_POOL_SIZE:
+        settings['POOL'] = {'min_size': 1, 'max_size': POLLS_DB_POOL_SIZE}
+        # Hand connections back to the pool at the end of each request.
+        settings['CONN_MAX_AGE'] = 0
+    return settings
+
+
+DATABASES = {
+    'default': database(os.environ.get('POLLS_DB_HOST', 'localhost')),
+}
+
+POLLS_DATABASE_REPLICAS = []
+
+replica_hosts = os.environ.get('POLLS_DB_REPLICA_HOSTS', '').split(',')
+for i, host in enumerate(filter(None, replica_hosts)):
+    alias = 'replica{}'.format(i + 1)
+    DATABASES[alias] = dict(database(host), TEST={'MIRROR': 'default'})
+    POLLS_DATABASE_REPLICAS.append(alias)
+
+# Vote ledger: PostgreSQL commits concurrent inserts out of id order.
+
+POLLS_VOTE_ROLLUP_SETTLE = 5
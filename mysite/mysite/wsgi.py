@@ -9,8 +9,19 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
 application = get_wsgi_application()
+
+if settings.POLLS_WARM_TEMPLATES:
+    from polls.warmup import warm_templates
+
+    warm_templates()
+
+if settings.POLLS_STATIC_SERVE:
+    from polls.staticserve import StaticFilesApplication
+
+    application = StaticFilesApplication(application)
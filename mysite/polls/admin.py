@@ -1,10 +1,46 @@
+import datetime
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.forms.models import BaseInlineFormSet
+from django.utils import timezone
+
 from .models import Question, Choice
+from .pagination import EstimatedCountPaginator
+from .search import search_questions
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """
+    An inline formset showing one `per_page` page of the related objects,
+    page `page_number`, so a parent with thousands of them renders
+    quickly. The change form posts back to its own URL, page included.
+    """
+    per_page = 50
+    page_number = 1
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            queryset = super().get_queryset()
+            paginator = Paginator(queryset, self.per_page)
+            self.page = paginator.get_page(self.page_number)
+            self._queryset = self.page.object_list
+        return self._queryset
 
 
 class ChoiceInline(admin.TabularInline):
     model = Choice
     extra = 2
+    formset = PaginatedInlineFormSet
+    per_page = 50
+    template = 'admin/polls/paginated_tabular.html'
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = self.per_page
+        formset.page_number = request.GET.get('choices_page', 1)
+        return formset
 
 
 class QuestionAdmin(admin.ModelAdmin):
@@ -13,9 +49,31 @@ class QuestionAdmin(admin.ModelAdmin):
         ('Date information', {'fields': ['pub_date'], 'classes': ['collapse']}),
     ]
     inlines = [ChoiceInline]
-    list_display = ('question_text', 'pub_date', 'was_published_recently')
+    list_display = ('question_text', 'pub_date', 'published_recently')
     list_filter = ['pub_date']
     search_fields = ['question_text']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        now = timezone.now()
+        published_recently = Q(
+            pub_date__gte=now - datetime.timedelta(days=1), pub_date__lte=now)
+        return super().get_queryset(request).annotate(
+            published_recently=ExpressionWrapper(
+                published_recently, output_field=BooleanField()))
+
+    @admin.display(boolean=True, ordering='pub_date',
+                   description='Published recently?')
+    def published_recently(self, obj):
+        # Computed by the database, see get_queryset().
+        return obj.published_recently
+
+    def get_search_results(self, request, queryset, search_term):
+        # Full-text index lookup instead of LIKE '%term%' over every row.
+        if not search_term.strip():
+            return queryset, False
+        return search_questions(queryset, search_term), False
 
 
 admin.site.register(Question, QuestionAdmin)
@@ -28,6 +86,10 @@ class ChoiceAdmin(admin.ModelAdmin):
         ('Votes', {'fields': ['votes'], 'classes': ['collapse']}),
     ]
     list_display = ('choice_text', 'votes', 'question')
+    list_select_related = ['question']
+    autocomplete_fields = ['question']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Choice, ChoiceAdmin)
@@ -0,0 +1,102 @@
+import asyncio
+import contextvars
+import functools
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.test.utils import override_settings
+from django.urls import clear_url_caches
+
+from . import views
+
+_executor = None
+_executor_workers = 0
+
+
+def get_executor():
+    """
+    Return the bounded pool async views run their database work on, or None
+    when settings.POLLS_ASYNC_DB_WORKERS is unset and asgiref's per-request
+    thread should be used instead. A pool replaced after the setting
+    changed is shut down once its running calls finish.
+    """
+    global _executor, _executor_workers
+    workers = getattr(settings, 'POLLS_ASYNC_DB_WORKERS', 0)
+    if not workers:
+        return None
+    if workers != _executor_workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='polls-db')
+        _executor_workers = workers
+    return _executor
+
+
+def _call_in_worker(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_db(func, *args, **kwargs):
+    """Run the blocking callable `func` without blocking the event loop."""
+    executor = get_executor()
+    if executor is None:
+        return await sync_to_async(func)(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    # Carry context variables such as polls.replicas' routing flag over.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(
+        context.run, _call_in_worker, func, args, kwargs))
+
+
+def async_view(view_class):
+    """
+    Build an async view running `view_class` (permission checks, queries and
+    rendering) through run_db(), so an ASGI server keeps serving other
+    requests while this one waits on the database.
+
+    This only pays off with POLLS_ASYNC_DB_WORKERS set: without the pool,
+    run_db() is sync_to_async() around the whole view, which is what
+    Django's ASGI handler already does for the sync view.
+    """
+    sync_view = view_class.as_view()
+
+    async def view(request, *args, **kwargs):
+        return await run_db(sync_view, request, *args, **kwargs)
+
+    functools.update_wrapper(view, sync_view, assigned=())
+    return view
+
+
+index = async_view(views.IndexView)
+detail = async_view(views.DetailView)
+results = async_view(views.ResultsView)
+vote = async_view(views.VoteView)
+
+
+@contextmanager
+def async_views_enabled(enabled=True, **extra_settings):
+    """
+    Rebuild the URLconf with POLLS_ASYNC_VIEWS set to `enabled` for the
+    duration of the block. The root URLconf is reloaded too, since its
+    include() resolver caches the polls patterns.
+    """
+    def reload_urlconfs():
+        importlib.reload(importlib.import_module('polls.urls'))
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    try:
+        with override_settings(POLLS_ASYNC_VIEWS=enabled, **extra_settings):
+            reload_urlconfs()
+            yield
+    finally:
+        reload_urlconfs()
@@ -0,0 +1,77 @@
+import base64
+import binascii
+import json
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import CodePointCollate, Question
+
+ASCII_LOWER = str.maketrans(
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+def sql_lower(text, vendor):
+    """text as the database's LOWER() folds it: SQLite only folds ASCII."""
+    return text.translate(ASCII_LOWER) if vendor == 'sqlite' else text.lower()
+
+
+def encode_cursor(text_lower, pk):
+    raw = json.dumps([text_lower, pk], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Return (text_lower, pk) for a cursor built by encode_cursor(), or None
+    if it is malformed.
+    """
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding).decode()
+        text_lower, pk = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+    if not isinstance(text_lower, str) or not isinstance(pk, int):
+        return None
+    if not 0 <= pk < 2 ** 63:
+        return None
+    return text_lower, pk
+
+
+def question_suggestions(prefix, limit, cursor=None, using='default'):
+    """
+    One page of questions whose text starts with `prefix`, case
+    insensitively, in (lower(question_text), id) order. Returns the
+    questions and the cursor of the next page, or None on the last page.
+
+    The prefix becomes a range on question_text_lower_idx rather than a
+    LIKE, which SQLite cannot serve from an expression index and
+    PostgreSQL only with a pattern operator class. The range only equals
+    the prefix under code point order, so both the index and the
+    comparisons use CodePointCollate rather than the database's default
+    collation.
+    """
+    vendor = connections[using].vendor
+    queryset = Question.objects.using(using).annotate(
+        text_lower=CodePointCollate(Lower('question_text')),
+    ).order_by('text_lower', 'pk')
+    prefix = sql_lower(prefix, vendor)
+    if prefix:
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        queryset = queryset.filter(
+            text_lower__gte=prefix, text_lower__lt=upper)
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        text_lower, pk = position
+        queryset = queryset.filter(
+            Q(text_lower__gt=text_lower) | Q(text_lower=text_lower, pk__gt=pk),
+            text_lower__gte=text_lower,
+        )
+    questions = list(queryset[:limit + 1])
+    if len(questions) <= limit:
+        return questions, None
+    questions = questions[:limit]
+    last = questions[-1]
+    return questions, encode_cursor(last.text_lower, last.pk)
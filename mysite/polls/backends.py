@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .cache import bump_version_on_commit, get_version
+
+USER_PERMISSIONS_VERSION_KEY = 'polls:user-permissions-version:{}'
+GROUP_PERMISSIONS_VERSION_KEY = 'polls:group-permissions-version'
+PERMISSIONS_KEY = 'polls:permissions:{}:{}:{}'
+
+
+def invalidate_user_permissions(user_id):
+    bump_version_on_commit(USER_PERMISSIONS_VERSION_KEY.format(user_id))
+
+
+def invalidate_group_permissions():
+    """
+    Expire every cached permission set, for changes to a group's
+    permissions.
+    """
+    bump_version_on_commit(GROUP_PERMISSIONS_VERSION_KEY)
+
+
+class CachedPermissionBackend(ModelBackend):
+    """
+    ModelBackend storing each user's resolved permission set in the cache,
+    so permission checks on a fresh request cost no queries. Entries are
+    keyed on a per-user version, bumped when the user or their groups or
+    permissions change, and a global version bumped when any group's
+    permissions change (see polls.signals).
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            key = PERMISSIONS_KEY.format(
+                user_obj.pk,
+                get_version(USER_PERMISSIONS_VERSION_KEY.format(user_obj.pk)),
+                get_version(GROUP_PERMISSIONS_VERSION_KEY))
+            permissions = cache.get(key)
+            if permissions is None:
+                permissions = super().get_all_permissions(user_obj)
+                cache.set(key, permissions, getattr(
+                    settings, 'POLLS_PERMISSION_CACHE_TIMEOUT', 300))
+            user_obj._perm_cache = permissions
+        return user_obj._perm_cache
@@ -0,0 +1,129 @@
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+
+from .models import Choice
+from .replicas import replica_reads
+
+RESULTS_VERSION_KEY = 'polls:results-version:{}'
+RESULTS_KEY = 'polls:results:{}:{}'
+QUESTION_VERSION_KEY = 'polls:question-version:{}'
+INDEX_VERSION_KEY = 'polls:index-version'
+
+# Sent with `question_id` whenever the vote totals of a question change.
+results_invalidated = Signal()
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters for one cache layer."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+            }
+
+
+results_stats = CacheStats()
+
+
+def get_version(key):
+    """
+    Return the version stored under `key`, creating it if needed. Versions
+    start at a random value so an evicted counter never comes back at a
+    number an older cache entry was stored under.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, random.randrange(1, 2 ** 62), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        get_version(key)
+
+
+def bump_version_on_commit(key):
+    """
+    Bump the version now and again once the current transaction commits: a
+    reader in between still sees the old rows and may cache them under the
+    first bump.
+    """
+    bump_version(key)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def invalidate_results(question_id):
+    bump_version(RESULTS_VERSION_KEY.format(question_id))
+    results_invalidated.send(sender=None, question_id=question_id)
+
+
+def invalidate_question(question_id):
+    """Expire the cached template fragments showing the question."""
+    bump_version_on_commit(QUESTION_VERSION_KEY.format(question_id))
+
+
+def invalidate_index():
+    """Expire the cached question list fragments of the index."""
+    bump_version_on_commit(INDEX_VERSION_KEY)
+
+
+def fragment_timeout():
+    return getattr(settings, 'POLLS_FRAGMENT_CACHE_TIMEOUT', 60)
+
+
+def get_results(question):
+    """
+    Return the choices of `question` with their vote totals as a list of
+    dicts, served from the cache until the question's results version is
+    bumped by a vote or an edit.
+    """
+    if not getattr(settings, 'POLLS_RESULTS_CACHE', True):
+        return load_results(question.pk)
+    version = get_version(RESULTS_VERSION_KEY.format(question.pk))
+    key = RESULTS_KEY.format(question.pk, version)
+    results = cache.get(key)
+    if results is None:
+        results_stats.miss()
+        # The entry outlives any replication lag, so fill it from the primary.
+        with replica_reads(False):
+            results = load_results(question.pk)
+        cache.set(key, results,
+                  getattr(settings, 'POLLS_RESULTS_CACHE_TIMEOUT', 300))
+    else:
+        results_stats.hit()
+    return results
+
+
+def load_results(question_id):
+    choices = Choice.objects.filter(question_id=question_id)
+    return list(choices.with_vote_totals().order_by('pk').values(
+        'id', 'choice_text', 'vote_total'))
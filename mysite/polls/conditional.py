@@ -0,0 +1,62 @@
+import hashlib
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+from .cache import (
+    INDEX_VERSION_KEY, QUESTION_VERSION_KEY, RESULTS_VERSION_KEY, get_version,
+)
+from .schedule import next_publication, publication_stamp
+
+
+def has_pending_messages(request):
+    storage = getattr(request, '_messages', None)
+    return storage is not None and bool(storage._loaded_messages)
+
+
+def version_etag(request, *parts):
+    """
+    An ETag for a page built from version stamps and other `parts`, without
+    rendering it. The user and the CSRF cookie (pages embed a token derived
+    from it) are part of the tag. Returns None, so the page is rendered in
+    full, while flash messages are waiting to be shown.
+    """
+    if has_pending_messages(request):
+        return None
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    key = ':'.join(
+        str(part) for part in (request.user.pk, csrf_cookie) + parts)
+    return '"{}"'.format(hashlib.md5(key.encode()).hexdigest())
+
+
+def index_etag(request):
+    # Questions scheduled for later appear without a version bump, so the
+    # tag also changes when the next one goes live, like the cached list.
+    return version_etag(
+        request, 'index', get_version(INDEX_VERSION_KEY),
+        request.GET.get('cursor', ''), publication_stamp(next_publication()))
+
+
+def detail_etag(request, question_id):
+    return version_etag(
+        request, 'detail',
+        get_version(QUESTION_VERSION_KEY.format(question_id)))
+
+
+def results_etag(request, question_id):
+    return version_etag(
+        request, 'results',
+        get_version(QUESTION_VERSION_KEY.format(question_id)),
+        get_version(RESULTS_VERSION_KEY.format(question_id)))
+
+
+class StreamingSafeGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that leaves event streams alone: gzip buffers its output,
+    which would hold back server-sent events until enough piled up.
+    """
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+        return super().process_response(request, response)
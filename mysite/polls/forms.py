@@ -1,5 +1,6 @@
 from django import forms
 from django.forms import SelectDateWidget
+from django.urls import reverse_lazy
 
 from .models import Question
 
@@ -10,8 +11,40 @@ class QuestionForm(forms.Form):
     # pub_date = forms.DateTimeField(label="Data publikacji", widget=SelectDateWidget)
 
 
+class QuestionAutocompleteWidget(forms.Widget):
+    """
+    A hidden question pk with a text box searching polls:question_autocomplete.
+    Unlike a Select, rendering looks up the current question only, never
+    the field's whole queryset.
+    """
+    template_name = 'polls/widgets/question_autocomplete.html'
+    url = reverse_lazy('polls:question_autocomplete')
+
+    class Media:
+        js = ['polls/autocomplete.js']
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['url'] = self.url
+        context['widget']['label'] = self.label_for(value)
+        return context
+
+    def label_for(self, value):
+        if value in self.choices.field.empty_values:
+            return ''
+        try:
+            question = self.choices.queryset.filter(pk=value).first()
+        except (ValueError, TypeError):
+            question = None
+        if question is None:
+            return ''
+        return self.choices.field.label_from_instance(question)
+
+
 class ChoiceForm(forms.Form):
-    question = forms.ModelChoiceField(queryset=Question.objects.all())
+    # Validation is a single pk lookup (ModelChoiceField.to_python()).
+    question = forms.ModelChoiceField(
+        queryset=Question.objects.all(), widget=QuestionAutocompleteWidget)
     choice_text = forms.CharField(label="Podaj wybór", max_length=200)
     votes = forms.IntegerField(required=False)
 
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with settings.POLLS_PBKDF2_ITERATIONS rounds. Stored hashes keep
+    their own round count and are rehashed at the configured one on the
+    next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'POLLS_PBKDF2_ITERATIONS',
+                       PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,189 @@
+import itertools
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.dispatch import receiver
+
+from .cache import load_results, results_invalidated
+
+
+class HubFull(Exception):
+    pass
+
+
+def load_totals(question_id):
+    return {row['id']: row['vote_total'] for row in load_results(question_id)}
+
+
+class Channel:
+
+    def __init__(self, sequence):
+        self.condition = threading.Condition()
+        self.sequence = sequence
+        self.totals = None
+        self.subscribers = 0
+        self.refresh_scheduled = False
+
+
+class Subscription:
+    """
+    One listener on a question. wait() blocks until the totals change and
+    returns only the choices whose totals differ from what this listener
+    last saw, so a slow reader never misses a change.
+    """
+
+    def __init__(self, hub, question_id, channel):
+        self.hub = hub
+        self.question_id = question_id
+        self.channel = channel
+        self.sequence = channel.sequence
+        self.totals = dict(channel.totals)
+        self.closed = False
+
+    def wait(self, timeout):
+        """
+        Return {choice_id: total} for changed choices, or None if nothing
+        changed within `timeout` seconds.
+        """
+        channel = self.channel
+        with channel.condition:
+            channel.condition.wait_for(
+                lambda: channel.sequence != self.sequence, timeout)
+            if channel.sequence == self.sequence:
+                return None
+            self.sequence = channel.sequence
+            totals = channel.totals
+        changes = {
+            choice_id: total for choice_id, total in totals.items()
+            if self.totals.get(choice_id) != total
+        }
+        changes.update((choice_id, None)
+                       for choice_id in self.totals.keys() - totals.keys())
+        self.totals = dict(totals)
+        return changes
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.hub.unsubscribe(self.question_id)
+
+
+class EventStream:
+    """
+    Server-sent events for a Subscription: a `snapshot` event with all
+    totals, then a `delta` event per change and a comment every `heartbeat`
+    seconds, until `timeout` seconds have passed. Closing the stream (done
+    by the response) releases the subscription even if it never started.
+    """
+
+    def __init__(self, subscription, heartbeat=15, timeout=300):
+        self.subscription = subscription
+        self.heartbeat = heartbeat
+        self.timeout = timeout
+
+    def __iter__(self):
+        subscription = self.subscription
+        deadline = time.monotonic() + self.timeout
+        yield self.event(
+            'snapshot', subscription.sequence, subscription.totals)
+        while time.monotonic() < deadline:
+            changes = subscription.wait(
+                min(self.heartbeat, deadline - time.monotonic()))
+            if changes is None:
+                yield ': keepalive\n\n'
+            else:
+                yield self.event('delta', subscription.sequence, changes)
+
+    def event(self, name, sequence, totals):
+        data = json.dumps({str(k): v for k, v in totals.items()})
+        return 'id: {}\nevent: {}\ndata: {}\n\n'.format(sequence, name, data)
+
+    def close(self):
+        self.subscription.close()
+
+
+class ResultsHub:
+    """
+    In-process fan-out of vote totals. Every change published for a
+    question within `window` seconds is coalesced into a single reload by
+    `loader`, whose result is shared by all of the question's subscribers.
+    Sequence numbers come from one hub-wide counter, so a channel recreated
+    after its last subscriber left never reuses a number handed out before.
+    """
+
+    def __init__(self, loader=load_totals, window=0.5, max_subscribers=200):
+        self.loader = loader
+        self.window = window
+        self.max_subscribers = max_subscribers
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._sequences = itertools.count(1)
+
+    def subscribe(self, question_id):
+        with self._lock:
+            channel = self._channels.get(question_id)
+            if (channel.subscribers if channel else 0) >= self.max_subscribers:
+                raise HubFull(question_id)
+            if channel is None:
+                channel = Channel(next(self._sequences))
+                self._channels[question_id] = channel
+            channel.subscribers += 1
+        try:
+            with channel.condition:
+                if channel.totals is None:
+                    channel.totals = self.loader(question_id)
+                return Subscription(self, question_id, channel)
+        except Exception:
+            self.unsubscribe(question_id)
+            raise
+
+    def unsubscribe(self, question_id):
+        with self._lock:
+            channel = self._channels[question_id]
+            channel.subscribers -= 1
+            if not channel.subscribers:
+                del self._channels[question_id]
+
+    def subscriber_count(self, question_id):
+        with self._lock:
+            channel = self._channels.get(question_id)
+            return channel.subscribers if channel else 0
+
+    def publish(self, question_id):
+        """Schedule a coalesced reload of the question's totals."""
+        with self._lock:
+            channel = self._channels.get(question_id)
+            if channel is None or channel.refresh_scheduled:
+                return
+            channel.refresh_scheduled = True
+        timer = threading.Timer(
+            self.window, self._refresh, (question_id, channel))
+        timer.daemon = True
+        timer.start()
+
+    def _refresh(self, question_id, channel):
+        channel.refresh_scheduled = False
+        close_old_connections()
+        try:
+            totals = self.loader(question_id)
+        finally:
+            close_old_connections()
+        with channel.condition:
+            if totals != channel.totals:
+                channel.totals = totals
+                channel.sequence = next(self._sequences)
+                channel.condition.notify_all()
+
+
+hub = ResultsHub(
+    window=getattr(settings, 'POLLS_LIVE_COALESCE_WINDOW', 0.5),
+    max_subscribers=getattr(settings, 'POLLS_LIVE_MAX_SUBSCRIBERS', 200),
+)
+
+
+@receiver(results_invalidated)
+def publish_results(sender, question_id, **kwargs):
+    hub.publish(question_id)
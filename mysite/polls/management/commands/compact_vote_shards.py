@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.votes import compact_shards
+
+
+class Command(BaseCommand):
+    help = 'Fold sharded vote counters back into Choice.votes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'question_ids', nargs='*', type=int,
+            help='Only compact these questions (default: all).')
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep running and compact every INTERVAL seconds.')
+
+    def handle(self, *args, **options):
+        question_ids = options['question_ids'] or None
+        while True:
+            moved = compact_shards(question_ids)
+            self.stdout.write('Compacted {} votes.'.format(moved))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from polls.transfer import (
+    TransferStats, export_questions, write_csv, write_jsonl,
+)
+
+
+class Command(BaseCommand):
+    help = 'Stream all questions with their choices to a JSONL or CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='File to write, or "-" for stdout.')
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help='Defaults to the output file extension, '
+                                 'else jsonl.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format'] or (
+            'csv' if output.endswith('.csv') else 'jsonl')
+        writer = write_csv if fmt == 'csv' else write_jsonl
+        if output == '-':
+            stream = sys.stdout
+        else:
+            stream = open(output, 'w', newline='', encoding='utf-8')
+        records = export_questions(options['chunk_size'])
+        try:
+            with TransferStats() as stats:
+                for record in writer(records, stream):
+                    stats.questions += 1
+                    stats.choices += len(record['choices'])
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        self.stderr.write('Exported ' + stats.summary())
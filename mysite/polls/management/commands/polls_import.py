@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.transfer import (
+    InvalidRecord, TransferStats, import_questions, read_csv, read_jsonl,
+)
+
+
+class Command(BaseCommand):
+    help = 'Bulk create questions with their choices from a JSONL or CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='File to read, or "-" for stdin.')
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help='Defaults to the input file extension, '
+                                 'else jsonl.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Questions created per transaction.')
+
+    def handle(self, *args, **options):
+        source = options['input']
+        fmt = options['format'] or (
+            'csv' if source.endswith('.csv') else 'jsonl')
+        reader = read_csv if fmt == 'csv' else read_jsonl
+        if source == '-':
+            stream = sys.stdin
+        else:
+            stream = open(source, newline='', encoding='utf-8')
+        try:
+            with TransferStats() as stats:
+                for questions, choices in import_questions(
+                        reader(stream), options['batch_size']):
+                    stats.questions += questions
+                    stats.choices += choices
+        except InvalidRecord as e:
+            raise CommandError('{} Imported {} questions before it.'.format(
+                e, stats.questions))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write('Imported ' + stats.summary())
@@ -0,0 +1,94 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Question
+from polls.schedule import next_publication
+
+
+def default_host():
+    """The first host of ALLOWED_HOSTS a request can name, else localhost."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+class Command(BaseCommand):
+    help = (
+        'Wait for scheduled questions to go live and warm the index, detail '
+        'and results caches at their publish moment.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username', required=True,
+            help='Render pages as this user, who needs polls.view_question.')
+        parser.add_argument(
+            '--since', type=float, default=60,
+            help='On start, also warm questions published in the last '
+                 'SINCE seconds.')
+        parser.add_argument(
+            '--max-sleep', type=float, default=60,
+            help='Look for newly scheduled questions at least every '
+                 'MAX_SLEEP seconds.')
+        parser.add_argument(
+            '--host', default=None,
+            help='Host of the warming requests, by default the first of '
+                 'ALLOWED_HOSTS.')
+        parser.add_argument(
+            '--once', action='store_true', help='Warm once and exit.')
+
+    def warm(self, client, user, questions):
+        """
+        Request the first index page and the detail and results pages of
+        `questions` as `user` through the full middleware stack, filling the
+        shared fragment and results caches before readers arrive. Returns
+        the number of pages requested.
+        """
+        urls = [reverse('polls:index')]
+        for question in questions:
+            urls.append(reverse('polls:detail', args=(question.pk,)))
+            urls.append(reverse('polls:results', args=(question.pk,)))
+        client.force_login(user)
+        try:
+            for url in urls:
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise CommandError('{} answered {} while warming.'.format(
+                        url, response.status_code))
+        finally:
+            client.logout()
+        return len(urls)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                'No user named {!r}.'.format(options['username']))
+        client = Client(HTTP_HOST=options['host'] or default_host())
+        since = timezone.now() - datetime.timedelta(seconds=options['since'])
+        while True:
+            now = timezone.now()
+            questions = list(Question.objects.filter(
+                pub_date__gt=since, pub_date__lte=now).order_by('pub_date'))
+            if questions:
+                pages = self.warm(client, user, questions)
+                self.stdout.write('Warmed {} pages for {} questions.'.format(
+                    pages, len(questions)))
+            since = now
+            if options['once']:
+                break
+            boundary = next_publication(now)
+            delay = options['max_sleep']
+            if boundary is not None:
+                delay = min(
+                    delay, (boundary - timezone.now()).total_seconds())
+            time.sleep(max(delay, 0))
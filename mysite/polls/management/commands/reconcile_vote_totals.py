@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from polls.votes import reconcile_total_votes
+
+
+class Command(BaseCommand):
+    help = (
+        'Check Question.total_votes against Choice.votes sums in chunks and '
+        'fix drift.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Report mismatches only.')
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        for question_id, total_votes, choice_votes in reconcile_total_votes(
+                options['chunk_size'], fix=not options['dry_run']):
+            mismatches += 1
+            self.stdout.write('Question {}: total_votes={} choices={}'.format(
+                question_id, total_votes, choice_votes))
+        self.stdout.write('{} {} mismatched totals.'.format(
+            'Found' if options['dry_run'] else 'Fixed', mismatches))
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from polls.votes import rollup_votes
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold new Vote ledger rows into Choice.votes past the rollup '
+        'high-water mark.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep running and roll up every INTERVAL seconds.')
+
+    def handle(self, *args, **options):
+        settle = getattr(settings, 'POLLS_VOTE_ROLLUP_SETTLE', 0)
+        while True:
+            folded = total = rollup_votes(options['batch_size'], settle)
+            while folded == options['batch_size']:
+                folded = rollup_votes(options['batch_size'], settle)
+                total += folded
+            self.stdout.write('Rolled up {} votes.'.format(total))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
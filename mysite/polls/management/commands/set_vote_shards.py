@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    help = (
+        'Set how many counter shards votes for a question are spread over '
+        '(used when POLLS_VOTE_MODE is "sharded").'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_id', type=int)
+        parser.add_argument('shard_count', type=int)
+
+    def handle(self, *args, **options):
+        shard_count = options['shard_count']
+        if not 1 <= shard_count <= 1024:
+            raise CommandError('shard_count must be between 1 and 1024.')
+        updated = Question.objects.filter(
+            pk=options['question_id']).update(vote_shard_count=shard_count)
+        if not updated:
+            raise CommandError(
+                'Question {} does not exist.'.format(options['question_id']))
+        self.stdout.write('Question {} now uses {} vote shards.'.format(
+            options['question_id'], shard_count))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.warmup import warm_templates
+
+
+class Command(BaseCommand):
+    help = (
+        'Load and compile every project and polls template, reporting the '
+        'time each takes; fails if any template does not compile.'
+    )
+
+    def handle(self, *args, **options):
+        results = warm_templates()
+        for name, seconds, error in results:
+            if options['verbosity'] > 1 or error:
+                self.stdout.write('{:<32} {:>8.2f}ms{}'.format(
+                    name, seconds * 1000,
+                    ' {}'.format(error) if error else ''))
+        failed = [name for name, _, error in results if error]
+        if failed:
+            raise CommandError('{} of {} templates failed to compile.'.format(
+                len(failed), len(results)))
+        self.stdout.write('Compiled {} templates in {:.1f}ms.'.format(
+            len(results), sum(seconds for _, seconds, _ in results) * 1000))
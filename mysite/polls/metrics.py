@@ -0,0 +1,207 @@
+import bisect
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+
+from .middleware import AsyncCapableMiddleware
+from .querybudget import count_queries
+
+TIME_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+METRICS = {
+    'request_duration_seconds': ('Wall time per request.', TIME_BUCKETS),
+    'db_queries': ('Database queries per request.', COUNT_BUCKETS),
+    'db_duration_seconds': (
+        'Time spent in database queries per request.', TIME_BUCKETS),
+    'template_render_seconds': (
+        'Time spent rendering templates per request.', TIME_BUCKETS),
+    'response_size_bytes': ('Response body size.', SIZE_BUCKETS),
+}
+
+# [seconds] spent rendering templates in the measured request, shared
+# with the threads its context is copied to.
+_template_time = ContextVar('polls_template_time', default=None)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. Percentiles are interpolated within buckets, so
+    memory and cost per observation stay constant.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def percentile(self, pct):
+        if not self.count:
+            return 0.0
+        rank = pct / 100.0 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0
+                width = self.buckets[i] - lower
+                return lower + width * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, view_name, values):
+        with self._lock:
+            for metric, value in values.items():
+                key = (metric, view_name)
+                if key not in self._histograms:
+                    self._histograms[key] = Histogram(METRICS[metric][1])
+                self._histograms[key].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def summary(self):
+        """{view_name: {metric: {'count', 'p50', 'p95', 'p99'}}}"""
+        with self._lock:
+            summary = {}
+            histograms = sorted(self._histograms.items())
+            for (metric, view_name), histogram in histograms:
+                summary.setdefault(view_name, {})[metric] = {
+                    'count': histogram.count,
+                    'p50': histogram.percentile(50),
+                    'p95': histogram.percentile(95),
+                    'p99': histogram.percentile(99),
+                }
+            return summary
+
+    def prometheus(self):
+        """The histograms in the Prometheus text exposition format."""
+        with self._lock:
+            lines = []
+            for metric, (help_text, buckets) in METRICS.items():
+                name = 'polls_' + metric
+                lines.append('# HELP {} {}'.format(name, help_text))
+                lines.append('# TYPE {} histogram'.format(name))
+                histograms = sorted(self._histograms.items())
+                for (key, view_name), histogram in histograms:
+                    if key != metric:
+                        continue
+                    label = 'view="{}"'.format(
+                        view_name.replace('\\', '\\\\').replace('"', '\\"'))
+                    cumulative = 0
+                    bounds = buckets + ('+Inf',)
+                    for bound, count in zip(bounds, histogram.counts):
+                        cumulative += count
+                        lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                            name, label, bound, cumulative))
+                    lines.append('{}_sum{{{}}} {}'.format(
+                        name, label, histogram.sum))
+                    lines.append('{}_count{{{}}} {}'.format(
+                        name, label, histogram.count))
+            return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            template_time = _template_time.get()
+            if template_time is not None:
+                template_time[0] += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing each render for
+    PerformanceMiddleware.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class PerformanceMiddleware(AsyncCapableMiddleware):
+    """
+    Record wall time, query count, query time, template render time and
+    response size per URL name into the module registry. Only a
+    settings.POLLS_METRICS_SAMPLE_RATE fraction of requests is measured.
+    """
+
+    def sampled(self):
+        rate = getattr(settings, 'POLLS_METRICS_SAMPLE_RATE', 1.0)
+        return random.random() < rate
+
+    def call(self, request):
+        if not self.sampled():
+            return self.get_response(request)
+        template_time = [0.0]
+        token = _template_time.set(template_time)
+        start = time.perf_counter()
+        try:
+            with count_queries() as queries:
+                response = self.get_response(request)
+        finally:
+            _template_time.reset(token)
+        return self.observe(request, response, time.perf_counter() - start,
+                            queries, template_time[0])
+
+    async def acall(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        template_time = [0.0]
+        token = _template_time.set(template_time)
+        start = time.perf_counter()
+        try:
+            with count_queries() as queries:
+                response = await self.get_response(request)
+        finally:
+            _template_time.reset(token)
+        return self.observe(request, response, time.perf_counter() - start,
+                            queries, template_time[0])
+
+    def observe(self, request, response, duration, queries, template_time):
+        values = {
+            'request_duration_seconds': duration,
+            'db_queries': queries.count,
+            'db_duration_seconds': queries.duration,
+            'template_render_seconds': template_time,
+        }
+        if not response.streaming:
+            values['response_size_bytes'] = len(response.content)
+        match = request.resolver_match
+        registry.observe(match.view_name if match else '<unresolved>', values)
+        return response
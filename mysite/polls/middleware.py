@@ -0,0 +1,30 @@
+import asyncio
+
+
+class AsyncCapableMiddleware:
+    """
+    Base of the polls middlewares. Under WSGI a request goes through
+    call(); under ASGI, where the next handler is a coroutine function,
+    through acall(), so Django runs the chain on the event loop instead of
+    adapting it to a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # What asyncio.iscoroutinefunction() looks for, like Django's
+            # MiddlewareMixin sets.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.acall(request)
+        return self.call(request)
+
+    def call(self, request):
+        raise NotImplementedError
+
+    async def acall(self, request):
+        raise NotImplementedError
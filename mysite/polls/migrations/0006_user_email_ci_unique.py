@@ -0,0 +1,49 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_email_conflicts(apps, schema_editor):
+    """
+    Stop before building the index if users share an email in different
+    cases, listing them so they can be merged or edited first.
+    """
+    User = apps.get_model('auth', 'User')
+    users = User.objects.using(schema_editor.connection.alias).exclude(
+        email='').annotate(email_key=Lower('email'))
+    taken = users.values('email_key').annotate(
+        count=Count('pk')).filter(count__gt=1).values('email_key')
+    conflicts = {}
+    for email_key, username in users.filter(
+            email_key__in=taken).order_by('pk').values_list(
+            'email_key', 'username'):
+        conflicts.setdefault(email_key, []).append(username)
+    if conflicts:
+        raise RuntimeError(
+            'Cannot add user_email_ci_uniq: these users share an email up to '
+            'case. Give each a distinct email, then migrate again.\n'
+            + '\n'.join('{}: {}'.format(email, ', '.join(usernames))
+                        for email, usernames in sorted(conflicts.items())))
+
+
+class Migration(migrations.Migration):
+    """
+    Case-insensitive unique index on auth_user.email for the registration
+    lookup in polls.views.find_registration_conflict(). Blank emails map to
+    NULL so users without an email do not collide.
+    """
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('polls', '0005_question_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            check_email_conflicts, migrations.RunPython.noop),
+        migrations.RunSQL(
+            sql="CREATE UNIQUE INDEX user_email_ci_uniq "
+                "ON auth_user (LOWER(NULLIF(email, '')))",
+            reverse_sql='DROP INDEX user_email_ci_uniq',
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.5 on 2026-10-18 20:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_total_votes(apps, schema_editor):
+    Question = apps.get_model('polls', 'Question')
+    Choice = apps.get_model('polls', 'Choice')
+    votes = Choice.objects.filter(question=OuterRef('pk')).order_by().values(
+        'question').annotate(total=Sum('votes')).values('total')
+    Question.objects.using(schema_editor.connection.alias).update(
+        total_votes=Coalesce(Subquery(votes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_user_email_ci_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='last_vote_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='total_votes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-total_votes', '-id'], name='question_total_votes_idx'),
+        ),
+        migrations.RunPython(backfill_total_votes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,98 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE polls_question_fts USING fts5(question_text, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "CREATE VIRTUAL TABLE polls_choice_fts USING fts5(choice_text, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "INSERT INTO polls_question_fts (rowid, question_text) "
+    "SELECT id, question_text FROM polls_question",
+    "INSERT INTO polls_choice_fts (rowid, choice_text) "
+    "SELECT id, choice_text FROM polls_choice",
+    "CREATE TRIGGER polls_question_fts_insert "
+    "AFTER INSERT ON polls_question BEGIN "
+    "INSERT INTO polls_question_fts (rowid, question_text) "
+    "VALUES (new.id, new.question_text); "
+    "END",
+    "CREATE TRIGGER polls_question_fts_update "
+    "AFTER UPDATE OF question_text ON polls_question BEGIN "
+    "UPDATE polls_question_fts SET question_text = new.question_text "
+    "WHERE rowid = new.id; "
+    "END",
+    "CREATE TRIGGER polls_question_fts_delete "
+    "AFTER DELETE ON polls_question BEGIN "
+    "DELETE FROM polls_question_fts WHERE rowid = old.id; "
+    "END",
+    "CREATE TRIGGER polls_choice_fts_insert "
+    "AFTER INSERT ON polls_choice BEGIN "
+    "INSERT INTO polls_choice_fts (rowid, choice_text) "
+    "VALUES (new.id, new.choice_text); "
+    "END",
+    "CREATE TRIGGER polls_choice_fts_update "
+    "AFTER UPDATE OF choice_text ON polls_choice BEGIN "
+    "UPDATE polls_choice_fts SET choice_text = new.choice_text "
+    "WHERE rowid = new.id; "
+    "END",
+    "CREATE TRIGGER polls_choice_fts_delete "
+    "AFTER DELETE ON polls_choice BEGIN "
+    "DELETE FROM polls_choice_fts WHERE rowid = old.id; "
+    "END",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER polls_choice_fts_delete',
+    'DROP TRIGGER polls_choice_fts_update',
+    'DROP TRIGGER polls_choice_fts_insert',
+    'DROP TRIGGER polls_question_fts_delete',
+    'DROP TRIGGER polls_question_fts_update',
+    'DROP TRIGGER polls_question_fts_insert',
+    'DROP TABLE polls_choice_fts',
+    'DROP TABLE polls_question_fts',
+]
+
+POSTGRESQL_FORWARD = [
+    "CREATE INDEX question_text_search_idx ON polls_question "
+    "USING gin (to_tsvector('simple', question_text))",
+    "CREATE INDEX choice_text_search_idx ON polls_choice "
+    "USING gin (to_tsvector('simple', choice_text))",
+]
+
+POSTGRESQL_REVERSE = [
+    'DROP INDEX choice_text_search_idx',
+    'DROP INDEX question_text_search_idx',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement, params=None)
+    return operation
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text search over question and choice texts for polls.search.
+
+    SQLite: FTS5 tables of question and of choice texts (rowid = the row's
+    id) kept in sync by triggers, so bulk_create() and queryset updates are
+    covered. Writes touch one index row, however many choices a question
+    has.
+    Migrations that rebuild polls_question or polls_choice on SQLite drop
+    these triggers; polls.search.restore_search_triggers() recreates them
+    after migrate.
+
+    PostgreSQL: GIN indexes on to_tsvector('simple', ...) expressions, which
+    the database maintains itself.
+    """
+
+    dependencies = [
+        ('polls', '0007_question_total_votes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE}),
+        ),
+    ]
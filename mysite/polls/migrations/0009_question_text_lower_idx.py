@@ -0,0 +1,21 @@
+# Generated by Django 3.2.5 on 2026-10-18 22:21
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Lower
+
+import polls.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0008_question_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(polls.models.CodePointCollate(Lower('question_text')), F('id'), name='question_text_lower_idx'),
+        ),
+    ]
@@ -1,11 +1,80 @@
 import datetime
+from django.conf import settings
 from django.db import models
+from django.db.models import F, Func, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Lower
 from django.utils import timezone
 
 
+class EmailKey(Func):
+    """
+    LOWER(NULLIF(email, '')) as migration 0006 indexes it. The '' is part
+    of the SQL rather than a parameter, which SQLite would not match
+    against the index expression.
+    """
+    template = "LOWER(NULLIF(%(expressions)s, ''))"
+    output_field = models.CharField()
+
+
+class CodePointCollate(Func):
+    """
+    The expression under the database's byte-order collation, so strings
+    compare by code point like Python's: "C" on PostgreSQL, BINARY on
+    SQLite, which has no "C". Not a Collate, which an Index only accepts
+    as its outermost expression.
+    """
+    function = 'COLLATE'
+    template = '%(expressions)s %(function)s %(collation)s'
+    arity = 1
+    collations = {'sqlite': 'BINARY'}
+
+    def as_sql(self, compiler, connection, **extra_context):
+        collation = self.collations.get(connection.vendor, 'C')
+        extra_context.setdefault(
+            'collation', connection.ops.quote_name(collation))
+        return super().as_sql(compiler, connection, **extra_context)
+
+
+class QuestionQuerySet(models.QuerySet):
+
+    def with_choice_votes(self):
+        """Annotate `choice_votes`: the sum of the question's Choice.votes."""
+        return self.annotate(
+            choice_votes=Coalesce(Subquery(choice_votes_sum()), 0))
+
+    def sync_total_votes(self):
+        """Recompute total_votes from Choice.votes in a single UPDATE."""
+        return self.update(
+            total_votes=Coalesce(Subquery(choice_votes_sum()), 0))
+
+
+def choice_votes_sum():
+    return Choice.objects.filter(question=OuterRef('pk')).order_by().values(
+        'question').annotate(total=Sum('votes')).values('total')
+
+
 class Question(models.Model):
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published')
+    vote_shard_count = models.PositiveSmallIntegerField(default=1)
+    # Sum of Choice.votes, kept up to date by polls.votes and polls.signals.
+    # Votes still held in ChoiceVoteShard rows count once compacted. Signed
+    # like Choice.votes, which ChoiceForm lets staff set below zero.
+    total_votes = models.IntegerField(default=0)
+    last_vote_at = models.DateTimeField(null=True, blank=True)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='question_pub_date_id_idx'),
+            models.Index(fields=['-total_votes', '-id'],
+                         name='question_total_votes_idx'),
+            # Prefix lookups of polls.autocomplete.
+            models.Index(CodePointCollate(Lower('question_text')), F('id'),
+                         name='question_text_lower_idx'),
+        ]
 
     def __str__(self):
         return self.question_text
@@ -18,10 +87,83 @@ class Question(models.Model):
     was_published_recently.short_description = 'Published recently?'
 
 
+class ChoiceQuerySet(models.QuerySet):
+
+    def with_vote_totals(self):
+        """
+        Annotate `vote_total`: compacted votes plus votes still sitting in
+        ChoiceVoteShard rows, read in a single statement.
+        """
+        shard_votes = ChoiceVoteShard.objects.filter(
+            choice=OuterRef('pk')).order_by().values('choice').annotate(
+            total=Sum('votes')).values('total')
+        return self.annotate(
+            vote_total=F('votes') + Coalesce(Subquery(shard_votes), 0))
+
+
 class Choice(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
     votes = models.IntegerField(default=0)
 
+    objects = ChoiceQuerySet.as_manager()
+
     def __str__(self):
         return self.choice_text
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets polls.signals update the old question when a choice moves.
+        instance.loaded_question_id = instance.__dict__.get('question_id')
+        return instance
+
+
+class ChoiceVoteShard(models.Model):
+    choice = models.ForeignKey(
+        Choice, on_delete=models.CASCADE, related_name='vote_shards')
+    shard = models.PositiveSmallIntegerField()
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['choice', 'shard'],
+                                    name='unique_choice_vote_shard'),
+        ]
+
+    def __str__(self):
+        return '{} #{}'.format(self.choice, self.shard)
+
+
+class Vote(models.Model):
+    """
+    One row per vote, appended by polls.votes.VoteLedgerWriter and folded
+    into Choice.votes by polls.votes.rollup_votes(). `question` repeats
+    choice.question so the database can enforce one vote per user and
+    question.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    question = models.ForeignKey(
+        Question, on_delete=models.CASCADE, related_name='+')
+    choice = models.ForeignKey(
+        Choice, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'],
+                                    name='unique_vote_per_user_question'),
+        ]
+
+    def __str__(self):
+        return '{} -> {}'.format(self.user_id, self.choice_id)
+
+
+class VoteRollup(models.Model):
+    """
+    The high-water mark of rollup_votes(): the last Vote id counted in
+    Choice.votes.
+    """
+    last_vote_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
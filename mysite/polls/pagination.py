@@ -0,0 +1,176 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+def encode_cursor(direction, obj):
+    raw = '{}|{}|{}'.format(direction, obj.pub_date.isoformat(), obj.pk)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Return (direction, pub_date, pk) for a cursor built by encode_cursor(),
+    or None if it is malformed. A pub_date without an offset (or with one
+    when USE_TZ is off) can't be compared with the column, and a pk outside
+    the 64-bit range can't be bound as a parameter, so both are malformed.
+    """
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in ('next', 'prev') or pub_date is None:
+        return None
+    if timezone.is_aware(pub_date) != settings.USE_TZ or not 0 <= pk < 2 ** 63:
+        return None
+    return direction, pub_date, pk
+
+
+class KeysetPaginator:
+    """
+    Seek pagination over a queryset ordered newest first by (pub_date, id).
+    Every page is a range scan on the matching composite index, so deep
+    pages cost the same as the first one.
+
+    The upper pub_date bound (e.g. "published by now") is passed as
+    `published_before` rather than filtered on the queryset: it is folded
+    with the cursor into a single range condition, because SQLite only
+    seeks on the first of several upper bounds on the same column.
+    """
+
+    def __init__(self, queryset, per_page, published_before=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.published_before = published_before
+
+    def page(self, cursor=None):
+        return KeysetPage(self, decode_cursor(cursor) if cursor else None)
+
+
+class KeysetPage:
+    """
+    One page of a KeysetPaginator. The query runs on first use, so a page
+    whose rendering is served from a cache never touches the database.
+    """
+
+    def __init__(self, paginator, cursor):
+        self.paginator = paginator
+        self.cursor = cursor
+        self._object_list = None
+
+    def _fetch(self):
+        queryset = self.paginator.queryset
+        per_page = self.paginator.per_page
+        upper = self.paginator.published_before
+        direction = None
+        if self.cursor:
+            direction, pub_date, pk = self.cursor
+        if direction == 'next' and (upper is None or pub_date < upper):
+            upper = pub_date
+        if upper is not None:
+            queryset = queryset.filter(pub_date__lte=upper)
+        if direction == 'prev':
+            queryset = queryset.filter(
+                Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk),
+                pub_date__gte=pub_date,
+            ).order_by('pub_date', 'pk')
+        else:
+            if direction == 'next':
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+            queryset = queryset.order_by('-pub_date', '-pk')
+        rows = list(queryset[:per_page + 1])
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        if direction == 'prev':
+            rows.reverse()
+            self._has_next, self._has_previous = True, more
+        else:
+            self._has_next, self._has_previous = more, direction == 'next'
+        self._object_list = rows
+
+    @property
+    def object_list(self):
+        if self._object_list is None:
+            self._fetch()
+        return self._object_list
+
+    def has_next(self):
+        self.object_list
+        return self._has_next
+
+    def has_previous(self):
+        self.object_list
+        return self._has_previous and bool(self.object_list)
+
+    def next_cursor(self):
+        if self.has_next():
+            return encode_cursor('next', self.object_list[-1])
+
+    def previous_cursor(self):
+        if self.has_previous():
+            return encode_cursor('prev', self.object_list[0])
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+def estimate_row_count(model, using):
+    """
+    The approximate number of rows of the model's table without a full
+    scan, or None if the database keeps no cheap estimate. PostgreSQL's
+    planner statistics lag until the next ANALYZE; SQLite's largest rowid
+    is off by the deleted rows.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [table])
+        elif (connection.vendor == 'sqlite'
+              and model._meta.pk.get_internal_type()
+              in ('AutoField', 'BigAutoField')):
+            cursor.execute('SELECT max(rowid) FROM {}'.format(table))
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists over large tables: an unfiltered
+    queryset is counted from estimate_row_count() once the estimate
+    exceeds `exact_count_limit`. Filtered querysets are counted exactly.
+    """
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.exact_count_limit:
+                return estimate
+        return super().count
@@ -0,0 +1,126 @@
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from .middleware import AsyncCapableMiddleware
+
+logger = logging.getLogger(__name__)
+
+# The QueryCounters of the enclosing count_queries() blocks. Being a context
+# variable, it follows the request into the threads sync_to_async() and
+# polls.async_views.run_db() run its database work on.
+_counters = ContextVar('polls_query_counters', default=())
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """
+    connection.execute_wrapper() hook counting queries and the time spent
+    running them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def count_active(execute, sql, params, many, context):
+    """execute_wrapper() hook passing each query to the active counters."""
+    for counter in reversed(_counters.get()):
+        execute = functools.partial(counter, execute)
+    return execute(sql, params, many, context)
+
+
+def install_query_counting(connection):
+    """Hook count_active() into `connection`, once."""
+    if count_active not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_active)
+
+
+@contextmanager
+def count_queries():
+    """
+    Count queries run on every configured database inside the block, in
+    this thread and in the threads the block's context is copied to.
+    """
+    for connection in connections.all():
+        install_query_counting(connection)
+    counter = QueryCounter()
+    token = _counters.set(_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _counters.reset(token)
+
+
+def get_query_budget(view_func):
+    view_class = getattr(view_func, 'view_class', None)
+    return getattr(view_class or view_func, 'query_budget', None)
+
+
+class QueryBudgetMiddleware(AsyncCapableMiddleware):
+    """
+    Count the queries of each request and compare them with the
+    `query_budget` declared on the view class. The count and budget are
+    stored on the response as `query_count` and `query_budget`. Overruns
+    are logged as warnings, or raise QueryBudgetExceeded when the test-only
+    settings.POLLS_QUERY_BUDGET_STRICT is set.
+    """
+
+    def call(self, request):
+        request.query_budget = None
+        with count_queries() as counter:
+            response = self.get_response(request)
+        return self.check(request, response, counter)
+
+    async def acall(self, request):
+        request.query_budget = None
+        with count_queries() as counter:
+            response = await self.get_response(request)
+        return self.check(request, response, counter)
+
+    def check(self, request, response, counter):
+        response.query_count = counter.count
+        response.query_budget = request.query_budget
+        budget = request.query_budget
+        if budget is not None and counter.count > budget:
+            message = '{} ran {} queries, budget is {}.'.format(
+                request.path, counter.count, budget)
+            if getattr(settings, 'POLLS_QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
+
+
+class QueryBudgetTestMixin:
+    """
+    TestCase mixin to assert that a response stayed within the query budget
+    of the view that produced it.
+    """
+
+    def assertWithinQueryBudget(self, response):
+        budget = getattr(response, 'query_budget', None)
+        self.assertIsNotNone(budget, 'The view declares no query_budget.')
+        self.assertLessEqual(
+            response.query_count, budget,
+            '{} queries exceed the view budget of {}.'.format(
+                response.query_count, budget))
@@ -0,0 +1,68 @@
+import time
+
+from django.core.cache import cache
+
+RATE_KEY = 'polls:rate:{}:{}:{}'
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window counter kept in the cache: at most `limit` hits per
+    `window` seconds for each identifier. The count of the previous fixed
+    window is weighted by how much of it still overlaps the sliding window,
+    which needs two cache keys per identifier instead of one per hit.
+    """
+
+    def __init__(self, scope, limit, window):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def _keys(self, ident, now):
+        bucket = int(now // self.window)
+        return (RATE_KEY.format(self.scope, ident, bucket),
+                RATE_KEY.format(self.scope, ident, bucket - 1))
+
+    def count(self, ident, now=None):
+        now = time.time() if now is None else now
+        current_key, previous_key = self._keys(ident, now)
+        counts = cache.get_many([current_key, previous_key])
+        overlap = 1 - (now % self.window) / self.window
+        return (counts.get(current_key, 0)
+                + counts.get(previous_key, 0) * overlap)
+
+    def is_limited(self, ident, now=None):
+        return self.count(ident, now) >= self.limit
+
+    def hit(self, ident, now=None):
+        now = time.time() if now is None else now
+        current_key, _ = self._keys(ident, now)
+        # Kept for two windows: one as the current and one as the previous.
+        if not cache.add(current_key, 1, self.window * 2):
+            try:
+                cache.incr(current_key)
+            except ValueError:
+                cache.set(current_key, 1, self.window * 2)
+
+    def retry_after(self, ident, now=None):
+        """
+        Whole seconds (at least 1) until `ident` drops back under the limit,
+        solved from the two bucket counts read by count().
+        """
+        now = time.time() if now is None else now
+        current_key, previous_key = self._keys(ident, now)
+        counts = cache.get_many([current_key, previous_key])
+        current = counts.get(current_key, 0)
+        previous = counts.get(previous_key, 0)
+        elapsed = now % self.window
+        if current >= self.limit:
+            # Limited for the rest of this bucket, then while it fades out
+            # as the previous one.
+            wait = (self.window - elapsed
+                    + self.window * (current - self.limit) / current)
+        elif previous:
+            wait = (self.window * (previous - self.limit + current) / previous
+                    - elapsed)
+        else:
+            wait = 0
+        return min(max(int(wait) + 1, 1), self.window * 2)
@@ -0,0 +1,84 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .middleware import AsyncCapableMiddleware
+
+_replica_reads = ContextVar('polls_replica_reads', default=False)
+
+
+def replica_reads_enabled():
+    return _replica_reads.get()
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Route the block's reads to a replica (or back to the primary)."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Send writes to settings.POLLS_DATABASE_PRIMARY and, inside
+    replica_reads(), reads to a random alias of POLLS_DATABASE_REPLICAS.
+    Everything else reads from the primary, so requests that write always
+    see their own changes.
+    """
+
+    def primary(self):
+        return getattr(settings, 'POLLS_DATABASE_PRIMARY', 'default')
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'POLLS_DATABASE_REPLICAS', [])
+        if replicas and replica_reads_enabled():
+            return random.choice(replicas)
+        return self.primary()
+
+    def db_for_write(self, model, **hints):
+        return self.primary()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {
+            self.primary(), *getattr(settings, 'POLLS_DATABASE_REPLICAS', []),
+        }
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication.
+        return db not in getattr(settings, 'POLLS_DATABASE_REPLICAS', [])
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """
+    Serve the reads of GET and HEAD requests to views declaring
+    `read_replica = True` from a replica for the rest of the request. The
+    session and user are loaded from the primary first, so a login or
+    permission change is never read back stale. Install it after
+    AuthenticationMiddleware.
+    """
+
+    def call(self, request):
+        with replica_reads(False):
+            return self.get_response(request)
+
+    async def acall(self, request):
+        with replica_reads(False):
+            return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if (request.method in ('GET', 'HEAD')
+                and getattr(view_class or view_func, 'read_replica', False)):
+            user = getattr(request, 'user', None)
+            if user is not None:
+                # Resolve the lazy user, and the session, before switching.
+                user.is_authenticated
+            _replica_reads.set(True)
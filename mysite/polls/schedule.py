@@ -0,0 +1,53 @@
+import math
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Question
+from .replicas import replica_reads
+
+NEXT_PUBLICATION_KEY = 'polls:next-publication'
+
+
+def next_publication(now=None):
+    """
+    The earliest pub_date after `now`, or None if no question is scheduled:
+    the next moment the published questions change without a write. The
+    answer is cached until that moment passes or a question changes.
+    """
+    now = now or timezone.now()
+    entry = cache.get(NEXT_PUBLICATION_KEY)
+    if entry is not None:
+        computed_at, boundary = entry
+        if computed_at <= now and (boundary is None or now < boundary):
+            return boundary
+    # A replica lagging behind a newly scheduled question would hide it
+    # for as long as the entry lives.
+    with replica_reads(False):
+        boundary = Question.objects.filter(pub_date__gt=now).order_by(
+            'pub_date').values_list('pub_date', flat=True).first()
+    cache.set(NEXT_PUBLICATION_KEY, (now, boundary), None)
+    return boundary
+
+
+def invalidate_schedule():
+    cache.delete(NEXT_PUBLICATION_KEY)
+
+
+def publication_stamp(boundary):
+    """
+    A cache key part for pages listing what is published before `boundary`.
+    """
+    return boundary.timestamp() if boundary else 'none'
+
+
+def schedule_timeout(timeout, boundary, now=None):
+    """
+    `timeout` (seconds, None for no expiry) cut short to end at `boundary`,
+    so an entry does not outlive the publication that makes it stale.
+    """
+    if boundary is None or timeout == 0:
+        return timeout
+    remaining = (boundary - (now or timezone.now())).total_seconds()
+    seconds = max(math.ceil(remaining), 1)
+    return seconds if timeout is None else min(timeout, seconds)
@@ -0,0 +1,208 @@
+import logging
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Choice, Question
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration of the PostgreSQL indexes in migration 0008.
+# 'simple' does no stemming, which suits questions in several languages.
+SEARCH_CONFIG = 'simple'
+
+# Shortest last word matched as a prefix. One character would match most
+# rows, outside the 2 and 3 character prefix indexes of polls_*_fts.
+MIN_PREFIX_LENGTH = 2
+
+SQLITE_MATCH = (
+    'SELECT rowid FROM polls_question_fts WHERE polls_question_fts MATCH %s '
+    'UNION SELECT question_id FROM polls_choice WHERE id IN '
+    '(SELECT rowid FROM polls_choice_fts WHERE polls_choice_fts MATCH %s)'
+)
+
+# FTS5 ranks are negative, best first; choice matches count half. Only the
+# newest `candidates` rows of each table are ranked: FTS5 walks its index
+# in rowid order and computes bm25 for the rows it returns.
+SQLITE_RANKED = (
+    'SELECT m.id FROM ('
+    'SELECT * FROM ('
+    'SELECT rowid AS id, rank FROM polls_question_fts '
+    'WHERE polls_question_fts MATCH %s ORDER BY rowid DESC LIMIT %s) '
+    'UNION ALL '
+    'SELECT c.question_id, f.rank / 2 FROM ('
+    'SELECT rowid, rank FROM polls_choice_fts '
+    'WHERE polls_choice_fts MATCH %s ORDER BY rowid DESC LIMIT %s'
+    ') f JOIN polls_choice c ON c.id = f.rowid'
+    ') m JOIN polls_question q ON q.id = m.id WHERE q.pub_date <= %s '
+    'GROUP BY m.id ORDER BY min(m.rank), m.id DESC LIMIT %s'
+)
+
+# The indexed column of each polls_*_fts table.
+FTS_COLUMNS = [('question', 'question_text'), ('choice', 'choice_text')]
+
+# The triggers of migration 0008 keeping polls_*_fts in sync, by name.
+# SQLite drops them with their table, so any later migration rebuilding
+# polls_question or polls_choice loses them; restore_search_triggers()
+# recreates them after migrate.
+SQLITE_TRIGGERS = {
+    'polls_{table}_fts_{event}'.format(table=table, event=event): (
+        'CREATE TRIGGER IF NOT EXISTS polls_{table}_fts_{event} {body}'
+        .format(table=table, event=event,
+                body=body.format(table=table, column=column))
+    )
+    for table, column in FTS_COLUMNS
+    for event, body in [
+        ('insert',
+         'AFTER INSERT ON polls_{table} BEGIN '
+         'INSERT INTO polls_{table}_fts (rowid, {column}) '
+         'VALUES (new.id, new.{column}); END'),
+        ('update',
+         'AFTER UPDATE OF {column} ON polls_{table} BEGIN '
+         'UPDATE polls_{table}_fts SET {column} = new.{column} '
+         'WHERE rowid = new.id; END'),
+        ('delete',
+         'AFTER DELETE ON polls_{table} BEGIN '
+         'DELETE FROM polls_{table}_fts WHERE rowid = old.id; END'),
+    ]
+}
+
+POSTGRESQL_MATCH = (
+    "SELECT id FROM polls_question "
+    "WHERE to_tsvector('{config}', question_text) "
+    "@@ to_tsquery('{config}', %s) "
+    "UNION SELECT question_id FROM polls_choice "
+    "WHERE to_tsvector('{config}', choice_text) "
+    "@@ to_tsquery('{config}', %s)"
+).format(config=SEARCH_CONFIG)
+
+POSTGRESQL_RANKED = (
+    "SELECT id FROM ("
+    "SELECT q.id, "
+    "ts_rank(to_tsvector('{config}', q.question_text), query) AS rank "
+    "FROM to_tsquery('{config}', %s) query, LATERAL ("
+    "SELECT id, question_text FROM polls_question "
+    "WHERE to_tsvector('{config}', question_text) @@ query "
+    "AND pub_date <= %s ORDER BY id DESC LIMIT %s"
+    ") q "
+    "UNION ALL "
+    "SELECT c.question_id, "
+    "ts_rank(to_tsvector('{config}', c.choice_text), query) / 2 "
+    "FROM to_tsquery('{config}', %s) query, LATERAL ("
+    "SELECT c.id, c.question_id, c.choice_text FROM polls_choice c "
+    "JOIN polls_question q ON q.id = c.question_id "
+    "WHERE to_tsvector('{config}', c.choice_text) @@ query "
+    "AND q.pub_date <= %s ORDER BY c.id DESC LIMIT %s"
+    ") c"
+    ") matches GROUP BY id ORDER BY max(rank) DESC, id DESC LIMIT %s"
+).format(config=SEARCH_CONFIG)
+
+
+def restore_search_triggers(using='default'):
+    """
+    Recreate the missing SQLite triggers of polls_*_fts, if those tables
+    exist, and return their names. The index of a table that lost a trigger
+    is rebuilt, as rows may have been written without it.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+        if not {'polls_question_fts', 'polls_choice_fts'} <= existing:
+            return []
+        missing = sorted(set(SQLITE_TRIGGERS) - existing)
+        for name in missing:
+            cursor.execute(SQLITE_TRIGGERS[name])
+        for table, column in FTS_COLUMNS:
+            if any(name.startswith('polls_{}_'.format(table))
+                   for name in missing):
+                cursor.execute('DELETE FROM polls_{}_fts'.format(table))
+                cursor.execute(
+                    'INSERT INTO polls_{0}_fts (rowid, {1}) '
+                    'SELECT id, {1} FROM polls_{0}'.format(table, column))
+    if missing:
+        logger.warning('Recreated missing search triggers: %s',
+                       ', '.join(missing))
+    return missing
+
+
+def search_words(terms):
+    """The words of `terms`, without a last word too short for a prefix."""
+    words = re.findall(r'\w+', terms.lower())
+    while words and len(words[-1]) < MIN_PREFIX_LENGTH:
+        words.pop()
+    return words
+
+
+def fts5_query(words):
+    """Every word, the last one as a prefix: `"fast" "vot"*`."""
+    return ' '.join('"{}"'.format(word) for word in words) + '*'
+
+
+def tsquery(words):
+    return ' & '.join(words) + ':*'
+
+
+def search_questions(queryset, terms):
+    """
+    Narrow a Question queryset to those whose text, or the text of one of
+    whose choices, contains every word of `terms`, the last word matching
+    as a prefix. Uses the FTS5 table on SQLite and the GIN expression
+    indexes on PostgreSQL, and falls back to LIKE scans elsewhere.
+    """
+    words = search_words(terms)
+    if not words:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        query = fts5_query(words)
+        return queryset.filter(pk__in=RawSQL(SQLITE_MATCH, [query, query]))
+    if vendor == 'postgresql':
+        query = tsquery(words)
+        return queryset.filter(pk__in=RawSQL(POSTGRESQL_MATCH, [query, query]))
+    question_text = Q()
+    choice_text = Q()
+    for word in words:
+        question_text &= Q(question_text__icontains=word)
+        choice_text &= Q(choice_text__icontains=word)
+    choices = Choice.objects.filter(choice_text).values('question_id')
+    return queryset.filter(question_text | Q(pk__in=choices))
+
+
+def ranked_question_ids(terms, published_before, limit, using='default',
+                        candidates=1000):
+    """
+    Ids of at most `limit` questions published before `published_before`
+    matching `terms` as in search_questions(), best match first. Only the
+    newest `candidates` matching questions and choices are ranked, which
+    bounds the cost of a word found in most rows.
+    """
+    words = search_words(terms)
+    if not words:
+        return []
+    connection = connections[using]
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        published = Question.objects.using(using).filter(
+            pub_date__lte=published_before)
+        return list(search_questions(published, terms).order_by(
+            '-pub_date', '-id').values_list('pk', flat=True)[:limit])
+    published_before = connection.ops.adapt_datetimefield_value(
+        published_before)
+    if connection.vendor == 'sqlite':
+        query = fts5_query(words)
+        sql, params = SQLITE_RANKED, [
+            query, candidates, query, candidates, published_before, limit]
+    else:
+        query = tsquery(words)
+        sql, params = POSTGRESQL_RANKED, [
+            query, published_before, candidates,
+            query, published_before, candidates, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
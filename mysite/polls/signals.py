@@ -0,0 +1,101 @@
+import threading
+
+from django.contrib.auth.models import Group, Permission, User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_migrate, post_save, pre_delete,
+)
+from django.dispatch import receiver
+
+from .backends import (
+    invalidate_group_permissions, invalidate_user_permissions,
+)
+from .cache import invalidate_index, invalidate_question, invalidate_results
+from .models import Choice, Question
+from .querybudget import install_query_counting
+from .schedule import invalidate_schedule
+from .search import restore_search_triggers
+
+
+_deleting = threading.local()
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    question_ids = {
+        instance.question_id, getattr(instance, 'loaded_question_id', None),
+    } - {None}
+    for question_id in question_ids:
+        invalidate_results(question_id)
+        # Again once committed, like invalidate_question() does itself.
+        transaction.on_commit(
+            lambda question_id=question_id: invalidate_results(question_id))
+        invalidate_question(question_id)
+    # The choices of a question being deleted need no new total.
+    question_ids -= getattr(_deleting, 'question_ids', set())
+    if question_ids:
+        Question.objects.filter(pk__in=question_ids).sync_total_votes()
+    instance.loaded_question_id = instance.question_id
+
+
+@receiver(pre_delete, sender=Question)
+def question_deleting(sender, instance, **kwargs):
+    # Sent for every collected object before anything is deleted.
+    if not hasattr(_deleting, 'question_ids'):
+        _deleting.question_ids = set()
+    _deleting.question_ids.add(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    invalidate_question(instance.pk)
+    invalidate_index()
+    invalidate_schedule()
+    # Again once committed, in case a reader cached the old schedule meanwhile.
+    transaction.on_commit(invalidate_schedule)
+    if kwargs['signal'] is post_delete:
+        _deleting.question_ids.discard(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user_permissions(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_memberships_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_user_permissions(instance.pk)
+    elif action == 'post_clear' or pk_set is None:
+        # group.user_set.clear() and permission.user_set.clear() do not
+        # say which users were affected.
+        invalidate_group_permissions()
+    else:
+        for user_id in pk_set:
+            invalidate_user_permissions(user_id)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver([post_save, post_delete], sender=Group)
+@receiver(post_delete, sender=Permission)
+def group_permissions_changed(sender, **kwargs):
+    if kwargs.get('action', 'post_').startswith('post_'):
+        invalidate_group_permissions()
+
+
+@receiver(post_migrate)
+def migrated(sender, using, **kwargs):
+    # Table rebuilds of later migrations drop the search triggers.
+    if sender.name == 'polls':
+        restore_search_triggers(using)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    # Counted by count_queries() blocks of any thread the request runs on.
+    install_query_counting(connection)
@@ -0,0 +1,70 @@
+// Question picker of polls.forms.QuestionAutocompleteWidget: suggestions
+// come a page at a time from polls:question_autocomplete while typing.
+(function () {
+    function setup(input) {
+        var hidden = input.previousElementSibling;
+        var list = input.nextElementSibling;
+        var timer = null;
+        var request = 0;
+
+        function choose(item) {
+            hidden.value = item.id;
+            input.value = item.text;
+            list.innerHTML = '';
+        }
+
+        function show(data, append) {
+            if (!append) {
+                list.innerHTML = '';
+            }
+            data.results.forEach(function (item) {
+                var entry = document.createElement('li');
+                entry.className = 'list-group-item list-group-item-action';
+                entry.textContent = item.text;
+                entry.addEventListener('mousedown', function (event) {
+                    event.preventDefault();
+                    choose(item);
+                });
+                list.appendChild(entry);
+            });
+            if (data.next) {
+                var more = document.createElement('li');
+                more.className = 'list-group-item list-group-item-light';
+                more.textContent = '…';
+                more.addEventListener('mousedown', function (event) {
+                    event.preventDefault();
+                    list.removeChild(more);
+                    load(data.next, true);
+                });
+                list.appendChild(more);
+            }
+        }
+
+        function load(cursor, append) {
+            var current = ++request;
+            var params = new URLSearchParams({q: input.value});
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
+            fetch(input.dataset.autocompleteUrl + '?' + params, {credentials: 'same-origin'})
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    if (current === request) {
+                        show(data, append);
+                    }
+                });
+        }
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () { load(null, false); }, 150);
+        });
+        input.addEventListener('blur', function () {
+            list.innerHTML = '';
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('[data-autocomplete-url]').forEach(setup);
+    });
+})();
@@ -0,0 +1,55 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.xml', '.ico',
+    '.ttf', '.otf', '.eot',
+)
+
+
+def compressors():
+    """(suffix, function) pairs for the precompressed variants to write."""
+    yield '.gz', lambda content: gzip.compress(
+        content, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda content: brotli.compress(content, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes a .gz and, when the brotli
+    package is installed, a .br copy of each compressible file during
+    collectstatic, for polls.staticserve to send as they are. Copies that
+    would not be smaller than the original are skipped.
+    """
+    min_compress_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(self.hashed_files) | set(self.hashed_files.values())
+        names.add(self.manifest_name)
+        for name in sorted(names):
+            self.compress(name)
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS) or not self.exists(name):
+            return
+        with self.open(name) as f:
+            content = f.read()
+        if len(content) < self.min_compress_size:
+            return
+        for suffix, compress in compressors():
+            compressed = compress(content)
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            if len(compressed) < len(content):
+                self._save(name + suffix, ContentFile(compressed))
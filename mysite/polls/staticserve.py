@@ -0,0 +1,153 @@
+import json
+import mimetypes
+import os
+from email.utils import formatdate
+
+from django.conf import settings
+
+ENCODINGS = {'.br': 'br', '.gz': 'gzip'}
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+CHUNK_SIZE = 64 * 1024
+
+
+def accepted_encodings(header):
+    """Content codings an Accept-Encoding header allows."""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticFile:
+
+    def __init__(self, path, content_type, cache_control):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        # Preferred variant first; the uncompressed file comes last.
+        self.variants = [
+            (ENCODINGS[suffix], self.stat(path + suffix))
+            for suffix in ('.br', '.gz') if os.path.isfile(path + suffix)
+        ]
+        self.variants.append((None, self.stat(path)))
+
+    def stat(self, path):
+        stat = os.stat(path)
+        return {
+            'path': path,
+            'size': stat.st_size,
+            'etag': '"{:x}-{:x}"'.format(int(stat.st_mtime), stat.st_size),
+            'last_modified': formatdate(stat.st_mtime, usegmt=True),
+        }
+
+    def variant(self, accept_encoding):
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, variant in self.variants:
+            if encoding is None or encoding in accepted:
+                return encoding, variant
+
+
+class StaticFilesApplication:
+    """
+    WSGI middleware serving settings.STATIC_ROOT under settings.STATIC_URL
+    without entering Django. The directory is indexed once at startup.
+    Names recorded in the staticfiles manifest carry a content hash and are
+    cached by browsers for a year; other files for
+    settings.POLLS_STATIC_MAX_AGE seconds. Precompressed .br and .gz copies
+    written by CompressedManifestStaticFilesStorage are sent to clients
+    that accept them.
+    """
+
+    def __init__(self, application, root=None, prefix=None, max_age=None):
+        self.application = application
+        self.root = str(root or settings.STATIC_ROOT)
+        self.prefix = prefix or settings.STATIC_URL
+        if max_age is None:
+            max_age = getattr(settings, 'POLLS_STATIC_MAX_AGE', 300)
+        self.max_age = max_age
+        self.files = self.scan()
+
+    def hashed_names(self):
+        try:
+            with open(os.path.join(self.root, 'staticfiles.json')) as f:
+                return set(json.load(f)['paths'].values())
+        except (OSError, ValueError, KeyError):
+            return set()
+
+    def scan(self):
+        hashed = self.hashed_names()
+        files = {}
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if (name.endswith(tuple(ENCODINGS))
+                        and os.path.isfile(path[:path.rindex('.')])):
+                    continue
+                if name in hashed:
+                    cache_control = 'public, max-age={}, immutable'.format(
+                        IMMUTABLE_MAX_AGE)
+                else:
+                    cache_control = 'public, max-age={}'.format(self.max_age)
+                content_type = (mimetypes.guess_type(name)[0]
+                                or 'application/octet-stream')
+                files[self.prefix + name] = StaticFile(
+                    path, content_type, cache_control)
+        return files
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.prefix):
+            return self.application(environ, start_response)
+        static_file = self.files.get(path)
+        if static_file is None:
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'Not Found']
+        method = environ['REQUEST_METHOD']
+        if method not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [('Allow', 'GET, HEAD')])
+            return []
+        encoding, variant = static_file.variant(
+            environ.get('HTTP_ACCEPT_ENCODING', ''))
+        headers = [
+            ('Cache-Control', static_file.cache_control),
+            ('ETag', variant['etag']),
+            ('Last-Modified', variant['last_modified']),
+        ]
+        if len(static_file.variants) > 1:
+            headers.append(('Vary', 'Accept-Encoding'))
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            not_modified = (if_none_match.strip() == '*'
+                            or variant['etag'] in if_none_match)
+        else:
+            not_modified = (environ.get('HTTP_IF_MODIFIED_SINCE')
+                            == variant['last_modified'])
+        if not_modified:
+            start_response('304 Not Modified', headers)
+            return []
+        headers += [
+            ('Content-Type', static_file.content_type),
+            ('Content-Length', str(variant['size'])),
+        ]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        if method == 'HEAD':
+            return []
+        f = open(variant['path'], 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(f, CHUNK_SIZE)
+        return self.iter_file(f)
+
+    def iter_file(self, f):
+        with f:
+            yield from iter(lambda: f.read(CHUNK_SIZE), b'')
@@ -1,7 +1,70 @@
+import asyncio
+import base64
+import contextvars
 import datetime
-from django.test import TestCase
+import gzip
+import importlib
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import AnonymousUser, Group, Permission, User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import (
+    IntegrityError, OperationalError, connection, connections, transaction,
+)
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template import engines
+from django.urls import resolve
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
-from .models import Question
+from django.utils.functional import SimpleLazyObject
+from .cache import (
+    QUESTION_VERSION_KEY, RESULTS_KEY, RESULTS_VERSION_KEY, get_results,
+    get_version, results_stats,
+)
+from .async_views import async_views_enabled
+from .autocomplete import question_suggestions
+from .conditional import StreamingSafeGZipMiddleware
+from .live import HubFull, ResultsHub, hub
+from .forms import ChoiceForm
+from .metrics import Histogram, registry
+from .models import Question, Choice, ChoiceVoteShard, Vote, VoteRollup
+from .admin import ChoiceInline
+from .pagination import EstimatedCountPaginator, KeysetPaginator
+from .querybudget import QueryBudgetTestMixin, count_queries
+from .ratelimit import SlidingWindowLimiter
+from .search import (
+    SQLITE_TRIGGERS, ranked_question_ids, search_questions,
+)
+from .schedule import next_publication, schedule_timeout
+from .replicas import (
+    ReplicaRoutingMiddleware, replica_reads, replica_reads_enabled,
+)
+from .staticserve import StaticFilesApplication, accepted_encodings
+from .transfer import export_questions, import_questions
+from .warmup import template_names, warm_templates
+from .votes import (
+    VoteBuffer, VoteLedgerWriter, compact_shards, record_vote, retry_on_busy,
+    rollup_votes,
+)
 from django.urls import reverse
 
 
@@ -45,7 +108,25 @@ def create_question(question_text, days):
     return Question.objects.create(question_text=question_text, pub_date=time)
 
 
+def create_user(*permissions):
+    """
+    Create a user holding the given 'app_label.codename' `permissions`.
+    """
+    user = User.objects.create_user(username='voter', password='secret')
+    for permission in permissions:
+        app_label, codename = permission.split('.')
+        user.user_permissions.add(Permission.objects.get(
+            content_type__app_label=app_label, codename=codename))
+    return user
+
+
 class QuestionIndexViewTests(TestCase):
+    def setUp(self):
+        # Rolled back test data sends no signals, so drop the fragments
+        # cached by earlier tests.
+        cache.clear()
+        self.client.force_login(create_user())
+
     def test_no_questions(self):
         """
         If no questions exist, an appropriate message is displayed.
@@ -101,6 +182,10 @@ class QuestionIndexViewTests(TestCase):
 
 
 class QuestionDetailViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(create_user('polls.view_question'))
+
     def test_future_question(self):
         """
         The detail view of a question with a pub_date in the future
@@ -121,3 +206,1984 @@ class QuestionDetailViewTests(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, past_question.question_text)
+
+
+class VoteViewTests(TestCase):
+    def setUp(self):
+        self.question = create_question(
+            question_text='Past question.', days=-1)
+        self.choice = Choice.objects.create(
+            question=self.question, choice_text='Yes')
+        self.client.force_login(create_user('polls.change_choice'))
+
+    def test_vote_increments_choice(self):
+        """
+        Posting a choice adds exactly one vote to it and redirects to results.
+        """
+        url = reverse('polls:vote', args=(self.question.id,))
+        response = self.client.post(url, {'choice': self.choice.id})
+        self.assertRedirects(
+            response, reverse('polls:results', args=(self.question.id,)),
+            fetch_redirect_response=False)
+        self.choice.refresh_from_db()
+        self.assertEqual(self.choice.votes, 1)
+
+    def test_vote_without_choice(self):
+        """
+        Posting without a choice redirects back to the detail page.
+        """
+        url = reverse('polls:vote', args=(self.question.id,))
+        response = self.client.post(url)
+        self.assertRedirects(
+            response, reverse('polls:detail', args=(self.question.id,)),
+            fetch_redirect_response=False)
+        self.choice.refresh_from_db()
+        self.assertEqual(self.choice.votes, 0)
+
+
+class VoteEngineTests(TestCase):
+    def setUp(self):
+        question = create_question(question_text='Past question.', days=-1)
+        self.yes = Choice.objects.create(
+            question=question, choice_text='Yes', votes=3)
+        self.no = Choice.objects.create(question=question, choice_text='No')
+
+    def test_atomic_vote(self):
+        """
+        The atomic engine increments votes in the database, not on a stale
+        in-memory copy of the choice.
+        """
+        stale = Choice.objects.get(pk=self.yes.pk)
+        record_vote(self.yes)
+        record_vote(stale)
+        self.yes.refresh_from_db()
+        self.assertEqual(self.yes.votes, 5)
+
+    def test_buffer_aggregates_until_flush(self):
+        """
+        Buffered votes are held in memory and written as one delta per choice.
+        """
+        buffer = VoteBuffer(threshold=100, interval=60)
+        for _ in range(3):
+            buffer.add(self.no.pk)
+        buffer.add(self.yes.pk)
+        self.assertEqual(buffer.pending(), {self.no.pk: 3, self.yes.pk: 1})
+        self.no.refresh_from_db()
+        self.assertEqual(self.no.votes, 0)
+        self.assertEqual(buffer.flush(), 4)
+        self.assertEqual(buffer.pending(), {})
+        self.no.refresh_from_db()
+        self.yes.refresh_from_db()
+        self.assertEqual((self.yes.votes, self.no.votes), (4, 3))
+
+    def test_buffer_flushes_at_threshold(self):
+        """
+        Reaching the threshold flushes the buffer without waiting for the
+        timer.
+        """
+        buffer = VoteBuffer(threshold=2, interval=60)
+        buffer.add(self.no.pk)
+        buffer.add(self.no.pk)
+        self.assertEqual(buffer.pending(), {})
+        self.no.refresh_from_db()
+        self.assertEqual(self.no.votes, 2)
+
+    def test_timer_survives_failed_flush(self):
+        """
+        A flush failing on the timer thread is retried on the next tick.
+        """
+        buffer = VoteBuffer(threshold=100, interval=0.01)
+        failing = mock.patch('polls.votes.increment_votes',
+                             side_effect=[OperationalError('locked'), None])
+        with failing as write, \
+                mock.patch('polls.votes.close_old_connections'), \
+                self.assertLogs('polls.votes', 'ERROR'):
+            buffer.add(self.no.pk)
+            timer = buffer._timer
+            timer.join(5)
+        self.assertFalse(timer.is_alive())
+        self.assertEqual(write.call_count, 2)
+        self.assertEqual(buffer.pending(), {})
+        self.assertIsNone(buffer._timer)
+
+    @override_settings(POLLS_VOTE_MODE='buffered')
+    def test_buffered_mode(self):
+        """
+        With POLLS_VOTE_MODE='buffered' record_vote() goes through the buffer.
+        """
+        from .votes import vote_buffer
+        record_vote(self.no)
+        self.assertEqual(vote_buffer.pending(), {self.no.pk: 1})
+        vote_buffer.flush()
+        self.no.refresh_from_db()
+        self.assertEqual(self.no.votes, 1)
+
+
+@override_settings(POLLS_VOTE_MODE='sharded')
+class ShardedVoteTests(TestCase):
+    def setUp(self):
+        self.question = create_question(
+            question_text='Past question.', days=-1)
+        self.question.vote_shard_count = 4
+        self.question.save()
+        self.choice = Choice.objects.create(
+            question=self.question, choice_text='Yes', votes=2)
+
+    def vote_total(self):
+        choice = Choice.objects.with_vote_totals().get(pk=self.choice.pk)
+        return choice.vote_total
+
+    def test_votes_spread_over_shards(self):
+        """
+        Sharded votes land in at most vote_shard_count shard rows and are
+        included in the vote total.
+        """
+        for _ in range(20):
+            record_vote(self.choice)
+        shards = ChoiceVoteShard.objects.filter(choice=self.choice)
+        self.assertLessEqual(shards.count(), 4)
+        self.assertEqual(sum(shards.values_list('votes', flat=True)), 20)
+        self.assertEqual(self.vote_total(), 22)
+
+    def test_compaction_keeps_total(self):
+        """
+        Compaction moves shard counts into Choice.votes without changing
+        the total.
+        """
+        for _ in range(5):
+            record_vote(self.choice)
+        self.assertEqual(compact_shards(), 5)
+        self.choice.refresh_from_db()
+        self.assertEqual(self.choice.votes, 7)
+        self.assertEqual(self.vote_total(), 7)
+        self.assertEqual(compact_shards(), 0)
+
+    def test_compaction_drops_retired_shards(self):
+        """
+        Shards above a lowered shard count are removed once folded.
+        """
+        ChoiceVoteShard.objects.create(choice=self.choice, shard=9, votes=3)
+        compact_shards()
+        self.assertFalse(ChoiceVoteShard.objects.filter(shard=9).exists())
+        self.assertEqual(self.vote_total(), 5)
+
+    def test_set_vote_shards_command(self):
+        call_command(
+            'set_vote_shards', self.question.id, 16, stdout=StringIO())
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.vote_shard_count, 16)
+
+    def test_results_include_shards(self):
+        """
+        The results page shows compacted and sharded votes together.
+        """
+        ChoiceVoteShard.objects.create(choice=self.choice, shard=1, votes=3)
+        self.client.force_login(create_user('polls.view_question'))
+        response = self.client.get(
+            reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, 'Yes -- 5 votes')
+
+
+class ResultsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        results_stats.reset()
+        self.question = create_question(
+            question_text='Past question.', days=-1)
+        self.choice = Choice.objects.create(
+            question=self.question, choice_text='Yes')
+        self.client.force_login(
+            create_user('polls.view_question', 'polls.change_choice'))
+
+    def results(self):
+        return self.client.get(
+            reverse('polls:results', args=(self.question.id,)))
+
+    def test_repeated_views_hit_cache(self):
+        """
+        Only the first results page view loads the choices from the database.
+        """
+        self.results()
+        with self.assertNumQueries(0):
+            get_results(self.question)
+        self.assertEqual(results_stats.snapshot()['hits'], 1)
+        self.assertEqual(results_stats.snapshot()['misses'], 1)
+
+    def test_vote_invalidates(self):
+        """
+        A committed vote bumps the results version so the next view shows it.
+        """
+        self.assertContains(self.results(), 'Yes -- 0 votes')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('polls:vote', args=(self.question.id,)), {
+                'choice': self.choice.id})
+        self.assertContains(self.results(), 'Yes -- 1 vote')
+
+    def test_choice_edit_invalidates(self):
+        """
+        Saving or deleting a choice outside the vote path invalidates too.
+        """
+        self.results()
+        self.choice.choice_text = 'No'
+        self.choice.save()
+        self.assertContains(self.results(), 'No -- 0 votes')
+        self.choice.delete()
+        self.assertNotContains(self.results(), 'No -- 0 votes')
+
+    def test_buffer_flush_invalidates(self):
+        self.assertContains(self.results(), 'Yes -- 0 votes')
+        buffer = VoteBuffer(threshold=100, interval=60)
+        buffer.add(self.choice.pk, 2)
+        self.assertContains(self.results(), 'Yes -- 0 votes')
+        with self.captureOnCommitCallbacks(execute=True):
+            buffer.flush()
+        self.assertContains(self.results(), 'Yes -- 2 votes')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        pub_date = timezone.now() - datetime.timedelta(days=1)
+        # Pairs of questions share a pub_date so the id tie-breaker matters.
+        self.questions = [
+            Question.objects.create(
+                question_text='Question {}.'.format(i),
+                pub_date=pub_date - datetime.timedelta(hours=i // 2))
+            for i in range(7)
+        ]
+        self.newest_first = sorted(
+            self.questions, key=lambda q: (q.pub_date, q.pk), reverse=True)
+
+    def test_walk_forward_and_back(self):
+        """
+        Following next cursors visits every question once in index order,
+        and previous cursors lead back to the same pages.
+        """
+        paginator = KeysetPaginator(Question.objects.all(), 3)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor()))
+        self.assertEqual(
+            [q for page in pages for q in page], self.newest_first)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous())
+        back = paginator.page(pages[2].previous_cursor())
+        self.assertEqual(list(back), list(pages[1]))
+        back = paginator.page(back.previous_cursor())
+        self.assertEqual(list(back), list(pages[0]))
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_published_before(self):
+        """
+        Questions published after `published_before` are never paginated.
+        """
+        future = create_question(question_text='Future question.', days=5)
+        paginator = KeysetPaginator(
+            Question.objects.all(), 10, published_before=timezone.now())
+        self.assertNotIn(future, list(paginator.page()))
+
+    def test_invalid_cursor_is_first_page(self):
+        paginator = KeysetPaginator(Question.objects.all(), 3)
+        self.assertEqual(
+            list(paginator.page('not-a-cursor')), self.newest_first[:3])
+
+    def test_unusable_cursor_is_first_page(self):
+        """
+        Well-formed cursors that can't be run against the column (a naive
+        pub_date, a pk beyond 64 bits) start over instead of erroring.
+        """
+        self.client.force_login(create_user())
+        pub_date = self.newest_first[2].pub_date
+        naive = timezone.make_naive(pub_date).isoformat()
+        for raw in ['next|{}|1'.format(naive),
+                    'next|{}|{}'.format(pub_date.isoformat(), 2 ** 64)]:
+            with self.subTest(raw=raw):
+                cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+                response = self.client.get(
+                    reverse('polls:index'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    list(response.context['latest_question_list'])[:3],
+                    self.newest_first[:3])
+
+    def test_page_is_lazy(self):
+        with self.assertNumQueries(0):
+            page = KeysetPaginator(Question.objects.all(), 3).page()
+        with self.assertNumQueries(1):
+            self.assertTrue(page.has_next())
+            list(page)
+
+    @override_settings(POLLS_INDEX_PAGE_SIZE=5)
+    def test_index_links(self):
+        """
+        The index shows POLLS_INDEX_PAGE_SIZE questions and a link to the
+        next page.
+        """
+        self.client.force_login(create_user())
+        response = self.client.get(reverse('polls:index'))
+        page = response.context['latest_question_list']
+        self.assertEqual(list(page), self.newest_first[:5])
+        self.assertContains(response, '?cursor={}'.format(page.next_cursor()))
+        response = self.client.get(
+            reverse('polls:index'), {'cursor': page.next_cursor()})
+        self.assertEqual(list(response.context['latest_question_list']),
+                         self.newest_first[5:])
+
+
+@override_settings(POLLS_QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """
+    Every polls view stays within the query_budget declared on its class,
+    independent of how many choices a question has.
+    """
+
+    def setUp(self):
+        self.question = create_question(
+            question_text='Past question.', days=-1)
+        self.choices = [
+            Choice.objects.create(
+                question=self.question, choice_text='Choice {}'.format(i))
+            for i in range(10)
+        ]
+        for i in range(10):
+            create_question(question_text='Question {}.'.format(i), days=-2)
+        self.client.force_login(create_user(
+            'polls.view_question', 'polls.change_question',
+            'polls.delete_question', 'polls.add_question',
+            'polls.change_choice'))
+
+    def assertBudget(self, method, name, args, data=None):
+        response = getattr(self.client, method)(reverse(name, args=args), data)
+        self.assertLess(response.status_code, 400)
+        self.assertWithinQueryBudget(response)
+
+    def test_index(self):
+        self.assertBudget('get', 'polls:index', ())
+
+    def test_top(self):
+        self.assertBudget('get', 'polls:top', ())
+
+    def test_detail(self):
+        self.assertBudget('get', 'polls:detail', (self.question.id,))
+
+    def test_results(self):
+        self.assertBudget('get', 'polls:results', (self.question.id,))
+
+    def test_vote(self):
+        self.assertBudget('post', 'polls:vote', (self.question.id,), {
+            'choice': self.choices[0].id})
+
+    def test_edit_question(self):
+        self.assertBudget('get', 'polls:edit', (self.question.id,))
+
+    def test_add_choice(self):
+        self.assertBudget('get', 'polls:add_choice', (self.question.id,))
+
+    def test_edit_choice(self):
+        args = (self.question.id, self.choices[0].id)
+        self.assertBudget('get', 'polls:edit_choice', args)
+        self.assertBudget('post', 'polls:edit_choice', args, {
+            'question': self.question.id, 'choice_text': 'Edited', 'votes': 3})
+
+    def test_delete_question(self):
+        self.assertBudget('get', 'polls:delete', (self.question.id,))
+
+    def test_question_autocomplete(self):
+        self.assertBudget('get', 'polls:question_autocomplete', ())
+
+    def test_strict_mode_raises(self):
+        from .querybudget import QueryBudgetExceeded
+        from .views import DetailView
+        with mock.patch.object(DetailView, 'query_budget', 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(
+                    reverse('polls:detail', args=(self.question.id,)))
+
+    @override_settings(POLLS_QUERY_BUDGET_STRICT=False)
+    def test_overrun_is_logged_by_default(self):
+        from .views import DetailView
+        with mock.patch.object(DetailView, 'query_budget', 1):
+            with self.assertLogs('polls.querybudget', 'WARNING'):
+                response = self.client.get(
+                    reverse('polls:detail', args=(self.question.id,)))
+        self.assertEqual(response.status_code, 200)
+
+    def test_counts_queries_of_threads_given_the_context(self):
+        def query():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.close()
+
+        with count_queries() as counter, ThreadPoolExecutor(1) as pool:
+            pool.submit(contextvars.copy_context().run, query).result()
+            pool.submit(query).result()
+        self.assertEqual(counter.count, 1)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.question = create_question(
+            question_text='Past question.', days=-1)
+        self.choice = Choice.objects.create(
+            question=self.question, choice_text='Yes')
+        user = create_user('polls.view_question', 'polls.change_choice')
+        self.async_client.force_login(user)
+        urls = async_views_enabled()
+        urls.__enter__()
+        self.addCleanup(urls.__exit__, None, None, None)
+
+    def test_setting_routes_to_async_views(self):
+        """
+        With POLLS_ASYNC_VIEWS the index, detail, results and vote routes
+        resolve to coroutine functions.
+        """
+        for name, args in [('index', ()), ('detail', (1,)),
+                           ('results', (1,)), ('vote', (1,))]:
+            func = resolve(reverse('polls:' + name, args=args)).func
+            self.assertTrue(asyncio.iscoroutinefunction(func), name)
+
+    async def test_detail_and_results(self):
+        response = await self.async_client.get(
+            reverse('polls:detail', args=(self.question.id,)))
+        self.assertContains(response, 'Past question.')
+        response = await self.async_client.get(
+            reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, 'Yes -- 0 votes')
+
+    async def test_vote(self):
+        response = await self.async_client.post(
+            reverse('polls:vote', args=(self.question.id,)),
+            'choice={}'.format(self.choice.id),
+            content_type='application/x-www-form-urlencoded')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            response.url, reverse('polls:results', args=(self.question.id,)))
+
+    def test_middleware_chain_stays_async(self):
+        """
+        Under ASGI no middleware is adapted to a thread, which would hold
+        one for the whole request.
+        """
+        with override_settings(DEBUG=True), self.assertNoLogs(
+                'django.request', 'DEBUG'):
+            ASGIHandler()
+
+    async def test_permission_denied(self):
+        """
+        Permission checks still apply to the async views.
+        """
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get(
+            reverse('polls:detail', args=(self.question.id,)))
+        self.assertEqual(response.status_code, 403)
+
+    def test_resized_pool_shuts_down_old_one(self):
+        from . import async_views
+        with mock.patch.object(async_views, '_executor', None), \
+                mock.patch.object(async_views, '_executor_workers', 0):
+            with override_settings(POLLS_ASYNC_DB_WORKERS=0):
+                self.assertIsNone(async_views.get_executor())
+            with override_settings(POLLS_ASYNC_DB_WORKERS=2):
+                old = async_views.get_executor()
+                self.assertIs(async_views.get_executor(), old)
+            with override_settings(POLLS_ASYNC_DB_WORKERS=4):
+                new = async_views.get_executor()
+            self.assertIsNot(new, old)
+            self.assertTrue(old._shutdown)
+            new.shutdown()
+
+
+class ResultsHubTests(TestCase):
+    def setUp(self):
+        self.totals = {1: 0, 2: 0}
+        self.loads = 0
+
+    def loader(self, question_id):
+        self.loads += 1
+        return dict(self.totals)
+
+    def test_hundreds_of_streams_share_one_read(self):
+        """
+        300 concurrent subscribers all receive a burst of votes as one
+        coalesced delta, served by a single reload.
+        """
+        hub = ResultsHub(loader=self.loader, window=0.05, max_subscribers=300)
+        subscriptions = [hub.subscribe(7) for _ in range(300)]
+        received = []
+        lock = threading.Lock()
+
+        def listen(subscription):
+            changes = subscription.wait(5)
+            with lock:
+                received.append(changes)
+            subscription.close()
+
+        threads = [
+            threading.Thread(target=listen, args=(s,)) for s in subscriptions]
+        for thread in threads:
+            thread.start()
+        for _ in range(50):
+            self.totals[2] += 1
+            hub.publish(7)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(received, [{2: 50}] * 300)
+        self.assertEqual(self.loads, 2)
+        self.assertEqual(hub.subscriber_count(7), 0)
+
+    def test_subscriber_cap(self):
+        hub = ResultsHub(loader=self.loader, max_subscribers=2)
+        first = hub.subscribe(1)
+        hub.subscribe(1)
+        with self.assertRaises(HubFull):
+            hub.subscribe(1)
+        first.close()
+        first.close()
+        hub.subscribe(1)
+
+    def test_slow_reader_sees_all_changes(self):
+        """
+        A subscriber that misses intermediate updates gets the net change.
+        """
+        hub = ResultsHub(loader=self.loader, window=0)
+        subscription = hub.subscribe(1)
+        self.totals = {1: 1, 2: 0}
+        hub._refresh(1, subscription.channel)
+        self.totals = {1: 1, 2: 3}
+        hub._refresh(1, subscription.channel)
+        self.assertEqual(subscription.wait(0), {1: 1, 2: 3})
+        self.assertIsNone(subscription.wait(0))
+
+    def test_sequence_survives_channel_recreation(self):
+        hub = ResultsHub(loader=self.loader, window=0)
+        subscription = hub.subscribe(1)
+        self.totals = {1: 1, 2: 0}
+        hub._refresh(1, subscription.channel)
+        subscription.wait(0)
+        since = subscription.sequence
+        subscription.close()
+        self.totals = {1: 2, 2: 0}
+        self.assertGreater(hub.subscribe(1).sequence, since)
+
+
+@override_settings(POLLS_LIVE_RESULTS=True)
+class LiveResultsViewTests(TestCase):
+    def setUp(self):
+        self.question = create_question(
+            question_text='Past question.', days=-1)
+        self.choice = Choice.objects.create(
+            question=self.question, choice_text='Yes', votes=4)
+        self.client.force_login(create_user('polls.view_question'))
+        self.url = reverse('polls:live', args=(self.question.id,))
+
+    def test_event_stream_snapshot(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(hub.subscriber_count(self.question.id), 1)
+        first = next(iter(response.streaming_content)).decode()
+        self.assertRegex(
+            first, r'^id: \d+\nevent: snapshot\ndata: {{"{}": 4}}\n\n$'.format(
+                self.choice.id))
+        response.close()
+        self.assertEqual(hub.subscriber_count(self.question.id), 0)
+
+    def test_long_poll_returns_current_totals(self):
+        response = self.client.get(self.url, {'since': -1})
+        self.assertEqual(response.json()['totals'], {str(self.choice.id): 4})
+        self.assertEqual(hub.subscriber_count(self.question.id), 0)
+
+    @override_settings(POLLS_LIVE_POLL_TIMEOUT=0)
+    def test_long_poll_timeout(self):
+        with mock.patch.object(hub, '_sequences', itertools.count(7)):
+            response = self.client.get(self.url, {'since': 7})
+        self.assertEqual(response.json()['sequence'], 7)
+
+    @override_settings(POLLS_LIVE_RESULTS=False)
+    def test_disabled_by_default(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        response = self.client.get(
+            reverse('polls:results', args=(self.question.id,)))
+        self.assertNotContains(response, 'EventSource')
+
+    def test_subscriber_cap(self):
+        with mock.patch.object(hub, 'max_subscribers', 0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 503)
+
+
+class ImportExportCommandTests(TestCase):
+    def setUp(self):
+        self.first = create_question(question_text='First, "quoted".', days=-2)
+        Choice.objects.create(question=self.first, choice_text='Tak', votes=3)
+        Choice.objects.create(question=self.first, choice_text='Nie', votes=1)
+        create_question(question_text='No choices.', days=-1)
+        third = create_question(question_text='Third.', days=-1)
+        Choice.objects.create(question=third, choice_text='Maybe')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def snapshot(self):
+        return [
+            (q.question_text, q.pub_date, [
+                (c.choice_text, c.votes) for c in q.choice_set.order_by('pk')])
+            for q in Question.objects.order_by('pk')
+        ]
+
+    def round_trip(self, filename):
+        path = os.path.join(self.directory.name, filename)
+        before = self.snapshot()
+        call_command('polls_export', path, chunk_size=1, stderr=StringIO())
+        Question.objects.all().delete()
+        out = StringIO()
+        call_command('polls_import', path, batch_size=2, stdout=out)
+        self.assertIn('Imported 3 questions, 3 choices', out.getvalue())
+        self.assertEqual(self.snapshot(), before)
+
+    def test_jsonl_round_trip(self):
+        self.round_trip('polls.jsonl')
+
+    def test_csv_round_trip(self):
+        self.round_trip('polls.csv')
+
+    def test_export_nests_choices(self):
+        records = list(export_questions(chunk_size=1))
+        self.assertEqual([len(r['choices']) for r in records], [2, 0, 1])
+        self.assertEqual(
+            records[0]['choices'][0], {'choice_text': 'Tak', 'votes': 3})
+
+    def test_import_is_batched(self):
+        """
+        Questions are written `batch_size` at a time.
+        """
+        records = list(export_questions())
+        Question.objects.all().delete()
+        batches = import_questions(enumerate(records, 1), batch_size=2)
+        self.assertEqual(list(batches), [(2, 2), (1, 1)])
+
+    def import_lines(self, filename, lines, **options):
+        path = os.path.join(self.directory.name, filename)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        call_command('polls_import', path, stdout=StringIO(), **options)
+
+    def test_invalid_pub_date_names_line(self):
+        """
+        A missing pub_date fails the import with its line number before its
+        batch is written.
+        """
+        Question.objects.all().delete()
+        valid = json.dumps({'question_text': 'Valid.',
+                            'pub_date': '2026-10-19T10:00:00+00:00'})
+        undated = json.dumps({'question_text': 'Undated.', 'pub_date': None})
+        lines = [valid, '', valid, undated, valid]
+        message = ('Line 4: invalid pub_date None. '
+                   'Imported 2 questions before it.')
+        with self.assertRaisesMessage(CommandError, message):
+            self.import_lines('polls.jsonl', lines, batch_size=2)
+        self.assertEqual(Question.objects.count(), 2)
+        lines = ['question_id,question_text,pub_date,choice_text,votes',
+                 '1,Valid.,2026-10-19T10:00:00+00:00,Tak,1',
+                 '1,Valid.,2026-10-19T10:00:00+00:00,Nie,0',
+                 '2,Misdated.,19/10/2026,,']
+        with self.assertRaisesMessage(
+                CommandError, "Line 4: invalid pub_date '19/10/2026'."):
+            self.import_lines('polls.csv', lines)
+
+    @override_settings(TIME_ZONE='Europe/Warsaw')
+    def test_naive_pub_date_is_current_time_zone(self):
+        Question.objects.all().delete()
+        record = {'question_text': 'Naive.', 'pub_date': '2026-10-19T12:00:00'}
+        self.import_lines('polls.jsonl', [json.dumps(record)])
+        self.assertEqual(
+            Question.objects.get().pub_date,
+            datetime.datetime(2026, 10, 19, 10, tzinfo=datetime.timezone.utc))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        self.question = create_question(
+            question_text='Past question.', days=-1)
+        Choice.objects.create(question=self.question, choice_text='Yes')
+        self.client.force_login(create_user('polls.view_question'))
+
+    def test_histogram_percentiles(self):
+        histogram = Histogram((1, 2, 4))
+        for value in (0.5, 1.5, 1.5, 3):
+            histogram.observe(value)
+        self.assertEqual(histogram.percentile(50), 1.5)
+        self.assertEqual(histogram.percentile(100), 4)
+
+    def test_request_recorded_per_view(self):
+        self.client.get(reverse('polls:detail', args=(self.question.id,)))
+        metrics = registry.summary()['polls:detail']
+        self.assertEqual(metrics['request_duration_seconds']['count'], 1)
+        self.assertEqual(metrics['response_size_bytes']['count'], 1)
+        self.assertGreater(metrics['db_queries']['p50'], 0)
+        self.assertGreater(metrics['template_render_seconds']['p50'], 0)
+
+    @override_settings(POLLS_METRICS_SAMPLE_RATE=0)
+    def test_sampling_disabled(self):
+        self.client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertEqual(registry.summary(), {})
+
+    def test_endpoint_is_staff_only(self):
+        response = self.client.get(reverse('polls:metrics'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_prometheus_format(self):
+        self.client.get(reverse('polls:detail', args=(self.question.id,)))
+        User.objects.filter(username='voter').update(is_staff=True)
+        response = self.client.get(
+            reverse('polls:metrics'), {'format': 'prometheus'})
+        text = response.content.decode()
+        self.assertIn('polls_request_duration_seconds_bucket'
+                      '{view="polls:detail",le="+Inf"} 1', text)
+        self.assertIn('polls_results_cache_hits_total', text)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.question = create_question(
+            question_text='Past question.', days=-1)
+        self.choice = Choice.objects.create(
+            question=self.question, choice_text='Yes')
+        self.client.force_login(create_user('polls.view_question'))
+        self.detail_url = reverse('polls:detail', args=(self.question.id,))
+
+    def get_detail(self):
+        return self.client.get(self.detail_url)
+
+    def test_detail_choices_served_from_cache(self):
+        self.get_detail()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_detail()
+        self.assertContains(response, 'Yes')
+        self.assertFalse([
+            q for q in queries.captured_queries if 'polls_choice' in q['sql']])
+
+    def test_choice_edit_invalidates(self):
+        self.get_detail()
+        self.choice.choice_text = 'Edited'
+        self.choice.save()
+        self.assertContains(self.get_detail(), 'Edited')
+
+    def test_new_choice_invalidates(self):
+        self.get_detail()
+        Choice.objects.create(question=self.question, choice_text='Maybe')
+        self.assertContains(self.get_detail(), 'Maybe')
+
+    def test_choice_delete_invalidates(self):
+        self.get_detail()
+        self.choice.delete()
+        self.assertNotContains(self.get_detail(), 'Yes')
+
+    def test_fragment_cached_before_commit_invalidated(self):
+        self.get_detail()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.choice.choice_text = 'Edited'
+            self.choice.save()
+            # A concurrent request still reads the committed choice and
+            # caches it under the version bumped by the signal.
+            version = get_version(
+                QUESTION_VERSION_KEY.format(self.question.id))
+            cache.set(make_template_fragment_key(
+                'polls-choices', [self.question.id, version]), 'Yes')
+            results_version = get_version(
+                RESULTS_VERSION_KEY.format(self.question.id))
+            cache.set(
+                RESULTS_KEY.format(self.question.id, results_version), [])
+        self.assertContains(self.get_detail(), 'Edited')
+        self.assertEqual(
+            get_results(self.question)[0]['choice_text'], 'Edited')
+
+    def test_question_edit_invalidates_index(self):
+        self.client.get(reverse('polls:index'))
+        self.question.question_text = 'Renamed question.'
+        self.question.save()
+        self.assertContains(
+            self.client.get(reverse('polls:index')), 'Renamed question.')
+
+    def test_question_delete_invalidates_index(self):
+        self.client.get(reverse('polls:index'))
+        self.question.delete()
+        self.assertContains(
+            self.client.get(reverse('polls:index')), 'No polls are available.')
+
+    def test_other_question_unaffected(self):
+        other = create_question(question_text='Other question.', days=-1)
+        self.get_detail()
+        Choice.objects.create(question=other, choice_text='Maybe')
+        with CaptureQueriesContext(connection) as queries:
+            self.get_detail()
+        self.assertFalse([
+            q for q in queries.captured_queries if 'polls_choice' in q['sql']])
+
+
+class PermissionCacheTests(TestCase):
+    def setUp(self):
+        self.question = create_question(
+            question_text='Past question.', days=-1)
+        self.user = create_user()
+        self.group = Group.objects.create(name='voters')
+        self.permission = Permission.objects.get(
+            content_type__app_label='polls', codename='view_question')
+        self.client.force_login(self.user)
+        self.url = reverse('polls:detail', args=(self.question.id,))
+
+    def get_status(self):
+        return self.client.get(self.url).status_code
+
+    def test_cached_permissions_skip_queries(self):
+        self.user.user_permissions.add(self.permission)
+        self.get_status()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_status(), 200)
+        self.assertFalse([q for q in queries.captured_queries
+                          if 'auth_permission' in q['sql']])
+
+    def test_user_permission_changes_invalidate(self):
+        self.assertEqual(self.get_status(), 403)
+        self.user.user_permissions.add(self.permission)
+        self.assertEqual(self.get_status(), 200)
+        self.user.user_permissions.remove(self.permission)
+        self.assertEqual(self.get_status(), 403)
+
+    def test_group_membership_invalidates(self):
+        self.group.permissions.add(self.permission)
+        self.assertEqual(self.get_status(), 403)
+        self.group.user_set.add(self.user)
+        self.assertEqual(self.get_status(), 200)
+        self.user.groups.remove(self.group)
+        self.assertEqual(self.get_status(), 403)
+
+    def test_group_permission_changes_invalidate(self):
+        self.user.groups.add(self.group)
+        self.assertEqual(self.get_status(), 403)
+        self.group.permissions.add(self.permission)
+        self.assertEqual(self.get_status(), 200)
+        self.group.permissions.clear()
+        self.assertEqual(self.get_status(), 403)
+
+    def test_revoke_in_transaction_not_recached(self):
+        self.user.user_permissions.add(self.permission)
+        self.assertEqual(self.get_status(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.remove(self.permission)
+            # A concurrent request still reads the committed grant and
+            # caches it under the version bumped by the signal.
+            with mock.patch.object(ModelBackend, 'get_all_permissions',
+                                   return_value={'polls.view_question'}):
+                user = User.objects.get(pk=self.user.pk)
+                self.assertTrue(user.has_perm('polls.view_question'))
+        self.assertEqual(self.get_status(), 403)
+
+
+@override_settings(POLLS_PBKDF2_ITERATIONS=1000)
+class AuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='voter', email='Voter@example.com', password='secret')
+
+    def register(self, username, email):
+        response = self.client.post(reverse('register'), {
+            'username': username, 'email': email,
+            'password': 'secret', 'password_confirmation': 'secret'})
+        return [str(message) for message in get_messages(
+            response.wsgi_request)]
+
+    def test_register_checks_existence_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.register('new', 'new@example.com'), [
+                'Your user was created.'])
+        lookups = [q for q in queries.captured_queries
+                   if q['sql'].startswith('SELECT')
+                   and 'auth_user' in q['sql']]
+        self.assertEqual(len(lookups), 1)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + lookups[0]['sql'])
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('user_email_ci_uniq', plan)
+        self.assertNotIn('SCAN auth_user', plan)
+
+    def test_register_rejects_taken_username(self):
+        self.assertEqual(
+            self.register('voter', 'other@example.com'), ['User exist.'])
+
+    def test_register_rejects_email_in_other_case(self):
+        self.assertEqual(
+            self.register('other', 'voter@EXAMPLE.com'), ['Email exist.'])
+
+    def test_email_index_is_case_insensitive(self):
+        User.objects.create_user(username='blank1')
+        User.objects.create_user(username='blank2')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(
+                username='other', email='VOTER@example.com')
+
+    def test_email_index_migration_reports_conflicts(self):
+        from django.apps import apps
+        migration = importlib.import_module(
+            'polls.migrations.0006_user_email_ci_unique')
+        schema_editor = mock.Mock(connection=connection)
+        migration.check_email_conflicts(apps, schema_editor)
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX user_email_ci_uniq')
+        User.objects.create_user(username='other', email='VOTER@example.com')
+        with self.assertRaisesMessage(
+                RuntimeError, 'voter@example.com: voter, other'):
+            migration.check_email_conflicts(apps, schema_editor)
+
+    def test_new_hashes_use_configured_iterations(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    @override_settings(POLLS_LOGIN_FAILURES_PER_USER=3)
+    def test_failed_logins_are_rate_limited_before_hashing(self):
+        url = reverse('login')
+        for _ in range(3):
+            response = self.client.post(
+                url, {'username': 'voter', 'password': 'wrong'})
+            self.assertEqual(response.status_code, 200)
+        with mock.patch('polls.views.authenticate') as authenticate:
+            response = self.client.post(
+                url, {'username': 'voter', 'password': 'secret'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        authenticate.assert_not_called()
+        response = self.client.post(
+            url, {'username': 'other', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_sliding_window_weighs_previous_window(self):
+        limiter = SlidingWindowLimiter('test', limit=4, window=10)
+        for _ in range(4):
+            limiter.hit('ident', now=1000)
+        self.assertTrue(limiter.is_limited('ident', now=1005))
+        # Halfway through the next window, half of the old hits still count.
+        self.assertEqual(limiter.count('ident', now=1015), 2)
+        self.assertFalse(limiter.is_limited('ident', now=1015))
+        self.assertEqual(limiter.retry_after('ident', now=1005), 6)
+
+    def test_retry_after_reads_cache_once(self):
+        limiter = SlidingWindowLimiter('test', limit=4, window=10)
+        for now, hits in ((998, 7), (1003, 2), (1012, 5)):
+            for _ in range(hits):
+                limiter.hit('ident', now=now)
+        for now in (1003.5, 1007, 1012, 1016.25, 1019):
+            spy = mock.patch.object(cache, 'get_many', wraps=cache.get_many)
+            with spy as get_many:
+                retry_after = limiter.retry_after('ident', now=now)
+            self.assertEqual(get_many.call_count, 1)
+            # The first whole second at which a probe is let through.
+            expected = next(
+                step for step in range(1, 21)
+                if not limiter.is_limited('ident', now + step))
+            self.assertEqual(retry_after, expected, now)
+
+
+class SessionTests(TestCase):
+    def setUp(self):
+        self.question = create_question(
+            question_text='Past question.', days=-1)
+        Choice.objects.create(question=self.question, choice_text='Yes')
+        self.user = create_user('polls.view_question', 'polls.change_choice')
+
+    def session_queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400)
+        return [q['sql'] for q in queries.captured_queries
+                if 'django_session' in q['sql']]
+
+    def test_anonymous_request_skips_session_table(self):
+        self.assertEqual(self.session_queries('get', reverse('login')), [])
+
+    def test_read_only_requests_skip_session_table(self):
+        self.client.force_login(self.user)
+        for name in ('polls:detail', 'polls:results'):
+            url = reverse(name, args=(self.question.id,))
+            self.assertEqual(self.session_queries('get', url), [])
+        self.assertEqual(
+            self.session_queries('get', reverse('polls:index')), [])
+
+    def test_messages_skip_session_table(self):
+        self.client.force_login(self.user)
+        url = reverse('polls:vote', args=(self.question.id,))
+        self.assertEqual(self.session_queries('post', url), [])
+        self.assertIn('messages', self.client.cookies)
+        response = self.client.get(
+            reverse('polls:detail', args=(self.question.id,)))
+        self.assertContains(response, "You didnt select a choice.")
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        self.client.force_login(self.user)
+        url = reverse('polls:detail', args=(self.question.id,))
+        self.assertEqual(self.session_queries('get', url), [])
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    """
+    Two SQLite files stand in for a PostgreSQL primary and its replica.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for alias in ('primary', 'replica'):
+            connections.databases[alias] = {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(directory.name, alias + '.sqlite3'),
+            }
+            self.addCleanup(self.remove_database, alias)
+            with connections[alias].schema_editor() as editor:
+                editor.create_model(Question)
+        routing = override_settings(POLLS_DATABASE_PRIMARY='primary',
+                                    POLLS_DATABASE_REPLICAS=['replica'])
+        routing.enable()
+        self.addCleanup(routing.disable)
+        Question.objects.using('replica').create(
+            question_text='Replicated.', pub_date=timezone.now())
+
+    def remove_database(self, alias):
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
+
+    def texts(self):
+        return list(Question.objects.values_list('question_text', flat=True))
+
+    def test_writes_go_to_primary(self):
+        Question.objects.create(question_text='New.', pub_date=timezone.now())
+        self.assertEqual(Question.objects.using('primary').count(), 1)
+        self.assertEqual(Question.objects.using('replica').count(), 1)
+
+    def test_reads_go_to_replica_only_when_enabled(self):
+        self.assertEqual(self.texts(), [])
+        with replica_reads():
+            self.assertEqual(self.texts(), ['Replicated.'])
+            with replica_reads(False):
+                self.assertEqual(self.texts(), [])
+
+    def test_middleware_enables_replica_for_read_views(self):
+        from .views import (
+            DetailView, IndexView, SearchView, TopQuestionsView, VoteView,
+        )
+
+        def routed(method, view_class):
+            def get_response(request):
+                middleware.process_view(request, view_class.as_view(), (), {})
+                return HttpResponse(str(replica_reads_enabled()))
+            middleware = ReplicaRoutingMiddleware(get_response)
+            request = getattr(RequestFactory(), method)('/')
+            return middleware(request).content == b'True'
+
+        self.assertTrue(routed('get', TopQuestionsView))
+        self.assertTrue(routed('get', SearchView))
+        self.assertFalse(routed('post', IndexView))
+        # Pages revalidated by ETag are rendered from the primary.
+        self.assertFalse(routed('get', IndexView))
+        self.assertFalse(routed('get', DetailView))
+        self.assertFalse(routed('post', VoteView))
+        self.assertFalse(replica_reads_enabled())
+
+    def test_middleware_loads_user_from_primary(self):
+        from .views import TopQuestionsView
+        loaded = []
+
+        def load_user():
+            loaded.append(replica_reads_enabled())
+            return User(pk=1)
+
+        def get_response(request):
+            middleware.process_view(
+                request, TopQuestionsView.as_view(), (), {})
+            return HttpResponse(str(replica_reads_enabled()))
+        middleware = ReplicaRoutingMiddleware(get_response)
+        request = RequestFactory().get('/')
+        request.user = SimpleLazyObject(load_user)
+        self.assertEqual(middleware(request).content, b'True')
+        self.assertEqual(loaded, [False])
+
+
+class SqliteTuningTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA {}'.format(name))
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_to_connections(self):
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('cache_size'), -16000)
+
+    def test_retry_not_attempted_inside_transaction(self):
+        func = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            retry_on_busy(func)
+        self.assertEqual(func.call_count, 1)
+
+
+class RetryOnBusyTests(SimpleTestCase):
+    @mock.patch('polls.votes.time.sleep')
+    def test_retries_locked_errors(self, sleep):
+        func = mock.Mock(
+            side_effect=[OperationalError('database is locked')] * 2 + ['ok'])
+        self.assertEqual(retry_on_busy(func, 'arg'), 'ok')
+        func.assert_called_with('arg')
+        self.assertEqual(sleep.call_count, 2)
+
+    @mock.patch('polls.votes.time.sleep')
+    @override_settings(POLLS_VOTE_BUSY_RETRIES=1)
+    def test_gives_up_after_retries(self, sleep):
+        func = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            retry_on_busy(func)
+        self.assertEqual(func.call_count, 2)
+
+    def test_other_errors_not_retried(self):
+        func = mock.Mock(
+            side_effect=OperationalError('no such table: polls_choice'))
+        with self.assertRaises(OperationalError):
+            retry_on_busy(func)
+        self.assertEqual(func.call_count, 1)
+
+
+class QuestionTotalVotesTests(TestCase):
+    def setUp(self):
+        self.question = create_question(
+            question_text='Past question.', days=-1)
+        self.choices = [
+            Choice.objects.create(question=self.question, choice_text=text)
+            for text in ('Yes', 'No')
+        ]
+
+    def total(self):
+        self.question.refresh_from_db()
+        return self.question.total_votes
+
+    @override_settings(POLLS_VOTE_MODE='atomic')
+    def test_atomic_vote(self):
+        record_vote(self.choices[0])
+        self.assertEqual(self.total(), 1)
+        self.assertIsNotNone(self.question.last_vote_at)
+
+    def test_buffered_flush(self):
+        buffer = VoteBuffer(threshold=100, interval=60)
+        buffer.add(self.choices[0].id, 3)
+        buffer.add(self.choices[1].id, 2)
+        buffer.flush()
+        self.assertEqual(self.total(), 5)
+
+    @override_settings(POLLS_VOTE_MODE='sharded')
+    def test_sharded_votes_count_once_compacted(self):
+        record_vote(self.choices[0])
+        self.assertEqual(self.total(), 0)
+        compact_shards()
+        self.assertEqual(self.total(), 1)
+
+    def test_choice_edits_resync(self):
+        self.choices[0].votes = 7
+        self.choices[0].save()
+        self.assertEqual(self.total(), 7)
+        self.choices[0].delete()
+        self.assertEqual(self.total(), 0)
+
+    def test_negative_votes_edit(self):
+        self.client.force_login(create_user('polls.change_choice'))
+        url = reverse('polls:edit_choice',
+                      args=(self.question.id, self.choices[0].id))
+        response = self.client.post(url, {
+            'question': self.question.id, 'choice_text': 'Yes', 'votes': -5})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.total(), -5)
+
+    def test_moved_choice_updates_both_questions(self):
+        other = create_question(question_text='Other.', days=-1)
+        choice = Choice.objects.get(pk=self.choices[0].pk)
+        choice.votes = 4
+        choice.save()
+        choice.question = other
+        choice.save()
+        self.assertEqual(self.total(), 0)
+        other.refresh_from_db()
+        self.assertEqual(other.total_votes, 4)
+
+    def test_reconcile_fixes_drift(self):
+        Choice.objects.filter(pk=self.choices[0].pk).update(votes=5)
+        out = StringIO()
+        call_command('reconcile_vote_totals', '--dry-run', stdout=out)
+        self.assertIn('Found 1 mismatched totals.', out.getvalue())
+        self.assertEqual(self.total(), 0)
+        call_command('reconcile_vote_totals', chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.total(), 5)
+
+    def test_top_questions(self):
+        popular = create_question(question_text='Popular.', days=-1)
+        Choice.objects.create(question=popular, choice_text='Yes', votes=10)
+        create_question(question_text='Future.', days=5)
+        self.client.force_login(create_user())
+        response = self.client.get(reverse('polls:top'))
+        self.assertEqual(
+            [q.question_text for q in response.context['questions']],
+            ['Popular.', 'Past question.'])
+
+
+class StaticFilesTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.static_root.cleanup)
+        storage = 'polls.staticfiles.CompressedManifestStaticFilesStorage'
+        with override_settings(STATIC_ROOT=cls.static_root.name,
+                               STATICFILES_STORAGE=storage):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            from django.contrib.staticfiles.storage import staticfiles_storage
+            cls.base_css = staticfiles_storage.url('admin/css/base.css')
+            cls.style_css = staticfiles_storage.url('polls/style.css')
+
+    def setUp(self):
+        self.application = StaticFilesApplication(
+            lambda environ, start_response: ['django'],
+            root=self.static_root.name, prefix='/static/')
+
+    def get(self, path, **environ):
+        environ.update(PATH_INFO=path, REQUEST_METHOD=environ.get(
+            'REQUEST_METHOD', 'GET'))
+        started = {}
+
+        def start_response(status, headers):
+            started.update(status=status, headers=dict(headers))
+
+        body = b''.join(self.application(environ, start_response))
+        return started['status'], started['headers'], body
+
+    def test_hashed_names_and_compressed_copies(self):
+        self.assertRegex(
+            self.base_css, r'^/static/admin/css/base\.[0-9a-f]{12}\.css$')
+        path = os.path.join(
+            self.static_root.name, self.base_css[len('/static/'):])
+        self.assertTrue(os.path.exists(path + '.gz'))
+        # Too small to gain from compression.
+        path = os.path.join(
+            self.static_root.name, self.style_css[len('/static/'):])
+        self.assertFalse(os.path.exists(path + '.gz'))
+
+    def test_serves_compressed_variant(self):
+        status, headers, body = self.get(
+            self.base_css, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(headers['Content-Type'], 'text/css')
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        status, identity_headers, identity_body = self.get(
+            self.base_css, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', identity_headers)
+        self.assertEqual(gzip.decompress(body), identity_body)
+
+    def test_not_modified(self):
+        _, headers, _ = self.get(self.base_css)
+        status, _, body = self.get(
+            self.base_css, HTTP_IF_NONE_MATCH=headers['ETag'])
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(body, b'')
+
+    def test_unhashed_names_get_short_max_age(self):
+        _, headers, _ = self.get('/static/polls/style.css')
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=300')
+
+    def test_unknown_and_other_paths(self):
+        self.assertEqual(self.get('/static/missing.css')[0], '404 Not Found')
+        self.assertEqual(self.get(self.base_css, REQUEST_METHOD='POST')[0],
+                         '405 Method Not Allowed')
+        self.assertEqual(
+            self.application({'PATH_INFO': '/polls/'}, None), ['django'])
+
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            accepted_encodings('gzip, br;q=0.5, deflate;q=0'), {'gzip', 'br'})
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.question = create_question(
+            question_text='Past question.', days=-1)
+        self.choice = Choice.objects.create(
+            question=self.question, choice_text='Yes')
+        self.client.force_login(
+            create_user('polls.view_question', 'polls.change_choice'))
+        self.detail_url = reverse('polls:detail', args=(self.question.id,))
+        self.results_url = reverse('polls:results', args=(self.question.id,))
+        # Pick up the CSRF cookie, which is part of the ETag.
+        self.client.get(self.detail_url)
+
+    def revalidate(self, url):
+        etag = self.client.get(url)['ETag']
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_not_modified(self):
+        for url in (reverse('polls:index'), self.detail_url, self.results_url):
+            response = self.revalidate(url)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.content, b'')
+            self.assertIn('private', response['Cache-Control'])
+
+    def test_not_modified_skips_rendering(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(
+            [q for q in queries.captured_queries if 'polls_' in q['sql']])
+
+    def test_vote_changes_results(self):
+        etag = self.client.get(self.results_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('polls:vote', args=(self.question.id,)), {
+                'choice': self.choice.id})
+        response = self.client.get(self.results_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, '1 vote')
+
+    def test_question_edit_changes_pages(self):
+        urls = (reverse('polls:index'), self.detail_url, self.results_url)
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        self.question.question_text = 'Renamed question.'
+        self.question.save()
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertContains(response, 'Renamed question.')
+
+    def test_choice_edit_changes_detail(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        self.choice.choice_text = 'Edited'
+        self.choice.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Edited')
+
+    def test_pending_messages_are_rendered(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        self.client.post(reverse('polls:vote', args=(self.question.id,)))
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'You didnt select a choice.')
+
+    def test_etag_per_user(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        other = User.objects.create_user(username='other', password='secret')
+        other.user_permissions.add(
+            Permission.objects.get(codename='view_question'))
+        self.client.force_login(other)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(create_user())
+
+    def test_pages_are_compressed(self):
+        create_question(question_text='Past question.', days=-1)
+        response = self.client.get(
+            reverse('polls:index'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'Past question.', gzip.decompress(response.content))
+
+    def test_event_streams_are_not_compressed(self):
+        middleware = StreamingSafeGZipMiddleware(
+            lambda request: StreamingHttpResponse(
+                iter(['data: 1\n\n'] * 100),
+                content_type='text/event-stream'))
+        response = middleware(
+            RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(
+            next(iter(response.streaming_content)), b'data: 1\n\n')
+
+
+def cached_loader_templates(dirs):
+    return [{
+        'BACKEND': 'polls.metrics.InstrumentedDjangoTemplates',
+        'DIRS': dirs,
+        'OPTIONS': {'loaders': [('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ])]},
+    }]
+
+
+class TemplateWarmupTests(SimpleTestCase):
+
+    def test_template_names(self):
+        names = template_names(engines.all()[0].engine)
+        for name in (
+                'login.html', 'polls/detail.html', 'bootstrapform/form.html'):
+            self.assertIn(name, names)
+        self.assertNotIn('admin/base.html', names)
+
+    def test_warm_fills_cached_loader(self):
+        with override_settings(TEMPLATES=cached_loader_templates(
+                [os.path.join(settings.BASE_DIR, 'templates')])):
+            results = warm_templates()
+            self.assertEqual([error for _, _, error in results if error], [])
+            loader = engines.all()[0].engine.template_loaders[0]
+            self.assertIn('polls/detail.html', loader.get_template_cache)
+
+    def test_syntax_errors_reported(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'broken.html'), 'w') as f:
+                f.write('{% if %}')
+            with override_settings(
+                    TEMPLATES=cached_loader_templates([directory])):
+                errors = {name: error
+                          for name, _, error in warm_templates() if error}
+                self.assertEqual(list(errors), ['broken.html'])
+                with self.assertRaisesMessage(
+                        CommandError, 'failed to compile'):
+                    call_command('warm_templates', stdout=StringIO())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.question = create_question(
+            question_text='Najlepszy język programowania?', days=-1)
+        self.choice = Choice.objects.create(
+            question=self.question, choice_text='Python')
+        self.other = create_question(question_text='Ulubiony kolor?', days=-1)
+
+    def search(self, terms):
+        return list(search_questions(Question.objects.order_by('pk'), terms))
+
+    def test_matches_words_and_prefix(self):
+        self.assertEqual(self.search('programowania'), [self.question])
+        self.assertEqual(self.search('najlepszy prog'), [self.question])
+        self.assertEqual(self.search('KOLOR'), [self.other])
+        self.assertEqual(self.search('najlepszy kolor'), [])
+        self.assertEqual(self.search('jezyk'), [self.question])
+
+    def test_matches_choice_text(self):
+        self.assertEqual(self.search('python'), [self.question])
+
+    def test_index_follows_edits(self):
+        self.question.question_text = 'Najgorszy edytor?'
+        self.question.save()
+        self.choice.choice_text = 'Vim'
+        self.choice.save()
+        self.assertEqual(self.search('programowania'), [])
+        self.assertEqual(self.search('python'), [])
+        self.assertEqual(self.search('edytor'), [self.question])
+        self.assertEqual(self.search('vim'), [self.question])
+        # Every word must occur in the question or in one choice.
+        self.assertEqual(self.search('edytor vim'), [])
+        self.choice.delete()
+        self.assertEqual(self.search('vim'), [])
+        Choice.objects.bulk_create(
+            [Choice(question=self.other, choice_text='Zielony')])
+        self.assertEqual(self.search('zielony'), [self.other])
+        self.other.delete()
+        self.assertEqual(self.search('kolor'), [])
+
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_migrations_leave_triggers(self):
+        """
+        After every migration has run, the search triggers of 0008 are in
+        place.
+        """
+        self.assertLessEqual(set(SQLITE_TRIGGERS), self.triggers())
+
+    def test_migrate_restores_dropped_triggers(self):
+        """
+        Triggers dropped by a table rebuild are recreated after migrate and
+        the rows written meanwhile are indexed.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER polls_question_fts_insert')
+            cursor.execute('DROP TRIGGER polls_choice_fts_update')
+        unindexed = create_question(question_text='Zapomniany?', days=-1)
+        self.choice.choice_text = 'Rust'
+        self.choice.save()
+        self.assertEqual(self.search('zapomniany'), [])
+        self.assertEqual(self.search('rust'), [])
+        with self.assertLogs('polls.search', 'WARNING') as logs:
+            emit_post_migrate_signal(verbosity=0, interactive=False,
+                                     db='default')
+        self.assertIn('polls_choice_fts_update, polls_question_fts_insert',
+                      logs.output[0])
+        self.assertLessEqual(set(SQLITE_TRIGGERS), self.triggers())
+        self.assertEqual(self.search('zapomniany'), [unindexed])
+        self.assertEqual(self.search('rust'), [self.question])
+        self.assertEqual(self.search('python'), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        for terms in ('"', 'python OR kolor', 'NEAR(', '*', '-python'):
+            self.search(terms)
+        self.assertEqual(self.search('python OR kolor'), [])
+
+    def test_ranked_ids_skip_unpublished(self):
+        future = create_question(question_text='Przyszły kolor?', days=30)
+        self.assertEqual(
+            ranked_question_ids('kolor', timezone.now(), 10), [self.other.pk])
+        self.assertEqual(ranked_question_ids('kolor', future.pub_date, 10), [
+            future.pk, self.other.pk])
+        self.assertEqual(ranked_question_ids('', timezone.now(), 10), [])
+
+    def test_short_prefix_is_ignored(self):
+        self.assertEqual(self.search('p'), [])
+        self.assertEqual(self.search('py'), [self.question])
+        self.assertEqual(self.search('python k'), [self.question])
+        self.assertEqual(ranked_question_ids('k', timezone.now(), 10), [])
+
+    def test_ranked_ids_rank_newest_candidates(self):
+        newer = create_question(question_text='Twój kolor?', days=-1)
+        Choice.objects.create(question=self.question, choice_text='Kolorowy')
+        self.assertEqual(
+            ranked_question_ids('kolor', timezone.now(), 10, candidates=1),
+            [newer.pk, self.question.pk])
+        self.assertCountEqual(ranked_question_ids('kolor', timezone.now(), 10),
+                              [newer.pk, self.other.pk, self.question.pk])
+
+    def test_search_view(self):
+        self.client.force_login(create_user())
+        response = self.client.get(reverse('polls:search'), {'q': 'python'})
+        self.assertContains(response, 'Najlepszy język programowania?')
+        self.assertNotContains(response, 'Ulubiony kolor?')
+        response = self.client.get(reverse('polls:search'), {'q': 'brak'})
+        self.assertContains(response, 'No polls match')
+
+    def test_admin_search(self):
+        User.objects.create_superuser(username='admin', password='secret')
+        self.client.login(username='admin', password='secret')
+        response = self.client.get(
+            reverse('admin:polls_question_changelist'), {'q': 'python'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.question])
+
+
+class AdminScalabilityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        Question.objects.bulk_create(
+            Question(question_text='Question {}'.format(i),
+                     pub_date=now - datetime.timedelta(days=2))
+            for i in range(100000))
+        cls.question = Question.objects.create(
+            question_text='Recent question', pub_date=now)
+        Choice.objects.bulk_create(
+            Choice(question=cls.question, choice_text='Choice {}'.format(i))
+            for i in range(100000))
+        choices = cls.question.choice_set.order_by('pk')
+        cls.choice_ids = list(choices.values_list('pk', flat=True)[:60])
+        cls.admin = User.objects.create_superuser(
+            username='admin', password='secret')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def get(self, url, data=None):
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        # Generous: an exact count, per-row query or full inline render
+        # over 100k rows would blow through it.
+        self.assertLess(time.perf_counter() - start, 2)
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_question_changelist(self):
+        response, queries = self.get(
+            reverse('admin:polls_question_changelist'))
+        self.assertLess(len(queries), 10)
+        self.assertFalse([sql for sql in queries if 'COUNT(*)' in sql])
+        self.assertEqual(response.context['cl'].result_count, 100001)
+        self.assertContains(response, 'Published recently?')
+        self.assertEqual(
+            response.context['cl'].result_list[0].published_recently, True)
+        self.assertEqual(
+            response.context['cl'].result_list[1].published_recently, False)
+
+    def test_choice_changelist(self):
+        response, queries = self.get(reverse('admin:polls_choice_changelist'))
+        self.assertLess(len(queries), 10)
+        self.assertFalse([sql for sql in queries if 'COUNT(*)' in sql])
+        self.assertContains(response, 'Recent question', count=100)
+
+    def test_filtered_changelist_counts_exactly(self):
+        response, _ = self.get(
+            reverse('admin:polls_question_changelist'), {'q': 'recent'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_question_change_form_pages_choices(self):
+        url = reverse('admin:polls_question_change', args=(self.question.pk,))
+        response, queries = self.get(url)
+        self.assertLess(len(queries), 15)
+        self.assertContains(
+            response, 'name="choice_set-INITIAL_FORMS" value="50"')
+        self.assertContains(response, '1&ndash;50 / 100000')
+        response, _ = self.get(url, {'choices_page': 2})
+        self.assertContains(response, '51&ndash;100 / 100000')
+
+    def test_inline_formset_page(self):
+        request = RequestFactory().get('/', {'choices_page': 2})
+        request.user = self.admin
+        inline = ChoiceInline(Question, admin.site)
+        formset = inline.get_formset(request, self.question)(
+            instance=self.question)
+        self.assertEqual(formset.forms[0].instance.pk, self.choice_ids[50])
+        self.assertEqual(formset.initial_form_count(), 50)
+
+    def test_estimated_count_paginator(self):
+        questions = Question.objects.order_by('pk')
+        self.assertEqual(
+            EstimatedCountPaginator(questions, 10).count, questions.last().pk)
+        self.assertEqual(
+            EstimatedCountPaginator(questions.filter(pk__lte=5), 10).count, 5)
+        self.assertEqual(
+            EstimatedCountPaginator(User.objects.order_by('pk'), 10).count, 1)
+
+
+class QuestionAutocompleteTests(TestCase):
+
+    def setUp(self):
+        self.questions = [
+            create_question(question_text='Question {}?'.format(i), days=-1)
+            for i in range(25)
+        ]
+        self.other = create_question(question_text='Ulubiony kolor?', days=-1)
+
+    def suggest(self, prefix, limit=10, cursor=None):
+        questions, cursor = question_suggestions(prefix, limit, cursor)
+        return [question.question_text for question in questions], cursor
+
+    def test_prefix_is_case_insensitive(self):
+        self.assertEqual(self.suggest('ulu'), (['Ulubiony kolor?'], None))
+        self.assertEqual(self.suggest('QUESTION 2'), (
+            ['Question 20?', 'Question 21?', 'Question 22?',
+             'Question 23?', 'Question 24?', 'Question 2?'], None))
+        self.assertEqual(self.suggest('kolor'), ([], None))
+
+    def test_pages_follow_cursor(self):
+        seen = []
+        texts, cursor = self.suggest('question', limit=10)
+        while cursor:
+            seen.extend(texts)
+            texts, cursor = self.suggest('question', limit=10, cursor=cursor)
+        seen.extend(texts)
+        texts = [question.question_text for question in self.questions]
+        self.assertEqual(seen, sorted(texts, key=str.lower))
+
+    def test_malformed_cursor_starts_over(self):
+        self.assertEqual(self.suggest('ulu', cursor='not a cursor'), (
+            ['Ulubiony kolor?'], None))
+        huge_pk = base64.urlsafe_b64encode(
+            '["u", {}]'.format(2 ** 64).encode()).decode()
+        self.assertEqual(
+            self.suggest('ulu', cursor=huge_pk), (['Ulubiony kolor?'], None))
+
+    def test_range_compares_by_code_point_from_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.suggest('question')
+        sql = queries.captured_queries[0]['sql']
+        self.assertIn('COLLATE "BINARY"', sql)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('question_text_lower_idx', plan)
+
+    def test_view(self):
+        url = reverse('polls:question_autocomplete')
+        user = create_user()
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(url, {'q': 'ulu'}).status_code, 403)
+        user.user_permissions.add(Permission.objects.get(
+            content_type__app_label='polls', codename='change_choice'))
+        self.client.force_login(User.objects.get(pk=user.pk))
+        response = self.client.get(url, {'q': 'ulu'})
+        self.assertEqual(response.json(), {
+            'results': [{'id': self.other.pk, 'text': 'Ulubiony kolor?'}],
+            'next': None,
+        })
+        page = self.client.get(url, {'q': 'question'}).json()
+        self.assertEqual(len(page['results']), 20)
+        page = self.client.get(
+            url, {'q': 'question', 'cursor': page['next']}).json()
+        self.assertEqual(len(page['results']), 5)
+
+    def test_add_choice_page_renders_current_question_only(self):
+        self.client.force_login(create_user('polls.add_question'))
+        question = self.questions[0]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('polls:add_choice', args=(question.pk,)))
+        self.assertContains(response, 'value="{}"'.format(question.pk))
+        self.assertContains(response, 'value="Question 0?"')
+        self.assertNotContains(response, 'Ulubiony kolor?')
+        self.assertNotContains(response, '<option')
+        self.assertContains(response, 'polls/autocomplete.js')
+        # No query reads the question table unfiltered.
+        self.assertFalse([query['sql'] for query in queries.captured_queries
+                          if 'FROM "polls_question"' in query['sql']
+                          and 'WHERE' not in query['sql']])
+
+    def test_validation_looks_up_submitted_pk(self):
+        form = ChoiceForm(
+            {'question': self.other.pk, 'choice_text': 'Czerwony', 'votes': 0})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(form.is_valid())
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(form.cleaned_data['question'], self.other)
+        self.assertFalse(
+            ChoiceForm({'question': 0, 'choice_text': 'Czerwony'}).is_valid())
+        form = ChoiceForm({'question': 'abc', 'choice_text': 'Czerwony'})
+        self.assertFalse(form.is_valid())
+        # A rejected value renders without a label instead of failing.
+        self.assertIn(
+            'value="abc"', str(ChoiceForm({'question': 'abc'})['question']))
+
+
+class VoteLedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.question = create_question(
+            question_text='Past question.', days=-1)
+        self.yes = Choice.objects.create(
+            question=self.question, choice_text='Yes')
+        self.no = Choice.objects.create(
+            question=self.question, choice_text='No')
+        self.other = Choice.objects.create(
+            question=create_question(question_text='Other question.', days=-1),
+            choice_text='Maybe')
+        self.users = [
+            User.objects.create_user(username='voter{}'.format(i))
+            for i in range(3)
+        ]
+
+    def test_writer_inserts_one_row_per_user_and_question(self):
+        writer = VoteLedgerWriter(threshold=100, interval=60)
+        writer.add(self.users[0].pk, self.yes)
+        writer.add(self.users[0].pk, self.no)
+        writer.add(self.users[0].pk, self.other)
+        writer.add(self.users[1].pk, self.no)
+        self.assertEqual(len(writer.pending()), 3)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(writer.flush(), 3)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(sorted(Vote.objects.values_list('user', 'choice')), [
+            (self.users[0].pk, self.yes.pk),
+            (self.users[0].pk, self.other.pk),
+            (self.users[1].pk, self.no.pk)])
+
+    def test_constraint_drops_votes_of_earlier_flushes(self):
+        writer = VoteLedgerWriter(threshold=100, interval=60)
+        writer.add(self.users[0].pk, self.yes)
+        writer.flush()
+        writer.add(self.users[0].pk, self.no)
+        writer.add(self.users[2].pk, self.no)
+        writer.flush()
+        self.assertEqual(sorted(Vote.objects.values_list('user', 'choice')), [
+            (self.users[0].pk, self.yes.pk), (self.users[2].pk, self.no.pk)])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(
+                user=self.users[0], question=self.question, choice=self.no)
+
+    def test_failed_flush_keeps_older_ballots(self):
+        writer = VoteLedgerWriter(threshold=100, interval=60)
+        writer.add(self.users[0].pk, self.yes)
+        with mock.patch.object(Vote.objects, 'bulk_create',
+                               side_effect=OperationalError('locked')):
+            with self.assertRaises(OperationalError):
+                writer.flush()
+        writer.add(self.users[0].pk, self.no)
+        self.assertEqual(writer.flush(), 1)
+        self.assertEqual(
+            list(Vote.objects.values_list('choice', flat=True)), [self.yes.pk])
+
+    def test_rollup_folds_votes_past_high_water_mark(self):
+        writer = VoteLedgerWriter(threshold=100, interval=60)
+        for user in self.users:
+            writer.add(user.pk, self.yes)
+        writer.add(self.users[0].pk, self.other)
+        writer.flush()
+        self.assertEqual(rollup_votes(batch_size=2), 2)
+        self.assertEqual(rollup_votes(batch_size=2), 2)
+        self.assertEqual(rollup_votes(batch_size=2), 0)
+        self.assertEqual(VoteRollup.objects.get().last_vote_id,
+                         Vote.objects.latest('pk').pk)
+        self.yes.refresh_from_db()
+        self.other.refresh_from_db()
+        self.question.refresh_from_db()
+        self.assertEqual(
+            (self.yes.votes, self.other.votes, self.question.total_votes),
+            (3, 1, 3))
+
+    def test_rollup_settle_leaves_recent_votes(self):
+        Vote.objects.create(
+            user=self.users[0], question=self.question, choice=self.yes)
+        self.assertEqual(rollup_votes(settle=60), 0)
+        self.assertEqual(rollup_votes(), 1)
+
+    def test_rollup_settle_stops_at_first_unsettled_id(self):
+        # Two buffers flushing interleaved: ids out of created_at order.
+        old = timezone.now() - datetime.timedelta(minutes=1)
+        Vote.objects.create(user=self.users[0], question=self.question,
+                            choice=self.yes, created_at=old)
+        Vote.objects.create(
+            user=self.users[1], question=self.question, choice=self.yes)
+        Vote.objects.create(user=self.users[2], question=self.question,
+                            choice=self.yes, created_at=old)
+        self.assertEqual(rollup_votes(settle=5), 1)
+        self.assertEqual(rollup_votes(settle=0), 2)
+        self.yes.refresh_from_db()
+        self.assertEqual(self.yes.votes, 3)
+
+    @override_settings(POLLS_VOTE_MODE='ledger')
+    def test_vote_view_and_rollup_command(self):
+        from .votes import vote_ledger
+        self.client.force_login(create_user('polls.change_choice'))
+        url = reverse('polls:vote', args=(self.question.id,))
+        self.client.post(url, {'choice': self.yes.id})
+        self.client.post(url, {'choice': self.no.id})
+        vote_ledger.flush()
+        self.assertEqual(
+            list(Vote.objects.values_list('choice', flat=True)), [self.yes.pk])
+        out = StringIO()
+        call_command('rollup_votes', stdout=out)
+        self.assertIn('Rolled up 1 votes.', out.getvalue())
+        self.yes.refresh_from_db()
+        self.assertEqual(self.yes.votes, 1)
+
+    @override_settings(POLLS_VOTE_MODE='ledger')
+    def test_record_vote_needs_user(self):
+        for user in (None, AnonymousUser()):
+            with self.assertRaisesMessage(ValueError, 'pass the voting user'):
+                record_vote(self.yes, user)
+
+
+class PublicationScheduleTests(TestCase):
+    """
+    Cached pages follow the publication schedule: time is frozen at
+    moments around the pub_date of a scheduled question.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now().replace(microsecond=0)
+        self.published = Question.objects.create(
+            question_text='Published question.',
+            pub_date=self.now - datetime.timedelta(days=1))
+        self.scheduled = Question.objects.create(
+            question_text='Scheduled question.',
+            pub_date=self.now + datetime.timedelta(hours=1))
+        Choice.objects.create(question=self.scheduled, choice_text='Yes')
+        self.user = create_user('polls.view_question')
+        self.client.force_login(self.user)
+        self.index_url = reverse('polls:index')
+        self.detail_url = reverse('polls:detail', args=(self.scheduled.id,))
+
+    def at(self, moment):
+        return mock.patch('django.utils.timezone.now', return_value=moment)
+
+    def test_next_publication_cached_until_it_passes(self):
+        with self.at(self.now):
+            self.assertEqual(next_publication(), self.scheduled.pub_date)
+            with self.assertNumQueries(0):
+                self.assertEqual(next_publication(), self.scheduled.pub_date)
+        with self.at(self.scheduled.pub_date):
+            self.assertIsNone(next_publication())
+        # An entry computed later says nothing about earlier moments.
+        self.assertEqual(next_publication(self.now), self.scheduled.pub_date)
+
+    def test_scheduling_a_question_moves_the_boundary(self):
+        with self.at(self.now):
+            next_publication()
+            sooner = create_question(question_text='Sooner question.', days=0)
+            sooner.pub_date = self.now + datetime.timedelta(minutes=5)
+            sooner.save()
+            self.assertEqual(next_publication(), sooner.pub_date)
+
+    def test_timeout_ends_at_boundary(self):
+        boundary = self.now + datetime.timedelta(seconds=10.5)
+        self.assertEqual(schedule_timeout(60, boundary, self.now), 11)
+        self.assertEqual(schedule_timeout(5, boundary, self.now), 5)
+        self.assertEqual(schedule_timeout(None, boundary, self.now), 11)
+        self.assertEqual(schedule_timeout(60, None, self.now), 60)
+        self.assertEqual(schedule_timeout(0, boundary, self.now), 0)
+        self.assertEqual(schedule_timeout(60, self.now, self.now), 1)
+
+    def test_future_question_does_not_leak_early(self):
+        with self.at(self.now):
+            self.assertNotContains(
+                self.client.get(self.index_url), 'Scheduled question.')
+            self.assertEqual(self.client.get(self.detail_url).status_code, 404)
+        with self.at(
+                self.scheduled.pub_date - datetime.timedelta(microseconds=1)):
+            self.assertNotContains(
+                self.client.get(self.index_url), 'Scheduled question.')
+            self.assertEqual(self.client.get(self.detail_url).status_code, 404)
+
+    def test_published_question_not_hidden_by_cached_index(self):
+        with self.at(self.now):
+            response = self.client.get(self.index_url)
+            self.assertContains(response, 'Published question.')
+            etag = response['ETag']
+        with self.at(self.scheduled.pub_date):
+            self.assertContains(
+                self.client.get(self.index_url), 'Scheduled question.')
+            response = self.client.get(self.index_url, HTTP_IF_NONE_MATCH=etag)
+            self.assertContains(response, 'Scheduled question.')
+
+    def test_publish_scheduled_warms_pages(self):
+        with self.at(self.scheduled.pub_date + datetime.timedelta(seconds=1)):
+            out = StringIO()
+            call_command('publish_scheduled', '--username', 'voter', '--once',
+                         stdout=out)
+            self.assertIn('Warmed 3 pages for 1 questions.', out.getvalue())
+            with CaptureQueriesContext(connection) as queries:
+                self.assertContains(
+                    self.client.get(self.index_url), 'Scheduled question.')
+                self.assertContains(self.client.get(self.detail_url), 'Yes')
+            self.assertFalse(
+                [query['sql'] for query in queries.captured_queries
+                 if 'polls_choice' in query['sql']
+                 or 'DESC' in query['sql']])
+            results_stats.reset()
+            self.client.get(
+                reverse('polls:results', args=(self.scheduled.id,)))
+            self.assertEqual(results_stats.snapshot()['hits'], 1)
+
+    def test_publish_scheduled_skips_earlier_questions(self):
+        with self.at(self.now):
+            out = StringIO()
+            call_command('publish_scheduled', '--username', 'voter', '--once',
+                         stdout=out)
+            self.assertEqual(out.getvalue(), '')
+            with self.assertRaises(CommandError):
+                call_command(
+                    'publish_scheduled', '--username', 'nobody', '--once')
+
+    def test_publish_scheduled_host(self):
+        from .management.commands.publish_scheduled import default_host
+        for allowed_hosts, host in (
+                ([], 'localhost'), (['*'], 'localhost'),
+                (['*', '.example.com'], 'example.com'),
+                (['polls.example.com'], 'polls.example.com')):
+            with override_settings(ALLOWED_HOSTS=allowed_hosts):
+                self.assertEqual(default_host(), host)
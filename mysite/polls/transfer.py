@@ -0,0 +1,215 @@
+import csv
+import json
+import sys
+import time
+from itertools import groupby, islice
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import invalidate_index
+from .models import Choice, Question
+from .schedule import invalidate_schedule
+
+CSV_FIELDS = [
+    'question_id', 'question_text', 'pub_date', 'choice_text', 'votes']
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def export_questions(chunk_size=2000):
+    """
+    Yield every question as {'id', 'question_text', 'pub_date', 'choices'}
+    in id order. Questions and choices are read through two chunked
+    cursors merged on question id, so memory use does not grow with the
+    table size.
+    """
+    questions = Question.objects.order_by('pk').values(
+        'pk', 'question_text', 'pub_date').iterator(chunk_size=chunk_size)
+    choices = Choice.objects.order_by('question_id', 'pk').values(
+        'question_id', 'choice_text', 'votes').iterator(chunk_size=chunk_size)
+    choice = next(choices, None)
+    for question in questions:
+        nested = []
+        while choice is not None and choice['question_id'] <= question['pk']:
+            if choice['question_id'] == question['pk']:
+                nested.append({'choice_text': choice['choice_text'],
+                               'votes': choice['votes']})
+            choice = next(choices, None)
+        yield {
+            'id': question['pk'],
+            'question_text': question['question_text'],
+            'pub_date': question['pub_date'].isoformat(),
+            'choices': nested,
+        }
+
+
+def write_jsonl(records, stream):
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        yield record
+
+
+def write_csv(records, stream):
+    writer = csv.writer(stream)
+    writer.writerow(CSV_FIELDS)
+    for record in records:
+        head = [record['id'], record['question_text'], record['pub_date']]
+        if not record['choices']:
+            writer.writerow(head + ['', ''])
+        for choice in record['choices']:
+            writer.writerow(head + [choice['choice_text'], choice['votes']])
+        yield record
+
+
+def read_jsonl(stream):
+    """Yield (line number, record) for each non-blank line."""
+    for number, line in enumerate(stream, start=1):
+        if line.strip():
+            yield number, json.loads(line)
+
+
+def read_csv(stream):
+    """
+    Regroup consecutive CSV rows of the same question_id into records and
+    yield (line number of the first row, record).
+    """
+    reader = csv.DictReader(stream)
+    rows = ((reader.line_num, row) for row in reader)
+    for question_id, group in groupby(
+            rows, key=lambda row: row[1]['question_id']):
+        number, first = next(group)
+        group = [first] + [row for _, row in group]
+        yield number, {
+            'question_text': group[0]['question_text'],
+            'pub_date': group[0]['pub_date'],
+            'choices': [
+                {'choice_text': row['choice_text'],
+                 'votes': int(row['votes'] or 0)}
+                for row in group if row['choice_text']
+            ],
+        }
+
+
+def parse_pub_date(number, record):
+    """
+    The pub_date of `record` as an aware datetime, naive values being taken
+    in the current time zone. Raises InvalidRecord naming line `number` if
+    it is missing or malformed.
+    """
+    value = record.get('pub_date')
+    try:
+        pub_date = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        pub_date = None
+    if pub_date is None:
+        raise InvalidRecord(
+            'Line {}: invalid pub_date {!r}.'.format(number, value))
+    if settings.USE_TZ and timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date)
+    return pub_date
+
+
+def import_questions(records, batch_size=1000):
+    """
+    Create questions and their choices from `records`, (line number,
+    record) pairs as read_jsonl() and read_csv() yield them, `batch_size`
+    questions per transaction with bulk inserts. Yields the number of
+    questions and choices written per batch.
+
+    Each batch is validated before it is written, so an invalid record
+    raises InvalidRecord with the batches before it imported and nothing
+    of its own.
+    """
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        pub_dates = [parse_pub_date(number, record)
+                     for number, record in batch]
+        batch = [record for _, record in batch]
+        with transaction.atomic():
+            questions = [
+                Question(
+                    question_text=record['question_text'], pub_date=pub_date,
+                    total_votes=sum(choice.get('votes') or 0
+                                    for choice in record.get('choices', ())))
+                for record, pub_date in zip(batch, pub_dates)
+            ]
+            if connection.features.can_return_rows_from_bulk_insert:
+                Question.objects.bulk_create(questions)
+            elif connection.vendor == 'sqlite':
+                Question.objects.bulk_create(questions)
+                assign_sqlite_pks(questions)
+            else:
+                for question in questions:
+                    question.save()
+            choices = [
+                Choice(question=question, choice_text=choice['choice_text'],
+                       votes=choice.get('votes') or 0)
+                for question, record in zip(questions, batch)
+                for choice in record.get('choices', ())
+            ]
+            Choice.objects.bulk_create(choices, batch_size=batch_size)
+            # bulk_create() sends no post_save signals.
+            transaction.on_commit(invalidate_index)
+            transaction.on_commit(invalidate_schedule)
+        yield len(questions), len(choices)
+
+
+def assign_sqlite_pks(questions):
+    """
+    Set the pks bulk_create() cannot return on SQLite. SQLite admits one
+    writer at a time and hands out AUTOINCREMENT ids in insertion order, so
+    inside the inserting transaction the new rows hold the last
+    len(questions) ids.
+    """
+    last_pk = Question.objects.order_by('-pk').values_list(
+        'pk', flat=True)[0]
+    first_pk = last_pk - len(questions) + 1
+    for pk, question in enumerate(questions, start=first_pk):
+        question.pk = pk
+
+
+def peak_memory():
+    """Peak resident memory of this process in bytes, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class TransferStats:
+    """Rows per second and peak memory of an import or export run."""
+
+    def __enter__(self):
+        self.questions = 0
+        self.choices = 0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
+        self.peak_memory = peak_memory()
+
+    def summary(self):
+        rows = self.questions + self.choices
+        summary = (
+            '{} questions, {} choices in {:.2f}s ({:.0f} rows/s)'
+        ).format(
+            self.questions, self.choices, self.elapsed,
+            rows / self.elapsed if self.elapsed else 0)
+        if self.peak_memory is not None:
+            summary += ', peak memory {:.1f} MiB'.format(
+                self.peak_memory / 2 ** 20)
+        return summary
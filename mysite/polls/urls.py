@@ -1,18 +1,38 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
+if getattr(settings, 'POLLS_ASYNC_VIEWS', False):
+    from . import async_views
+    index_view = async_views.index
+    detail_view = async_views.detail
+    results_view = async_views.results
+    vote_view = async_views.vote
+else:
+    index_view = views.IndexView.as_view()
+    detail_view = views.DetailView.as_view()
+    results_view = views.ResultsView.as_view()
+    vote_view = views.VoteView.as_view()
+
 
 app_name = 'polls'
 urlpatterns = [
-    path('', views.IndexView.as_view(), name='index'),
-    path('<int:question_id>/', views.DetailView.as_view(), name='detail'),
+    path('', index_view, name='index'),
+    path('top/', views.TopQuestionsView.as_view(), name='top'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('autocomplete/', views.QuestionAutocompleteView.as_view(),
+         name='question_autocomplete'),
+    path('<int:question_id>/', detail_view, name='detail'),
     path('<int:question_id>/edit/', views.EditQuestionView.as_view(), name='edit'),
     path('<int:question_id>/delete/', views.DeleteQuestionView.as_view(), name='delete'),
     path('<int:question_id>/add_choice/', views.AddChoiceView.as_view(), name='add_choice'),
     path('<int:question_id>/<int:choice_id>/edit_choice/', views.EditChoiceView.as_view(), name='edit_choice'),
-    path('<int:question_id>/results/', views.ResultsView.as_view(), name='results'),
-    path('<int:question_id>/vote/', views.VoteView.as_view(), name='vote'),
+    path('<int:question_id>/results/', results_view, name='results'),
+    path('<int:question_id>/live/', views.LiveResultsView.as_view(),
+         name='live'),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('<int:question_id>/vote/', vote_view, name='vote'),
 ]
 
 # urlpatterns = [
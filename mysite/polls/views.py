@@ -1,30 +1,71 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
-from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
+from django.contrib.auth.mixins import (
+    LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin,
+)
 from django.contrib.auth.models import User
-from django.core.exceptions import ObjectDoesNotExist
-from django.http import HttpResponse, Http404, HttpResponseRedirect
+from django.db import IntegrityError
+from django.db.models import Q
+from django.http import (
+    HttpResponse, Http404, HttpResponseRedirect, JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views import generic, View
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
-
-from .models import Question, Choice
+from django.views.decorators.http import condition
+
+from .autocomplete import question_suggestions
+from .cache import (
+    INDEX_VERSION_KEY, QUESTION_VERSION_KEY, fragment_timeout, get_results,
+    get_version, results_stats,
+)
+from .conditional import detail_etag, index_etag, results_etag
+from .models import Question, Choice, EmailKey
 from .forms import QuestionForm, ChoiceForm, LoginForm, RegisterForm
+from .live import EventStream, HubFull, hub
+from .metrics import registry
+from .pagination import KeysetPaginator
+from .ratelimit import SlidingWindowLimiter
+from .schedule import next_publication, publication_stamp, schedule_timeout
+from .search import ranked_question_ids
+from .votes import record_vote
 
 
 @method_decorator(csrf_exempt, name='dispatch')
 class IndexView(LoginRequiredMixin, View):
+    # Not read_replica: the ETag and the cached fragments stand for the
+    # versions bumped on commit, so the page is read from the primary.
+    query_budget = 3
 
+    @method_decorator(cache_control(private=True, no_cache=True))
+    @method_decorator(condition(etag_func=index_etag))
     def get(self, request):
-        latest_question_list = Question.objects.filter(
-            pub_date__lte=timezone.now()).order_by('-pub_date')
+        now = timezone.now()
+        # The cached list holds until the next scheduled question goes live.
+        next_publication_at = next_publication(now)
+        paginator = KeysetPaginator(
+            Question.objects.all(),
+            getattr(settings, 'POLLS_INDEX_PAGE_SIZE', 20),
+            published_before=now)
+        cursor = request.GET.get('cursor')
+        latest_question_list = paginator.page(cursor)
         form = QuestionForm()
         context = {
             'form': form,
+            # Not latest_question_list.cursor: the template lookup would
+            # try page['cursor'] first and run the query.
+            'cursor': cursor,
             'latest_question_list': latest_question_list,
+            'index_version': get_version(INDEX_VERSION_KEY),
+            'publication_stamp': publication_stamp(next_publication_at),
+            'fragment_timeout': schedule_timeout(
+                fragment_timeout(), next_publication_at, now),
         }
         return render(request, 'polls/index.html', context)
 
@@ -38,14 +79,105 @@ class IndexView(LoginRequiredMixin, View):
         return HttpResponseRedirect(reverse('polls:index'))
 
 
+class TopQuestionsView(LoginRequiredMixin, View):
+    """
+    The POLLS_TOP_QUESTIONS most voted published questions, read from
+    Question.total_votes through question_total_votes_idx.
+
+    The order lags behind the votes outside POLLS_VOTE_MODE 'atomic': the
+    totals count buffered votes once flushed, ledger votes once rolled up
+    and sharded votes once compact_vote_shards folds them into Choice.votes.
+    Sharded mode exists to keep votes off a single hot row, so it does not
+    update the question's total on every vote.
+    """
+    query_budget = 3
+    read_replica = True
+
+    def get(self, request):
+        limit = getattr(settings, 'POLLS_TOP_QUESTIONS', 10)
+        questions = Question.objects.filter(
+            pub_date__lte=timezone.now(),
+        ).order_by('-total_votes', '-id')[:limit]
+        context = {
+            'questions': questions,
+        }
+        return render(request, 'polls/top.html', context)
+
+
+class SearchView(LoginRequiredMixin, View):
+    """
+    Published questions matching ?q= in their text or choices, best match
+    first, through the full-text index of polls.search.
+    """
+    query_budget = 4
+    read_replica = True
+
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        questions = []
+        if query:
+            ids = ranked_question_ids(
+                query, timezone.now(),
+                getattr(settings, 'POLLS_SEARCH_RESULTS', 20),
+                using=Question.objects.db,
+                candidates=getattr(settings, 'POLLS_SEARCH_CANDIDATES', 1000))
+            by_id = Question.objects.in_bulk(ids)
+            questions = [by_id[pk] for pk in ids if pk in by_id]
+        context = {
+            'query': query,
+            'questions': questions,
+        }
+        return render(request, 'polls/search.html', context)
+
+
+class QuestionAutocompleteView(PermissionRequiredMixin, View):
+    """
+    JSON pages of questions starting with ?q=, for the question picker of
+    ChoiceForm. Open to anyone who may add or edit choices.
+    """
+    permission_required = ('polls.add_question', 'polls.change_choice')
+    raise_exception = True
+    query_budget = 5
+    read_replica = True
+
+    def has_permission(self):
+        return any(self.request.user.has_perm(perm)
+                   for perm in self.get_permission_required())
+
+    def get(self, request):
+        questions, cursor = question_suggestions(
+            request.GET.get('q', '').strip(),
+            getattr(settings, 'POLLS_AUTOCOMPLETE_RESULTS', 20),
+            request.GET.get('cursor'), using=Question.objects.db)
+        return JsonResponse({
+            'results': [
+                {'id': question.pk, 'text': question.question_text}
+                for question in questions
+            ],
+            'next': cursor,
+        })
+
+
 class DetailView(PermissionRequiredMixin, View):
     permission_required = 'polls.view_question'
     raise_exception = True
+    # Not read_replica, like IndexView.
+    query_budget = 6
 
+    @method_decorator(cache_control(private=True, no_cache=True))
+    @method_decorator(condition(etag_func=detail_etag))
     def get(self, request, question_id):
-        question = get_object_or_404(Question, pk=question_id)
+        now = timezone.now()
+        question = get_object_or_404(
+            Question.objects.filter(pub_date__lte=now), pk=question_id)
         context = {
             'question': question,
+            # Lazy: only evaluated when the choice list fragment is not cached.
+            'choices': question.choice_set.order_by('pk'),
+            'question_version': get_version(
+                QUESTION_VERSION_KEY.format(question.pk)),
+            'fragment_timeout': schedule_timeout(
+                fragment_timeout(), next_publication(now), now),
         }
         return render(request, 'polls/detail.html', context)
 
@@ -53,6 +185,7 @@ class DetailView(PermissionRequiredMixin, View):
 class EditQuestionView(PermissionRequiredMixin, View):
     permission_required = 'polls.change_question'
     raise_exception = True
+    query_budget = 5
 
     def get(self, request, question_id):
         question = get_object_or_404(Question, pk=question_id)
@@ -85,6 +218,8 @@ class EditQuestionView(PermissionRequiredMixin, View):
 class DeleteQuestionView(PermissionRequiredMixin, View):
     permission_required = 'polls.delete_question'
     raise_exception = True
+    # Includes the cascade to choices, vote shards and the Vote ledger.
+    query_budget = 10
 
     def get(self, request, question_id):
         question = get_object_or_404(Question, pk=question_id)
@@ -98,6 +233,7 @@ class DeleteQuestionView(PermissionRequiredMixin, View):
 class AddChoiceView(PermissionRequiredMixin, View):
     permission_required = 'polls.add_question'
     raise_exception = True
+    query_budget = 6
 
     def get(self, request, question_id):
         question = get_object_or_404(Question, pk=question_id)
@@ -105,7 +241,6 @@ class AddChoiceView(PermissionRequiredMixin, View):
             'question': question_id,
             'votes': 0,
         })
-        print(form)
         context = {
             'form': form,
             'question': question,
@@ -129,10 +264,13 @@ class AddChoiceView(PermissionRequiredMixin, View):
 class EditChoiceView(PermissionRequiredMixin, View):
     permission_required = 'polls.change_choice'
     raise_exception = True
+    query_budget = 7
 
     def get(self, request, question_id, choice_id):
-        question = get_object_or_404(Question, pk=question_id)
-        choice = get_object_or_404(Choice, pk=choice_id)
+        choice = get_object_or_404(
+            Choice.objects.select_related('question'),
+            pk=choice_id, question_id=question_id)
+        question = choice.question
         form = ChoiceForm(initial={
             'question': question_id,
             'choice_text': choice.choice_text,
@@ -146,8 +284,10 @@ class EditChoiceView(PermissionRequiredMixin, View):
         return render(request, 'polls/edit_choice.html', context)
 
     def post(self, request, question_id, choice_id):
-        question = get_object_or_404(Question, pk=question_id)
-        choice = get_object_or_404(Choice, pk=choice_id)
+        choice = get_object_or_404(
+            Choice.objects.select_related('question'),
+            pk=choice_id, question_id=question_id)
+        question = choice.question
         form = ChoiceForm(request.POST)
         if form.is_valid():
             choice.question = form.cleaned_data["question"]
@@ -166,36 +306,148 @@ class EditChoiceView(PermissionRequiredMixin, View):
 class ResultsView(PermissionRequiredMixin, View):
     permission_required = 'polls.view_question'
     raise_exception = True
+    # Not read_replica, like IndexView.
+    query_budget = 6
 
+    @method_decorator(cache_control(private=True, no_cache=True))
+    @method_decorator(condition(etag_func=results_etag))
     def get(self, request, question_id):
-        question = get_object_or_404(Question, pk=question_id)
+        question = get_object_or_404(
+            Question.objects.filter(pub_date__lte=timezone.now()),
+            pk=question_id)
         context = {
             'question': question,
+            'choices': get_results(question),
+            'live_results': getattr(settings, 'POLLS_LIVE_RESULTS', False),
         }
         return render(request, 'polls/results.html', context)
 
 
+class LiveResultsView(PermissionRequiredMixin, View):
+    """
+    Push vote totals of a question as they change: a text/event-stream of
+    `delta` events for EventSource clients, or a long poll returning the
+    totals once they move past the `since` sequence number. Each open
+    stream holds a server thread, so serve it from a threaded WSGI server;
+    it answers 404 unless settings.POLLS_LIVE_RESULTS is set.
+    """
+    permission_required = 'polls.view_question'
+    raise_exception = True
+
+    def get(self, request, question_id):
+        if not getattr(settings, 'POLLS_LIVE_RESULTS', False):
+            raise Http404('Live results are disabled.')
+        question = get_object_or_404(
+            Question.objects.filter(pub_date__lte=timezone.now()),
+            pk=question_id)
+        try:
+            subscription = hub.subscribe(question.id)
+        except HubFull:
+            response = HttpResponse('Too many listeners.', status=503)
+            response['Retry-After'] = '5'
+            return response
+        if 'since' in request.GET:
+            try:
+                return self.long_poll(subscription, int(request.GET['since']))
+            except ValueError:
+                return HttpResponse('Invalid since.', status=400)
+            finally:
+                subscription.close()
+        response = StreamingHttpResponse(EventStream(
+            subscription,
+            heartbeat=getattr(settings, 'POLLS_LIVE_HEARTBEAT', 15),
+            timeout=getattr(settings, 'POLLS_LIVE_STREAM_TIMEOUT', 300),
+        ), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def long_poll(self, subscription, since):
+        if since == subscription.sequence:
+            subscription.wait(getattr(settings, 'POLLS_LIVE_POLL_TIMEOUT', 25))
+        return JsonResponse({
+            'sequence': subscription.sequence,
+            'totals': {str(k): v for k, v in subscription.totals.items()},
+        })
+
+
 class VoteView(PermissionRequiredMixin, View):
     permission_required = 'polls.change_choice'
     raise_exception = True
+    # Includes the transaction updating Choice.votes and Question.total_votes.
+    query_budget = 8
 
     def post(self, request, question_id):
-        question = get_object_or_404(Question, pk=question_id)
         try:
-            selected_choice = question.choice_set.get(
-                pk=request.POST['choice'])
-        except (KeyError, Choice.DoesNotExist):
+            selected_choice = Choice.objects.select_related('question').get(
+                pk=request.POST['choice'], question_id=question_id)
+        except (KeyError, ValueError, Choice.DoesNotExist):
+            question = get_object_or_404(Question, pk=question_id)
             messages.error(request, 'Message: You didnt select a choice.')
             return HttpResponseRedirect(
                 reverse('polls:detail', args=(question.id,)))
         else:
-            try:
-                selected_choice.votes += 1
-            except TypeError:
-                selected_choice.votes = 1
-            selected_choice.save()
+            record_vote(selected_choice, request.user)
             return HttpResponseRedirect(
-                reverse('polls:results', args=(question.id,)))
+                reverse('polls:results', args=(question_id,)))
+
+
+class MetricsView(UserPassesTestMixin, View):
+    """
+    Per-view request metrics for staff: JSON percentiles by default,
+    Prometheus text with ?format=prometheus.
+    """
+    raise_exception = True
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        stats = results_stats.snapshot()
+        if request.GET.get('format') == 'prometheus':
+            text = registry.prometheus() + (
+                '# TYPE polls_results_cache_hits_total counter\n'
+                'polls_results_cache_hits_total {}\n'
+                '# TYPE polls_results_cache_misses_total counter\n'
+                'polls_results_cache_misses_total {}\n'
+            ).format(stats['hits'], stats['misses'])
+            return HttpResponse(
+                text, content_type='text/plain; version=0.0.4; charset=utf-8')
+        return JsonResponse(
+            {'views': registry.summary(), 'results_cache': stats})
+
+
+def find_registration_conflict(username, email):
+    """
+    Return an error message if `username` or `email` (case-insensitively)
+    is taken, else None. One query, served by the username unique index and
+    the LOWER(NULLIF(email, '')) index from migration 0006.
+    """
+    email = email.lower()
+    taken = User.objects.annotate(
+        email_key=EmailKey('email'),
+    ).filter(
+        Q(username=username) | Q(email_key=email),
+    ).values_list('email_key', flat=True)[:2]
+    email_keys = list(taken)
+    if not email_keys:
+        return None
+    if email in email_keys:
+        return "Email exist."
+    return "User exist."
+
+
+def login_limiters():
+    """Failed login counters per client address and per username."""
+    window = getattr(settings, 'POLLS_LOGIN_FAILURE_WINDOW', 300)
+    return (
+        SlidingWindowLimiter(
+            'login-ip',
+            getattr(settings, 'POLLS_LOGIN_FAILURES_PER_IP', 20), window),
+        SlidingWindowLimiter(
+            'login-user',
+            getattr(settings, 'POLLS_LOGIN_FAILURES_PER_USER', 5), window),
+    )
 
 
 class LoginView(View):
@@ -211,6 +463,24 @@ class LoginView(View):
         if form.is_valid():
             username = form.cleaned_data['username']
             password = form.cleaned_data['password']
+            # Checked before authenticate() so rejected attempts never pay
+            # for password hashing.
+            ip_limiter, user_limiter = login_limiters()
+            idents = [
+                (ip_limiter, request.META.get('REMOTE_ADDR', '')),
+                (user_limiter, username.lower()),
+            ]
+            limited = [(limiter, ident) for limiter, ident in idents
+                       if limiter.is_limited(ident)]
+            if limited:
+                form.add_error(
+                    field=None,
+                    error='Zbyt wiele prób logowania, spróbuj później.')
+                response = render(
+                    request, 'login.html', {'form': form}, status=429)
+                response['Retry-After'] = max(
+                    limiter.retry_after(ident) for limiter, ident in limited)
+                return response
             user = authenticate(username=username, password=password)
             if user:
                 login(request, user)
@@ -219,6 +489,8 @@ class LoginView(View):
                     return redirect(url)
                 return HttpResponseRedirect(reverse('polls:index'))
 
+            for limiter, ident in idents:
+                limiter.hit(ident)
             form.add_error(field=None, error='Zły login lub hasło!')
 
         ctx = {
@@ -244,28 +516,24 @@ class RegisterView(View):
             if form.cleaned_data['password'] == form.cleaned_data['password_confirmation']:
                 username_selected = form.cleaned_data['username']
                 email_selected = form.cleaned_data['email']
-                user = False
-                try:
-                    user = User.objects.get(username=username_selected)
-                    message = "User exist."
-                except ObjectDoesNotExist:
-                    pass
-                try:
-                    user = User.objects.get(email=email_selected)
-                    message = "Email exist."
-                except ObjectDoesNotExist:
-                    pass
-                if user:
+                message = find_registration_conflict(
+                    username_selected, email_selected)
+                if message is None:
+                    try:
+                        User.objects.create_user(
+                            username=username_selected,
+                            email=email_selected,
+                            password=form.cleaned_data['password']
+                        )
+                    except IntegrityError:
+                        # Lost a race with a concurrent registration.
+                        message = find_registration_conflict(
+                            username_selected, email_selected)
+                if message:
                     messages.error(request, message)
                     return HttpResponseRedirect(reverse('register'))
-                else:
-                    user = User.objects.create_user(
-                        username=username_selected,
-                        email=email_selected,
-                        password=form.cleaned_data['password']
-                    )
-                    messages.success(request, 'Your user was created.')
-                    return HttpResponseRedirect(reverse('login'))
+                messages.success(request, 'Your user was created.')
+                return HttpResponseRedirect(reverse('login'))
             else:
                 message = "Passwords are not the same."
                 messages.error(request, message)
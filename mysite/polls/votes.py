@@ -0,0 +1,364 @@
+import atexit
+import datetime
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import (
+    IntegrityError, OperationalError, close_old_connections, transaction,
+)
+from django.db.models import Count, F, Max, Min
+from django.utils import timezone
+
+from .cache import invalidate_results
+from .models import Choice, ChoiceVoteShard, Question, Vote, VoteRollup
+
+logger = logging.getLogger(__name__)
+
+
+def increment_votes(deltas):
+    """
+    Apply a {choice_id: delta} mapping to Choice.votes with atomic
+    UPDATE ... SET votes = votes + delta statements, add the same votes to
+    Question.total_votes, then invalidate the cached results of the
+    affected questions once the writes are committed.
+    """
+    with transaction.atomic():
+        for choice_id, delta in sorted(deltas.items()):
+            Choice.objects.filter(pk=choice_id).update(
+                votes=F('votes') + delta)
+        question_deltas = Counter()
+        choices = Choice.objects.filter(pk__in=deltas)
+        for choice_id, question_id in choices.values_list('pk', 'question_id'):
+            question_deltas[question_id] += deltas[choice_id]
+        add_question_votes(question_deltas)
+        question_ids = set(question_deltas)
+        transaction.on_commit(lambda: invalidate_many(question_ids))
+
+
+def add_question_votes(question_deltas):
+    """
+    Add a {question_id: delta} mapping to Question.total_votes. Rows are
+    updated in id order, after the choices, so concurrent writers lock in
+    the same order.
+    """
+    now = timezone.now()
+    for question_id, delta in sorted(question_deltas.items()):
+        if delta:
+            Question.objects.filter(pk=question_id).update(
+                total_votes=F('total_votes') + delta, last_vote_at=now)
+
+
+def invalidate_many(question_ids):
+    for question_id in question_ids:
+        invalidate_results(question_id)
+
+
+class BufferedWriter:
+    """
+    Accumulates items in memory and writes them as one batch once
+    `threshold` are pending or every `interval` seconds, whichever comes
+    first. Subclasses define the pending container (empty()), how an item
+    joins it (append()), how a batch is written (write()) and how a batch
+    that failed to write is put back (restore()).
+    """
+    thread_name = 'polls-buffered-writer'
+
+    def __init__(self, threshold=100, interval=1.0):
+        self.threshold = threshold
+        self.interval = interval
+        self._pending = self.empty()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def add(self, *item):
+        with self._lock:
+            self._size += self.append(self._pending, *item)
+            full = self._size >= self.threshold
+        if full:
+            self.flush()
+        else:
+            self._start_timer()
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self):
+        """Write all pending items and return the number written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, self.empty()
+                self._size = 0
+            if not batch:
+                return 0
+            try:
+                return self.write(batch)
+            except Exception:
+                with self._lock:
+                    self.restore(batch)
+                raise
+
+    def _start_timer(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Thread(
+                target=self._run_timer, name=self.thread_name, daemon=True)
+            self._timer.start()
+
+    def _run_timer(self):
+        while True:
+            time.sleep(self.interval)
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                # The batch was put back: retry it on the next tick
+                # instead of leaving it to the next threshold flush.
+                logger.exception('%s failed to flush', self.thread_name)
+            finally:
+                close_old_connections()
+            with self._lock:
+                if not self._pending:
+                    self._timer = None
+                    return
+
+
+class VoteBuffer(BufferedWriter):
+    """
+    Accumulates votes in memory and flushes aggregated deltas to
+    Choice.votes once `threshold` votes are pending or every `interval`
+    seconds, whichever comes first.
+    """
+    thread_name = 'polls-vote-buffer'
+
+    def empty(self):
+        return Counter()
+
+    def append(self, pending, choice_id, count=1):
+        pending[choice_id] += count
+        return count
+
+    def write(self, deltas):
+        increment_votes(deltas)
+        return sum(deltas.values())
+
+    def restore(self, deltas):
+        self._pending.update(deltas)
+        self._size += sum(deltas.values())
+
+
+class VoteLedgerWriter(BufferedWriter):
+    """
+    Appends votes to the Vote ledger with one bulk INSERT per flush. A
+    second vote of the same user on the same question is dropped: within
+    the buffer by its (user, question) key, against earlier flushes by
+    unique_vote_per_user_question, without reading the ledger first.
+    """
+    thread_name = 'polls-vote-ledger'
+
+    def empty(self):
+        return {}
+
+    def append(self, pending, user_id, choice):
+        key = (user_id, choice.question_id)
+        if key in pending:
+            return 0
+        pending[key] = (choice.pk, timezone.now())
+        return 1
+
+    def write(self, ballots):
+        Vote.objects.bulk_create([
+            Vote(user_id=user_id, question_id=question_id,
+                 choice_id=choice_id, created_at=created_at)
+            for (user_id, question_id), (choice_id, created_at)
+            in ballots.items()
+        ], ignore_conflicts=True)
+        return len(ballots)
+
+    def restore(self, ballots):
+        # The failed batch is older: its ballots win over newer duplicates.
+        ballots.update((key, value) for key, value in self._pending.items()
+                       if key not in ballots)
+        self._pending = ballots
+        self._size = len(ballots)
+
+
+def rollup_votes(batch_size=10000, settle=0):
+    """
+    Fold at most `batch_size` Vote rows past the VoteRollup high-water mark
+    into Choice.votes and Question.total_votes, and move the mark, in one
+    transaction. Returns the number of votes folded.
+
+    Only ids are compared, so the ledger must not commit ids out of order
+    behind the mark. SQLite serializes writers; elsewhere `settle` stops
+    the run before the first vote of the last `settle` seconds, leaving it
+    and every later id for a later run, when the transactions that were
+    inserting them have committed. Buffers flushing interleaved insert
+    ids out of created_at order, so settled votes past it wait as well.
+    """
+    with transaction.atomic():
+        mark, _ = VoteRollup.objects.select_for_update().get_or_create(pk=1)
+        votes = Vote.objects.filter(pk__gt=mark.last_vote_id).order_by()
+        if settle:
+            settled_at = timezone.now() - datetime.timedelta(seconds=settle)
+            unsettled = votes.filter(created_at__gt=settled_at).aggregate(
+                first=Min('pk'))['first']
+            if unsettled is not None:
+                votes = votes.filter(pk__lt=unsettled)
+        last = list(votes.order_by('pk').values_list(
+            'pk', flat=True)[batch_size - 1:batch_size])
+        last = last[0] if last else votes.aggregate(last=Max('pk'))['last']
+        if last is None:
+            return 0
+        deltas = dict(votes.filter(pk__lte=last).values('choice').annotate(
+            count=Count('pk')).values_list('choice', 'count'))
+        increment_votes(deltas)
+        mark.last_vote_id = last
+        mark.save()
+    return sum(deltas.values())
+
+
+def increment_shard(choice, shard_count):
+    """
+    Add one vote to a random ChoiceVoteShard of `choice`, spreading writes to
+    a hot choice over `shard_count` rows.
+    """
+    shard = random.randrange(max(shard_count, 1))
+    shards = ChoiceVoteShard.objects.filter(choice=choice, shard=shard)
+    if not shards.update(votes=F('votes') + 1):
+        try:
+            with transaction.atomic():
+                ChoiceVoteShard.objects.create(
+                    choice=choice, shard=shard, votes=1)
+        except IntegrityError:
+            shards.update(votes=F('votes') + 1)
+    transaction.on_commit(lambda: invalidate_results(choice.question_id))
+
+
+def compact_shards(question_ids=None):
+    """
+    Fold ChoiceVoteShard counts back into Choice.votes and return the number
+    of votes moved. Each choice is folded in its own transaction with its
+    shards locked, so readers using Choice.objects.with_vote_totals() see
+    either the old or the new split and always the same total.
+    """
+    shards = ChoiceVoteShard.objects.all()
+    if question_ids is not None:
+        shards = shards.filter(choice__question__in=question_ids)
+    choice_ids = shards.exclude(votes=0).values_list(
+        'choice_id', 'choice__question_id').distinct().order_by('choice_id')
+    moved = 0
+    for choice_id, question_id in list(choice_ids):
+        with transaction.atomic():
+            rows = list(ChoiceVoteShard.objects.select_for_update().filter(
+                choice_id=choice_id,
+            ).exclude(votes=0).values_list('pk', 'votes'))
+            for pk, votes in rows:
+                ChoiceVoteShard.objects.filter(pk=pk).update(
+                    votes=F('votes') - votes)
+            total = sum(votes for pk, votes in rows)
+            Choice.objects.filter(pk=choice_id).update(
+                votes=F('votes') + total)
+            add_question_votes({question_id: total})
+        moved += total
+    # Shards above a lowered vote_shard_count no longer receive votes.
+    shards.filter(
+        votes=0, shard__gte=F('choice__question__vote_shard_count')).delete()
+    return moved
+
+
+def reconcile_total_votes(chunk_size=1000, fix=True):
+    """
+    Compare Question.total_votes with the sum of its Choice.votes,
+    `chunk_size` questions at a time in id order, and yield
+    (question_id, total_votes, choice_votes) for each mismatch. With `fix`
+    the mismatched totals are recomputed by a single UPDATE per chunk, so a
+    vote landing in between is not lost.
+    """
+    last_pk = 0
+    while True:
+        pks = list(Question.objects.filter(pk__gt=last_pk).order_by(
+            'pk').values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return
+        last_pk = pks[-1]
+        mismatches = list(
+            Question.objects.filter(pk__in=pks).with_choice_votes()
+            .exclude(total_votes=F('choice_votes')).order_by('pk')
+            .values_list('pk', 'total_votes', 'choice_votes'))
+        if fix and mismatches:
+            Question.objects.filter(
+                pk__in=[pk for pk, *_ in mismatches]).sync_total_votes()
+        yield from mismatches
+
+
+vote_buffer = VoteBuffer(
+    threshold=getattr(settings, 'POLLS_VOTE_BUFFER_SIZE', 100),
+    interval=getattr(settings, 'POLLS_VOTE_FLUSH_INTERVAL', 1.0),
+)
+atexit.register(vote_buffer.flush)
+
+vote_ledger = VoteLedgerWriter(
+    threshold=getattr(settings, 'POLLS_VOTE_BUFFER_SIZE', 100),
+    interval=getattr(settings, 'POLLS_VOTE_FLUSH_INTERVAL', 1.0),
+)
+atexit.register(vote_ledger.flush)
+
+
+def retry_on_busy(func, *args):
+    """
+    Call `func`, retrying up to settings.POLLS_VOTE_BUSY_RETRIES times with
+    jittered backoff while SQLite reports the database as locked. Inside a
+    transaction the error is re-raised, since only the whole transaction
+    can be retried.
+    """
+    retries = getattr(settings, 'POLLS_VOTE_BUSY_RETRIES', 3)
+    attempt = 0
+    while True:
+        try:
+            return func(*args)
+        except OperationalError as exc:
+            if (attempt >= retries or 'locked' not in str(exc)
+                    or transaction.get_connection().in_atomic_block):
+                raise
+        attempt += 1
+        time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+
+def add_vote(choice):
+    with transaction.atomic():
+        Choice.objects.filter(pk=choice.pk).update(votes=F('votes') + 1)
+        add_question_votes({choice.question_id: 1})
+
+
+def record_vote(choice, user=None):
+    """
+    Count one vote of `user` for `choice` using the engine selected by
+    settings.POLLS_VOTE_MODE ('atomic', 'buffered', 'sharded' or 'ledger').
+    Only the ledger records, and needs, the user: it raises ValueError
+    without a saved one.
+    """
+    mode = getattr(settings, 'POLLS_VOTE_MODE', 'atomic')
+    if mode == 'ledger':
+        if user is None or user.pk is None:
+            raise ValueError(
+                "POLLS_VOTE_MODE 'ledger' records who voted; "
+                "pass the voting user.")
+        vote_ledger.add(user.pk, choice)
+    elif mode == 'buffered':
+        vote_buffer.add(choice.pk)
+    elif mode == 'sharded':
+        retry_on_busy(
+            increment_shard, choice, choice.question.vote_shard_count)
+    elif mode == 'atomic':
+        retry_on_busy(add_vote, choice)
+        transaction.on_commit(lambda: invalidate_results(choice.question_id))
+    else:
+        raise ValueError('Unknown POLLS_VOTE_MODE: {}'.format(mode))
@@ -0,0 +1,47 @@
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+
+
+def template_names(engine):
+    """
+    Names of the templates under the engine's DIRS and the templates
+    directories of settings.POLLS_WARM_TEMPLATE_APPS.
+    """
+    dirs = list(engine.dirs)
+    for label in getattr(settings, 'POLLS_WARM_TEMPLATE_APPS', ['polls']):
+        dirs.append(os.path.join(apps.get_app_config(label).path, 'templates'))
+    names = set()
+    for directory in dirs:
+        for root, _, filenames in os.walk(directory):
+            for filename in filenames:
+                path = os.path.relpath(os.path.join(root, filename), directory)
+                names.add(path.replace(os.sep, '/'))
+    return sorted(names)
+
+
+def warm_templates():
+    """
+    Load every template of template_names() through each Django template
+    backend, so the cached loader holds them compiled before the first
+    request. Returns (name, seconds, error) per template; `error` is the
+    TemplateSyntaxError if it failed to compile, else None.
+    """
+    results = []
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for name in template_names(backend.engine):
+            start = time.perf_counter()
+            try:
+                backend.engine.get_template(name)
+            except TemplateSyntaxError as exc:
+                error = exc
+            else:
+                error = None
+            results.append((name, time.perf_counter() - start, error))
+    return results